@@ -1646,6 +1646,594 @@ class Log(_Expression):
     def replace(expression, index, value, remove=False):
         return Log( expression.arg.replace(index,value,remove) , copy=False )
 
+def _is_zero(coeff):
+    'Return whether or not a coefficient of a :class:`.TruncatedSeries` is known to vanish.'
+    if isinstance(coeff, _Expression):
+        return False
+    return coeff == 0
+
+def _coefficient_product(first, second):
+    'Multiply two coefficients of :class:`.TruncatedSeries`.'
+    if isinstance(first, _Expression) and isinstance(second, _Expression):
+        return Product(first, second, copy=False)
+    return first * second
+
+def _coefficient_sum(terms):
+    'Add coefficients of :class:`.TruncatedSeries`.'
+    terms = [term for term in terms if not _is_zero(term)]
+    if not terms:
+        return 0
+    if len(terms) == 1:
+        term = terms[0]
+    elif all(isinstance(term, _Expression) for term in terms):
+        return Sum(*terms, copy=False)
+    else:
+        term = sum(terms[1:], terms[0])
+    return term.expand() if isinstance(term, sp.Expr) else term
+
+def _coefficient_inverse(coeff):
+    'Return the multiplicative inverse of a coefficient of :class:`.TruncatedSeries`.'
+    if isinstance(coeff, _Expression):
+        return coeff ** -1
+    return sympify_expression(1) / coeff
+
+class TruncatedSeries(object):
+    r'''
+    A Laurent series in several variables
+    (e.g. the regulators) that is truncated at
+    given orders. The coefficients are stored
+    in a dense array indexed by the multi-index
+    of the variables' powers.
+
+    In contrast to nested single variable expansions,
+    each variable is truncated independently;
+    i.e. the coefficient of :math:`\epsilon_0^{k_0}
+    \epsilon_1^{k_1} ...` is known if every
+    :math:`k_i` is less than or equal to the
+    corresponding entry of :attr:`highest_orders`.
+
+    The coefficients can be numbers, sympy expressions,
+    or expressions of this module. Sympy coefficients
+    are kept in expanded form.
+
+    :param coeffs:
+        array-like with one dimension per variable;
+        The coefficients. The entry with indices
+        ``(0,0,...)`` is the coefficient of the
+        `lowest_orders`.
+
+    :param lowest_orders:
+        iterable of integers;
+        The power of the variables that corresponds
+        to the first entry of `coeffs` in each
+        dimension.
+
+    :param symbols:
+        iterable of strings or sympy symbols;
+        The variables of the series.
+
+    :param truncated:
+        bool or iterable of bools, optional;
+        Whether or not the series has unknown
+        terms beyond the orders stored in `coeffs`
+        in each variable. ``False`` means that all
+        higher orders vanish exactly.
+
+    :param copy:
+        bool, optional;
+        Whether or not to copy the `coeffs`.
+
+    '''
+    def __init__(self, coeffs, lowest_orders, symbols, truncated=True, copy=True):
+        self.symbols = sympify_expression(list(symbols))
+        self.number_of_variables = len(self.symbols)
+        if copy or not isinstance(coeffs, np.ndarray) or coeffs.dtype != object:
+            coeffs = np.array(coeffs, dtype=object)
+        assert coeffs.ndim == self.number_of_variables, '`coeffs` must have one dimension per symbol'
+        self.coeffs = coeffs
+        self.lowest_orders = np.array(lowest_orders, dtype=int).reshape(self.number_of_variables)
+        self.truncated = np.empty(self.number_of_variables, dtype=bool)
+        self.truncated[:] = truncated
+
+    @property
+    def highest_orders(self):
+        'The highest known order in each variable.'
+        return self.lowest_orders + np.array(self.coeffs.shape, dtype=int) - 1
+
+    @staticmethod
+    def constant(value, symbols):
+        '''
+        Alternative constructor.
+        Construct a :class:`.TruncatedSeries` that
+        does not depend on the variables.
+
+        :param value:
+            number or expression;
+            The value.
+
+        :param symbols:
+            iterable of strings or sympy symbols;
+            The variables of the series.
+
+        '''
+        coeffs = np.empty([1] * len(symbols), dtype=object)
+        coeffs.flat[0] = value
+        return TruncatedSeries(coeffs, np.zeros(len(symbols), dtype=int), symbols, truncated=False, copy=False)
+
+    @staticmethod
+    def from_polynomial(polynomial, indices, highest_orders):
+        '''
+        Alternative constructor.
+        Construct a :class:`.TruncatedSeries` from
+        a :class:`.Polynomial` (e.g. the output of
+        :func:`pySecDec.expansion.expand_singular`)
+        that is known up to (including) the
+        `highest_orders`. Terms beyond the
+        `highest_orders` are discarded.
+
+        :param polynomial:
+            :class:`.Polynomial`;
+            The expansion in the variables
+            indexed by `indices`.
+
+        :param indices:
+            iterable of integers;
+            The indices of the variables of the series
+            in the ``polysymbols`` of `polynomial`.
+
+        :param highest_orders:
+            iterable of integers;
+            The orders up to which the `polynomial`
+            is known.
+
+        '''
+        indices = list(indices)
+        symbols = [polynomial.polysymbols[index] for index in indices]
+        highest_orders = np.array(highest_orders, dtype=int)
+        powers = polynomial.expolist[:,indices]
+        lowest_orders = np.minimum(powers.min(axis=0), highest_orders + 1)
+        coeffs = np.zeros(highest_orders - lowest_orders + 1, dtype=object)
+        for multiindex, coeff in zip(powers, polynomial.coeffs):
+            if (multiindex <= highest_orders).all():
+                position = tuple(multiindex - lowest_orders)
+                coeffs[position] = _coefficient_sum([coeffs[position], coeff])
+        return TruncatedSeries(coeffs, lowest_orders, symbols, copy=False)
+
+    def copy(self):
+        "Return a copy of a :class:`.TruncatedSeries`."
+        return TruncatedSeries(self.coeffs.copy(), self.lowest_orders.copy(), self.symbols, self.truncated.copy(), copy=False)
+
+    def __repr__(self):
+        terms = []
+        for multiindex in np.ndindex(*self.coeffs.shape):
+            coeff = self.coeffs[multiindex]
+            if not _is_zero(coeff):
+                powers = self.lowest_orders + multiindex
+                terms.append( '(' + str(coeff) + ')' + ''.join('*%s**(%i)' % (symbol,power) for symbol,power in zip(self.symbols,powers) if power != 0) )
+        truncation = ''.join( ' + O(%s**%i)' % (symbol,power) for symbol,power,truncated in zip(self.symbols,self.highest_orders+1,self.truncated) if truncated )
+        return (' + '.join(terms) or '0') + truncation
+
+    __str__ = __repr__
+
+    def __getitem__(self, orders):
+        '''
+        Return the coefficient of the given `orders`
+        (one integer per variable).
+
+        '''
+        orders = np.array(orders, dtype=int).reshape(self.number_of_variables)
+        if (orders > self.highest_orders)[self.truncated].any():
+            raise IndexError('The coefficient of the orders %s is unknown.' % list(orders))
+        position = orders - self.lowest_orders
+        if (position < 0).any() or (position >= self.coeffs.shape).any():
+            return 0
+        return self.coeffs[tuple(position)]
+
+    def _is_zero_array(self):
+        return np.vectorize(_is_zero, otypes=[bool])(self.coeffs) if self.coeffs.size else np.zeros(self.coeffs.shape, dtype=bool)
+
+    def trim(self):
+        '''
+        Remove leading vanishing orders in every
+        variable and trailing vanishing orders in
+        variables that are not truncated. Return
+        `self`.
+
+        '''
+        nonzero = ~self._is_zero_array()
+        if not nonzero.any():
+            if self.truncated.any():
+                # nothing is known to be nonzero up to the truncation orders
+                shape = [1] * self.number_of_variables
+                for i in np.where(self.truncated)[0]:
+                    shape[i] = 0
+                self.lowest_orders = np.where(self.truncated, self.highest_orders + 1, 0)
+            else:
+                shape = [1] * self.number_of_variables
+                self.lowest_orders = np.zeros(self.number_of_variables, dtype=int)
+            self.coeffs = np.zeros(shape, dtype=object)
+            return self
+        slices = []
+        for axis in range(self.number_of_variables):
+            nonzero_along_axis = np.where(nonzero.any(axis=tuple(i for i in range(self.number_of_variables) if i != axis)))[0]
+            start = nonzero_along_axis[0]
+            stop = self.coeffs.shape[axis] if self.truncated[axis] else nonzero_along_axis[-1] + 1
+            slices.append(slice(start, stop))
+            self.lowest_orders[axis] += start
+        self.coeffs = self.coeffs[tuple(slices)]
+        return self
+
+    def truncate(self, highest_orders):
+        '''
+        Discard the terms beyond `highest_orders`.
+        Return `self`.
+
+        :param highest_orders:
+            iterable of integers;
+            The highest orders to keep.
+
+        '''
+        highest_orders = np.array(highest_orders, dtype=int)
+        current_highest_orders = self.highest_orders
+        for axis in range(self.number_of_variables):
+            if current_highest_orders[axis] <= highest_orders[axis]:
+                continue
+            stop = max(highest_orders[axis] - self.lowest_orders[axis] + 1, 0)
+            discarded = np.take(self.coeffs, range(stop, self.coeffs.shape[axis]), axis=axis)
+            if not np.vectorize(_is_zero, otypes=[bool])(discarded).all():
+                self.truncated[axis] = True
+            self.coeffs = np.take(self.coeffs, range(stop), axis=axis)
+        return self
+
+    def _check_symbols(self, other):
+        if self.symbols != other.symbols:
+            raise ValueError('Cannot combine series in different variables (%s and %s).' % (self.symbols, other.symbols))
+
+    def _as_series(self, other):
+        if isinstance(other, TruncatedSeries):
+            self._check_symbols(other)
+            return other
+        return TruncatedSeries.constant(sympify_expression(other) if not isinstance(other, _Expression) else other, self.symbols)
+
+    @staticmethod
+    def sum(*summands):
+        '''
+        Add the series `summands`. The result is known up
+        to the lowest order that is known in all truncated
+        `summands`.
+
+        :param summands:
+            :class:`.TruncatedSeries`;
+            The series to be added.
+
+        '''
+        symbols = summands[0].symbols
+        for summand in summands[1:]:
+            summands[0]._check_symbols(summand)
+        N = len(symbols)
+        truncated = np.any([summand.truncated for summand in summands], axis=0)
+        lowest_orders = np.min([summand.lowest_orders for summand in summands], axis=0)
+        highest_orders = np.max([summand.highest_orders for summand in summands], axis=0)
+        for summand in summands:
+            highest_orders = np.where(summand.truncated, np.minimum(highest_orders, summand.highest_orders), highest_orders)
+        shape = np.maximum(highest_orders - lowest_orders + 1, 0)
+        terms = np.empty(shape, dtype=object)
+        for position in np.ndindex(*shape):
+            terms[position] = []
+        for summand in summands:
+            for position in np.ndindex(*summand.coeffs.shape):
+                coeff = summand.coeffs[position]
+                target = np.array(position) + summand.lowest_orders - lowest_orders
+                if not _is_zero(coeff) and (target < shape).all():
+                    terms[tuple(target)].append(coeff)
+        coeffs = np.empty(shape, dtype=object)
+        for position in np.ndindex(*shape):
+            coeffs[position] = _coefficient_sum(terms[position])
+        return TruncatedSeries(coeffs, lowest_orders, symbols, truncated, copy=False)
+
+    def __add__(self, other):
+        return TruncatedSeries.sum(self, self._as_series(other))
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return self * -1
+
+    def __sub__(self, other):
+        return self + (-self._as_series(other))
+
+    def __rsub__(self, other):
+        return self._as_series(other) + (-self)
+
+    def multiply(self, other, highest_orders=None):
+        '''
+        Multiply by `other` and discard terms beyond
+        `highest_orders`. The product is known up to
+        the orders where the unknown terms of either
+        factor start to contribute.
+
+        :param other:
+            :class:`.TruncatedSeries`;
+            The other factor.
+
+        :param highest_orders:
+            iterable of integers, optional;
+            The orders up to which the product is
+            to be computed. Default: All known
+            orders.
+
+        '''
+        other = self._as_series(other)
+        lowest_orders = self.lowest_orders + other.lowest_orders
+        highest_orders_of_product = self.highest_orders + other.highest_orders
+        for first, second in ((self, other), (other, self)):
+            highest_orders_of_product = np.where(first.truncated, np.minimum(highest_orders_of_product, first.highest_orders + second.lowest_orders), highest_orders_of_product)
+        truncated = self.truncated | other.truncated
+        if highest_orders is not None:
+            highest_orders = np.array(highest_orders, dtype=int)
+            truncated |= highest_orders < highest_orders_of_product
+            highest_orders_of_product = np.minimum(highest_orders_of_product, highest_orders)
+        shape = np.maximum(highest_orders_of_product - lowest_orders + 1, 0)
+
+        terms = np.empty(shape, dtype=object)
+        for position in np.ndindex(*shape):
+            terms[position] = []
+        other_nonzero = [(np.array(position), other.coeffs[position]) for position in np.ndindex(*other.coeffs.shape) if not _is_zero(other.coeffs[position])]
+        for position in np.ndindex(*self.coeffs.shape):
+            coeff = self.coeffs[position]
+            if _is_zero(coeff):
+                continue
+            for other_position, other_coeff in other_nonzero:
+                target = position + other_position
+                if (target < shape).all():
+                    terms[tuple(target)].append(_coefficient_product(coeff, other_coeff))
+        coeffs = np.empty(shape, dtype=object)
+        for position in np.ndindex(*shape):
+            coeffs[position] = _coefficient_sum(terms[position])
+        return TruncatedSeries(coeffs, lowest_orders, self.symbols, truncated, copy=False).trim()
+
+    def __mul__(self, other):
+        return self.multiply(other)
+
+    __rmul__ = __mul__
+
+    def __pow__(self, exponent):
+        if not isinstance(exponent, int) or exponent < 0:
+            raise TypeError('Can only raise a `TruncatedSeries` to nonnegative integer powers; use `inverse` for negative powers.')
+        result = TruncatedSeries.constant(sympify_expression(1), self.symbols)
+        for i in range(exponent):
+            result = result * self
+        return result
+
+    def _split_constant(self):
+        '''
+        Return the constant term ``c`` and the remainder
+        ``r`` such that ``self = c + r``. The series must
+        not have poles.
+
+        '''
+        self.trim()
+        if (self.lowest_orders < 0).any():
+            raise ValueError('The series must not have poles.')
+        if (self.lowest_orders == 0).all() and self.coeffs.size:
+            constant = self.coeffs.flat[0]
+            remainder = self.copy()
+            remainder.coeffs.flat[0] = 0
+        else:
+            constant = 0
+            remainder = self.copy()
+        return constant, remainder.trim()
+
+    def _power_series(self, coefficient, highest_orders):
+        r'''
+        Compute :math:`\sum_k c_k r^k` where ``r=self``
+        must not have a constant term and ``c_k=coefficient(k)``.
+
+        '''
+        result = [TruncatedSeries.constant(sympify_expression(coefficient(0)), self.symbols)]
+        power = TruncatedSeries.constant(sympify_expression(1), self.symbols)
+        k = 0
+        while True:
+            k += 1
+            power = power.multiply(self, highest_orders)
+            if not power.coeffs.size or power._is_zero_array().all():
+                break
+            result.append(power * TruncatedSeries.constant(sympify_expression(coefficient(k)), self.symbols))
+        result = TruncatedSeries.sum(*result)
+        result.truncated |= self.truncated
+        return result.truncate(highest_orders).trim()
+
+    @staticmethod
+    def _nonconstant(remainder):
+        # the variables that the trimmed `remainder` depends on
+        if remainder._is_zero_array().all():
+            return np.zeros(remainder.number_of_variables, dtype=bool)
+        return (np.array(remainder.coeffs.shape) > 1) | (remainder.lowest_orders != 0)
+
+    def _target_orders(self, highest_orders, relative_precision):
+        highest_orders = np.array(highest_orders, dtype=int)
+        return np.where(self.truncated, np.minimum(highest_orders, relative_precision), highest_orders)
+
+    def inverse(self, highest_orders):
+        '''
+        Return the multiplicative inverse of the series up
+        to (including) `highest_orders`. The coefficient
+        of the lowest order in every variable must be
+        nonzero, i.e. the series must be of the form
+        ``c * eps**lowest_orders * (1 + <higher orders>)``.
+
+        :param highest_orders:
+            iterable of integers;
+            The orders up to which the inverse is to be
+            computed.
+
+        '''
+        self.trim()
+        if not self.coeffs.size or _is_zero(self.coeffs.flat[0]):
+            raise ValueError('Cannot invert a series with vanishing leading coefficient.')
+        inverse_leading_coeff = _coefficient_inverse(self.coeffs.flat[0])
+        lowest_orders = self.lowest_orders
+
+        # ``self = c * eps**lowest_orders * (1 + r)``
+        remainder = TruncatedSeries(self.coeffs, np.zeros_like(lowest_orders), self.symbols, self.truncated, copy=True) * TruncatedSeries.constant(inverse_leading_coeff, self.symbols)
+        remainder.coeffs.flat[0] = 0
+        remainder.trim()
+
+        # relative orders
+        target = self._target_orders(np.array(highest_orders) + lowest_orders, self.highest_orders - lowest_orders)
+        result = remainder._power_series(lambda k: (-1)**k, target)
+        result.truncated |= TruncatedSeries._nonconstant(remainder)
+        result.lowest_orders -= lowest_orders
+        return result * TruncatedSeries.constant(inverse_leading_coeff, self.symbols)
+
+    def exp(self, highest_orders):
+        '''
+        Return the exponential of the series up to
+        (including) `highest_orders`. The series must
+        not have poles.
+
+        :param highest_orders:
+            iterable of integers;
+            The orders up to which the exponential is to
+            be computed.
+
+        '''
+        constant, remainder = self._split_constant()
+        target = self._target_orders(highest_orders, self.highest_orders)
+        result = remainder._power_series(lambda k: sympify_expression(1) / sp.factorial(k), target)
+        result.truncated |= TruncatedSeries._nonconstant(remainder)
+        return result * TruncatedSeries.constant(sp.exp(constant), self.symbols)
+
+    def log(self, highest_orders):
+        '''
+        Return the natural logarithm of the series up to
+        (including) `highest_orders`. The series must
+        have a nonvanishing constant term and no poles.
+
+        :param highest_orders:
+            iterable of integers;
+            The orders up to which the logarithm is to
+            be computed.
+
+        '''
+        constant, remainder = self._split_constant()
+        if _is_zero(constant):
+            raise ValueError('Cannot expand the logarithm of a series without constant term.')
+        remainder = remainder * TruncatedSeries.constant(_coefficient_inverse(constant), self.symbols)
+        target = self._target_orders(highest_orders, self.highest_orders)
+        result = remainder._power_series(lambda k: sp.log(constant) if k == 0 else sympify_expression((-1)**(k+1)) / k, target)
+        result.truncated |= TruncatedSeries._nonconstant(remainder)
+        return result
+
+    def gamma(self, highest_orders):
+        r'''
+        Return the Gamma function of the series up to
+        (including) `highest_orders`. The series must
+        not have poles.
+
+        Use
+        :math:`\Gamma(c + r) = \Gamma(c) \exp(\sum_k \psi^{(k-1)}(c) r^k / k!)`
+        and, if :math:`c` is a nonpositive integer,
+        :math:`\Gamma(z) = \Gamma(z + n + 1) / (z (z + 1) ... (z + n))`
+        with :math:`n=-c`.
+
+        :param highest_orders:
+            iterable of integers;
+            The orders up to which the Gamma function
+            is to be computed.
+
+        '''
+        constant, remainder = self._split_constant()
+        constant = sympify_expression(constant)
+        if constant.is_integer and constant <= 0:
+            n = -int(constant)
+            denominator = TruncatedSeries.constant(sympify_expression(1), self.symbols)
+            for j in range(n + 1):
+                denominator = denominator * (self + j)
+            inverse_denominator = denominator.inverse(highest_orders)
+            shifted_orders = np.array(highest_orders) - inverse_denominator.lowest_orders
+            return (self + (n + 1)).gamma(shifted_orders).multiply(inverse_denominator, highest_orders)
+
+        target = self._target_orders(highest_orders, self.highest_orders)
+        exponent = remainder._power_series(lambda k: 0 if k == 0 else sp.polygamma(k - 1, constant) / sp.factorial(k), target)
+        result = exponent.exp(target)
+        result.truncated |= TruncatedSeries._nonconstant(remainder)
+        return result * TruncatedSeries.constant(sp.gamma(constant), self.symbols)
+
+    @staticmethod
+    def from_sympy(expression, symbols, highest_orders):
+        '''
+        Alternative constructor.
+        Expand a sympy `expression` in the `symbols`
+        up to (including) `highest_orders`. Sums,
+        products, powers, and the functions ``exp``,
+        ``log``, and ``gamma`` of the `symbols` are
+        supported. Raise `TypeError` for other functions
+        and `ValueError` if an intermediate series cannot
+        be expanded (e.g. the inverse of a series whose
+        leading coefficient vanishes such as
+        ``1/(eps0 + eps1)``).
+
+        :param expression:
+            string or sympy expression;
+            The expression to be expanded.
+
+        :param symbols:
+            iterable of strings or sympy symbols;
+            The variables to expand the `expression` in.
+
+        :param highest_orders:
+            iterable of integers;
+            The orders up to which the expansion is to
+            be computed.
+
+        '''
+        expression = sympify_expression(expression)
+        symbols = sympify_expression(list(symbols))
+        highest_orders = np.array(highest_orders, dtype=int)
+        symbol_set = set(symbols)
+
+        def recursion(expression, orders):
+            if not expression.free_symbols & symbol_set:
+                return TruncatedSeries.constant(expression, symbols)
+            if expression in symbol_set:
+                coeffs = np.zeros([1] * len(symbols), dtype=object)
+                coeffs.flat[0] = sympify_expression(1)
+                lowest_orders = np.zeros(len(symbols), dtype=int)
+                lowest_orders[symbols.index(expression)] = 1
+                return TruncatedSeries(coeffs, lowest_orders, symbols, truncated=False, copy=False)
+            if expression.is_Add:
+                return TruncatedSeries.sum(*(recursion(arg, orders) for arg in expression.args))
+            if expression.is_Mul:
+                factors = [recursion(arg, orders) for arg in expression.args]
+                result = factors[0]
+                for factor in factors[1:]:
+                    result = result * factor
+                return result
+            if expression.is_Pow:
+                base, exponent = expression.args
+                if exponent.is_Integer:
+                    power = recursion(base, orders) ** abs(int(exponent))
+                    return power if exponent >= 0 else power.inverse(orders)
+                return (recursion(exponent, orders) * recursion(base, orders).log(orders)).exp(orders)
+            if isinstance(expression, sp.exp):
+                return recursion(expression.args[0], orders).exp(orders)
+            if isinstance(expression, sp.log):
+                return recursion(expression.args[0], orders).log(orders)
+            if isinstance(expression, sp.gamma):
+                return recursion(expression.args[0], orders).gamma(orders)
+            raise TypeError('Cannot expand "%s" as `TruncatedSeries`.' % expression)
+
+        # increase the working orders until poles do not spoil the requested orders
+        working_orders = highest_orders.copy()
+        for attempt in range(16):
+            series = recursion(expression, working_orders)
+            missing_orders = np.where(series.truncated, highest_orders - series.highest_orders, 0)
+            if (missing_orders <= 0).all():
+                return series.truncate(highest_orders).trim()
+            working_orders += np.maximum(missing_orders, 0)
+        raise ValueError('Could not expand "%s" up to the orders %s.' % (expression, list(highest_orders)))
+
 def Expression(expression, polysymbols, follow_functions=False):
     '''
     Convert a sympy expression to an expression
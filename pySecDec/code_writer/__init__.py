@@ -11,6 +11,14 @@ This is the main function of `pySecDec`.
 
 .. autofunction:: pySecDec.code_writer.make_package
 
+.. autofunction:: pySecDec.code_writer.merge_package
+
+Profiling
+~~~~~~~~~
+
+.. automodule:: pySecDec.code_writer.profiling
+    :members:
+
 Template Parser
 ~~~~~~~~~~~~~~~
 
@@ -22,5 +30,5 @@ Template Parser
 
 """
 
-from . import template_parser
-from .make_package import make_package
+from . import template_parser, profiling
+from .make_package import make_package, merge_package
@@ -9,20 +9,28 @@ from ..metadata import version, git_id
 from ..misc import sympify_symbols, rangecomb
 from ..algebra import _Expression, Expression, Polynomial, \
                       ExponentiatedPolynomial, Pow, Product, \
-                      ProductRule, Function, Sum, sympify_expression
+                      ProductRule, Function, Sum, TruncatedSeries, \
+                      sympify_expression
 from .. import decomposition
 from ..matrix_sort import iterative_sort, Pak_sort, light_Pak_sort
 from ..subtraction import integrate_pole_part, integrate_by_parts, pole_structure as compute_pole_structure
 from ..expansion import expand_singular, expand_Taylor, expand_sympy, OrderError
-from ..misc import lowest_order, parallel_det
+from ..misc import lowest_order, parallel_det, worker_pool, worker_environment
+from ..polytope import PolytopeCache
 from .template_parser import parse_template_file, parse_template_tree
+from .profiling import StageTimer, write_records, predict_time
 from itertools import chain, repeat
-from multiprocessing import Pool
-from time import strftime
+from multiprocessing import Pool, Queue, cpu_count
+from time import strftime, time
 from re import match
 import numpy as np
 import sympy as sp
-import sys, os
+import sys, os, pickle, hashlib, shutil, signal, json
+
+try:
+    from queue import Empty
+except ImportError: # python 2
+    from Queue import Empty
 
 # The only public object this module provides is the function `make_package`.
 # The module is organized in multiple sections dedicated to specific tasks
@@ -267,14 +275,17 @@ def _convert_input(name, integration_variables, ibp_power_goal, regulators,
 
 
 # ---------------------------------- decomposition ----------------------------------
-def get_decomposition_routines(name, normaliz, workdir):
+def get_decomposition_routines(name, normaliz, workdir, processes=1, cache=None):
     '''
     Return a dictionary with the functions
     performing the primary and the secondary
     decomposition.
     Along with the name, the path to the executable
-    of normaliz and a temporary directory are passed
-    to this function.
+    of normaliz, a temporary directory, the number
+    of normaliz processes that may run at the same
+    time, and optionally a
+    :class:`pySecDec.polytope.PolytopeCache` are
+    passed to this function.
 
     '''
     _decomposition_strategies = dict(
@@ -284,15 +295,15 @@ def get_decomposition_routines(name, normaliz, workdir):
                                                                  ),
                                         geometric=           dict(
                                                                      primary=lambda sector, indices: [decomposition.geometric.Cheng_Wu(sector, indices[-1])],
-                                                                     secondary=lambda sector, indices: decomposition.geometric.geometric_decomposition(sector, indices, normaliz, workdir)
+                                                                     secondary=lambda sector, indices: decomposition.geometric.geometric_decomposition(sector, indices, normaliz, workdir, processes, cache)
                                                                  ),
                                         geometric_ku=        dict(
                                                                      primary=decomposition.iterative.primary_decomposition,
-                                                                     secondary=lambda sector, indices: decomposition.geometric.geometric_decomposition_ku(sector, indices, normaliz, workdir)
+                                                                     secondary=lambda sector, indices: decomposition.geometric.geometric_decomposition_ku(sector, indices, normaliz, workdir, processes, cache)
                                                                  ),
                                         geometric_no_primary=dict(
                                                                      primary=lambda sector, indices: [sector], # no primary decomposition
-                                                                     secondary=lambda sector, indices: decomposition.geometric.geometric_decomposition_ku(sector, indices, normaliz, workdir)
+                                                                     secondary=lambda sector, indices: decomposition.geometric.geometric_decomposition_ku(sector, indices, normaliz, workdir, processes, cache)
                                                                  ),
                                         iterative_no_primary=dict(
                                                                      primary=lambda sector, indices: [sector], # no primary decomposition
@@ -379,6 +390,28 @@ def _parse_global_templates(name, regulators, polynomial_names,
     # return parser options
     return template_sources, template_replacements, file_renamings
 
+def _remove_stale_sector_files(name, number_of_sectors):
+    '''
+    Remove the files that belong to sectors with an index
+    larger than `number_of_sectors` from the `target_directory`
+    (given by `name`). Such files remain when a package
+    is regenerated in place and the number of sectors
+    decreases.
+
+    '''
+    stale_file_patterns = {
+        # generated by :func:`_process_secondary_sector` and the "codegen/Makefile"
+        'codegen' : r'^(?:contour_deformation_)?sector(\d+)(?:\.h|-stamp)$',
+        # generated by FORM
+        'src' : r'^(?:contour_deformation_)?sector_(\d+)(?:_[n0-9_]+)?\.(?:cpp|hpp|o)$'
+    }
+    for directory, pattern in stale_file_patterns.items():
+        directory = os.path.join(name, directory)
+        for filename in os.listdir(directory):
+            sector = match(pattern, filename)
+            if sector is not None and int(sector.group(1)) > number_of_sectors:
+                os.remove(os.path.join(directory, filename))
+
 
 # --------------------------------- write FORM code ---------------------------------
 def _make_FORM_list(python_list):
@@ -761,28 +794,544 @@ class MaxDegreeFunction(Function):
             replacement.maxdegrees = self.maxdegrees[:index] + self.maxdegrees[index+1:]
         return replacement
 
+# The variables of :func:`make_package` that :func:`._process_secondary_sector`
+# (and :func:`._process_secondary_sector_in_worker` for `profile`) reads;
+# the `sector`, its `sector_index`, and the `stage_timer` are set per task.
+_shared_environment_keys = (
+    'symbols_other_polynomials', 'all_symbols', 'form_work_space', 'contour_deformation_polynomial',
+    'str_error_token', 'template_sources', 'symbols_polynomials_to_decompose', 'regulator_indices',
+    'function_calls', 'real_parameters', 'pole_part_initializer', 'positive_polynomials',
+    'elementary_monomials_all_symbols', 'integration_variable_indices', 'polynomial_names', 'name',
+    'lowest_orders', 'imaginary_unit', 'have_dummy_functions', 'decomposition_method',
+    'normaliz_executable', 'use_iterative_sort', 'use_light_Pak', 'use_dreadnaut', 'use_Pak',
+    'complex_parameters', 'expolist', 'use_symmetries', 'integration_variables', 'required_orders',
+    'file_renamings', 'regulators', 'all_integration_variables',
+    'ibp_power_goal_this_primary_sector', 'nested_series_type', 'form_insertion_depth',
+    'reversed_polynomial_names', 'one', 'this_primary_sector_remainder_expression',
+    'transformations', 'primary_sector', 'remainder_expression_is_trivial',
+    'highest_prefactor_pole_orders', 'remainder_expression', 'other_polynomials', 'polynomial_zero',
+    'function_declarations', 'names_other_polynomials', 'primary_sector_index',
+    'form_optimization_level', 'initial_sector', 'polynomial_one', 'functions', 'requested_orders',
+    'str_replaced_remainder_expression', 'split', 'elementary_monomials',
+    'symbols_remainder_expression', 'enforce_complex', 'polynomials_to_decompose', 'error_token',
+    'template_replacements', 'prefactor', 'profile'
+)
+_contour_deformation_environment_keys = (
+    'contourdef_Jacobian_determinant', 'contourdef_Jacobian', 'symbolic_deformed_variables',
+    'symbolic_deformation_factors', 'symbolic_deformation_factor_names',
+    'contour_deformation_polynomial_index', 'maxdegrees_contour_deformation_polynomial',
+    'symbolic_deformed_variable_names', 'symbolic_contour_deformation_polynomial',
+    'str_contour_deformation_polynomial', 'deformation_parameters',
+    'deformed_integration_parameters', 'deformation_factors'
+)
+
 def _make_environment(original_environment):
-    'Prepare the environment for :func:`._process_secondary_sector`.'
-
-    original_environment = original_environment.copy()
-    sector_index = original_environment.pop('sector_index')
-    secondary_sectors = original_environment.pop('secondary_sectors')
-
-    # remove items that are not needed or cannot be pickled
-    original_environment.pop('pool', None)
-    original_environment.pop('strategy', None)
-    original_environment.pop('original_decomposition_strategies', None)
-    original_environment.pop('primary_sectors', None)
-    original_environment.pop('primary_sectors_to_consider', None)
-    original_environment.pop('primary_decomposition_with_splitting', None)
-    original_environment.pop('secondary_decomposition_with_splitting', None)
-
-    for sector in secondary_sectors:
-        sector_index += 1
-        environment = original_environment.copy()
-        environment['sector'] = sector
-        environment['sector_index'] = sector_index
-        yield environment
+    '''
+    Prepare the environment for :func:`._process_secondary_sector`
+    that is shared by all secondary sectors of a primary sector.
+    Only the variables listed in `_shared_environment_keys` and,
+    with contour deformation, `_contour_deformation_environment_keys`
+    are taken from `original_environment`.
+
+    '''
+    keys = _shared_environment_keys
+    if original_environment['contour_deformation_polynomial'] is not None:
+        keys += _contour_deformation_environment_keys
+    return dict( (key, original_environment[key]) for key in keys )
+
+def _process_secondary_sector_in_worker(task):
+    '''
+    Call :func:`._process_secondary_sector` with the
+    environment shared by all secondary sectors, see
+    :func:`pySecDec.misc.worker_pool`. The environment
+    is sent to each worker process only once; the `task`
+    is ``(sector_index, sector)``. Return the `sector_index`,
+    the result, and the records of the :class:`.StageTimer`.
+
+    '''
+    sector_index, sector = task
+    environment = worker_environment().copy()
+    started_queue = environment.pop('started_queue', None)
+    if started_queue is not None:
+        started_queue.put( (sector_index, time(), os.getpid(), _resident_memory(os.getpid())) )
+    environment['sector_index'] = sector_index
+    environment['sector'] = sector
+    stage_timer = environment['stage_timer'] = StageTimer(environment['profile'] == 'memory', sector=sector_index)
+    return sector_index, _process_secondary_sector(environment), stage_timer.records
+
+def _sector_statistics(sector, number_of_integration_variables, regulators, contour_deformation=False):
+    '''
+    Return properties of the `sector` that can be read off
+    without processing it. The returned dictionary contains:
+
+     * ``'integration_variables'``: The number of
+       integration variables.
+     * ``'terms'``: The number of terms in all polynomials
+       of the `sector`.
+     * ``'pole_orders'``: For every integration variable,
+       the order of the pole at zero for vanishing
+       regulators; ``0`` if there is no pole.
+     * ``'highest_poles'``: For every regulator, an upper
+       bound of the highest pole; the sum of the
+       `pole_orders` of the integration variables whose
+       exponent depends on the regulator.
+     * ``'contour_deformation'``: The argument
+       `contour_deformation`.
+     * ``'cost'``: See :func:`._estimate_sector_cost`.
+
+    :param sector:
+        :class:`pySecDec.decomposition.Sector`;
+        The sector to be processed.
+
+    :param number_of_integration_variables:
+        integer;
+        The number of integration variables; i.e. the
+        number of leading `polysymbols` of the `sector`
+        that are integrated over.
+
+    :param regulators:
+        iterable of sympy symbols;
+        The regulators; set to zero to determine
+        the pole orders.
+
+    :param contour_deformation:
+        bool;
+        Whether or not the sector is processed with
+        contour deformation.
+
+    '''
+    # exponents of the integration variables for vanishing regulators
+    # and the regulators they depend on
+    regulators_to_zero = dict((regulator, 0) for regulator in regulators)
+    exponents = np.array(sector.Jacobian.expolist[:,:number_of_integration_variables].min(axis=0), dtype=float)
+    regularized = np.zeros((number_of_integration_variables, len(regulators)), dtype=bool)
+    number_of_terms = 0
+    for product in sector.cast:
+        monomial, polynomial = product.factors
+        number_of_terms += len(polynomial.coeffs)
+        exponent = sympify_expression(monomial.exponent)
+        try:
+            exponent_at_zero = float( exponent.subs(regulators_to_zero) )
+        except TypeError: # exponent depends on further symbols
+            continue
+        powers = monomial.expolist[:,:number_of_integration_variables].min(axis=0)
+        exponents += exponent_at_zero * powers
+        for regulator_index, regulator in enumerate(regulators):
+            if regulator in exponent.free_symbols:
+                regularized[:,regulator_index] |= powers != 0
+    for polynomial in sector.other:
+        number_of_terms += len(polynomial.coeffs)
+
+    # terms generated by the subtraction
+    pole_orders = np.where(exponents <= -1, np.floor(-exponents), 0).astype(int)
+    number_of_subtraction_terms = np.prod(1 + pole_orders)
+
+    cost = number_of_subtraction_terms * number_of_terms * number_of_integration_variables
+    if contour_deformation:
+        cost *= 2
+
+    return dict(
+        integration_variables = int(number_of_integration_variables),
+        terms = int(number_of_terms),
+        pole_orders = [int(order) for order in pole_orders],
+        highest_poles = [int(order) for order in pole_orders.dot(regularized)],
+        contour_deformation = bool(contour_deformation),
+        cost = float(cost)
+    )
+
+def _estimate_sector_cost(sector, number_of_integration_variables, regulators, contour_deformation=False):
+    '''
+    Return a rough estimate of the relative cost of
+    :func:`._process_secondary_sector` for the `sector`.
+    Only the ordering of the estimates is meaningful.
+
+    The subtraction generates ``1 + p`` terms for every
+    integration variable with a pole of order ``p``.
+    The number of terms to be expanded is further
+    proportional to the number of terms in the
+    polynomials of the `sector`. The number of
+    derivatives grows with the number of integration
+    variables and with the contour deformation.
+
+    The arguments are the same as for
+    :func:`._sector_statistics`.
+
+    '''
+    return _sector_statistics(sector, number_of_integration_variables, regulators, contour_deformation)['cost']
+
+def _sector_exponents(sector):
+    '''
+    Return the exponents of all polynomials of the
+    `sector` as bytes. The shards of a package compare
+    the hash of these exponents of all sectors to make
+    sure that they enumerate the sectors the same way.
+
+    '''
+    polynomials = [sector.Jacobian] + [factor for product in sector.cast for factor in product.factors] + list(sector.other)
+    return ';'.join(repr(polynomial.expolist.tolist()) for polynomial in polynomials).encode('utf-8')
+
+class _Journal(object):
+    '''
+    Record of the progress of :func:`.make_package` that
+    allows to resume an interrupted run. The records are
+    appended to the file `filename` as they become
+    available:
+
+     * ``('header', fingerprint)``
+     * ``('sectors', primary_sector_index, secondary_sectors)``:
+       The decomposed and symmetry-reduced sectors.
+     * ``('result', sector_index, result)``: The value returned
+       by :func:`._process_secondary_sector`; i.e. the
+       `lowest_orders`, the `function_declarations`, and the
+       `pole_structures` of the sector.
+
+    :param filename:
+        string or None;
+        The file to write the records to. If ``None``,
+        the records are only kept in memory.
+
+    :param fingerprint:
+        string;
+        Identifier of the input to :func:`.make_package`.
+        A journal is only read if the fingerprints match.
+
+    :param resume:
+        bool;
+        Whether or not to read an existing journal. If
+        ``False``, an existing journal is overwritten.
+
+    '''
+    def __init__(self, filename, fingerprint, resume=False):
+        self.filename = filename
+        self.sectors = {}
+        self.results = {}
+
+        if filename is None:
+            self.journal_file = None
+        elif resume and os.path.isfile(filename):
+            valid_length = self._read(fingerprint)
+            self.journal_file = open(filename, 'r+b')
+            # discard a partially written last record
+            self.journal_file.truncate(valid_length)
+            self.journal_file.seek(valid_length)
+            if not valid_length: # not even the header is complete
+                self._write( ('header', fingerprint) )
+        else:
+            self.journal_file = open(filename, 'wb')
+            self._write( ('header', fingerprint) )
+
+    def _read(self, fingerprint):
+        '''
+        Read the records from ``self.filename``.
+        Return the length of the file up to the last
+        complete record.
+
+        '''
+        with open(self.filename, 'rb') as journal_file:
+            valid_length = 0
+            while True:
+                try:
+                    record = pickle.load(journal_file)
+                except Exception: # end of file or partially written record
+                    break
+                valid_length = journal_file.tell()
+                if record[0] == 'header':
+                    if record[1] != fingerprint:
+                        raise ValueError('Cannot resume from "%s": The journal has been written for a different input.' % self.filename)
+                elif record[0] == 'sectors':
+                    self.sectors[record[1]] = record[2]
+                elif record[0] == 'result':
+                    self.results[record[1]] = record[2]
+        return valid_length
+
+    def _write(self, record):
+        if self.journal_file is None:
+            return
+        pickle.dump(record, self.journal_file, 2)
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+
+    def record_sectors(self, primary_sector_index, secondary_sectors):
+        'Record the `secondary_sectors` of the primary sector `primary_sector_index`.'
+        self.sectors[primary_sector_index] = secondary_sectors
+        self._write( ('sectors', primary_sector_index, secondary_sectors) )
+
+    def record_result(self, sector_index, result):
+        'Record the `result` of :func:`._process_secondary_sector` for the sector `sector_index`.'
+        self.results[sector_index] = result
+        self._write( ('result', sector_index, result) )
+
+    def close(self):
+        if self.journal_file is not None:
+            self.journal_file.close()
+
+def _remove_journal(filename):
+    'Remove the journal `filename` of a complete run of :func:`.make_package` if it exists.'
+    if os.path.isfile(filename):
+        os.remove(filename)
+
+class _SectorProgress(object):
+    '''
+    Report the progress of processing the secondary
+    sectors; i.e. the throughput, the estimated time
+    remaining, and the sectors that have been running
+    for the longest time.
+
+    :param number_of_sectors:
+        integer;
+        The number of sectors to be processed.
+
+    :param started_queue:
+        :class:`multiprocessing.Queue`;
+        The queue the worker processes put
+        ``(sector_index, start_time, process_id)`` into,
+        optionally followed by the resident memory of
+        the worker when it started the sector.
+
+    :param number_of_slowest:
+        integer;
+        How many of the running sectors to report.
+
+    '''
+    def __init__(self, number_of_sectors, started_queue, number_of_slowest=3):
+        self.number_of_sectors = number_of_sectors
+        self.started_queue = started_queue
+        self.number_of_slowest = number_of_slowest
+        self.running = {}
+        self.process_ids = {}
+        self.initial_memory = {}
+        self.finished = set()
+        self.start_time = time()
+
+    def read_started(self):
+        'Read the sectors that have been started from the `started_queue`.'
+        while True:
+            try:
+                message = self.started_queue.get_nowait()
+            except Empty:
+                break
+            sector_index, start_time = message[:2]
+            if sector_index not in self.finished:
+                self.running[sector_index] = start_time
+                if len(message) > 2:
+                    self.process_ids[sector_index] = message[2]
+                if len(message) > 3 and message[3] is not None:
+                    self.initial_memory[sector_index] = message[3]
+
+    def update(self, finished_sector_index):
+        'Mark the sector `finished_sector_index` as done and print the progress.'
+        self.read_started()
+        self.running.pop(finished_sector_index, None)
+        self.process_ids.pop(finished_sector_index, None)
+        self.initial_memory.pop(finished_sector_index, None)
+        self.finished.add(finished_sector_index)
+
+        now = time()
+        number_done = len(self.finished)
+        throughput = number_done / max(now - self.start_time, 1e-9)
+        remaining_time = (self.number_of_sectors - number_done) / throughput
+        message = 'finished sector %i (%i/%i, %.2f sectors/s, ETA %.0fs)' % \
+                  (finished_sector_index, number_done, self.number_of_sectors, throughput, remaining_time)
+        slowest = sorted(self.running.items(), key=lambda item: item[1])[:self.number_of_slowest]
+        if slowest:
+            message += '; running longest: ' + ', '.join('sector %i (%.0fs)' % (sector_index, now - start_time) for sector_index, start_time in slowest)
+        print(message)
+
+def _parse_memory_size(size):
+    '''
+    Convert `size` to bytes. The `size` is either
+    an integer or a string with one of the suffixes
+    "K", "M", "G", and "T"; e.g. "500M".
+
+    '''
+    if isinstance(size, str):
+        size = size.strip().upper()
+        units = dict(K=1024, M=1024**2, G=1024**3, T=1024**4)
+        if size and size[-1] in units:
+            return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+def _resident_memory(process_id):
+    '''
+    Return the resident memory of the process `process_id`
+    in bytes. Return ``None`` if the process has terminated.
+    Requires the "/proc" filesystem.
+
+    '''
+    try:
+        with open('/proc/%i/stat' % process_id, 'r') as stat_file:
+            if stat_file.read().rsplit(')',1)[1].split()[0] in ('Z', 'X'): # zombie or dead
+                return None
+        with open('/proc/%i/statm' % process_id, 'r') as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, IndexError): # process does not exist (anymore)
+        return None
+
+def _proportional_memory(process_id):
+    '''
+    Return the proportional set size (PSS) of the process
+    `process_id` in bytes, i.e. its resident memory with
+    the pages shared with other processes counted by
+    their share. Unlike the resident memory, the PSS does
+    not count the copy-on-write pages that a forked worker
+    shares with its parent once per worker. Return ``None``
+    if "/proc/<pid>/smaps_rollup" is not available.
+
+    '''
+    try:
+        with open('/proc/%i/smaps_rollup' % process_id, 'r') as smaps_file:
+            for line in smaps_file:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024 # in kB
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    return None
+
+def _imap_memory_bounded(pool, function, tasks, costs, number_of_workers, memory_limit, progress, poll_interval=0.5):
+    '''
+    Like ``pool.imap_unordered(function, tasks, 1)`` but
+    keep the memory used by the worker processes below
+    `memory_limit`:
+
+     * Admission control: The peak memory of a task is
+       predicted as its cost times the largest memory
+       per cost observed so far. A task is only started
+       if the predicted memory of all running tasks does
+       not exceed the `memory_limit`. Until the first
+       task has finished, only one task runs at a time.
+     * Guard: If the workers together exceed the
+       `memory_limit`, the largest worker is killed.
+     * Retry: Tasks whose worker died, e.g. killed by the
+       guard or by the operating system, are retried
+       when no other task is running.
+
+    The memory of a worker is its proportional set size
+    (see :func:`._proportional_memory`) or, if that is not
+    available, the growth of its resident memory since
+    it started the task. The memory is monitored through
+    the "/proc" filesystem. Without it, the tasks are
+    distributed by ``pool.imap_unordered`` without any
+    memory bound since a worker killed by the operating
+    system could not be detected.
+
+    :param pool:
+        :class:`multiprocessing.Pool`;
+        The pool to run the tasks.
+
+    :param function:
+        callable;
+        Called as ``function(task)`` in the worker
+        processes. Must put ``(task[0], start_time, process_id)``
+        into the `started_queue` of `progress`.
+
+    :param tasks:
+        list of tuples;
+        The tasks in the order they should be started.
+        The first entry of every task is its index.
+
+    :param costs:
+        dict;
+        The relative cost of every task by index;
+        see :func:`._estimate_sector_cost`.
+
+    :param number_of_workers:
+        integer;
+        The number of processes in the `pool`.
+
+    :param memory_limit:
+        integer;
+        The memory limit in bytes.
+
+    :param progress:
+        :class:`._SectorProgress`;
+        Provides the process ids of the running tasks.
+
+    :param poll_interval:
+        float;
+        Time in seconds between checks of the memory
+        of the workers.
+
+    '''
+    if not os.path.isdir('/proc/self'):
+        for result in pool.imap_unordered(function, tasks, 1):
+            yield result
+        return
+
+    pending = list(tasks)
+    retry = []
+    running = {} # task index -> (task, async_result)
+    running_alone = None
+    peak_memory = {}
+    death_times = {}
+    memory_per_cost = None # unknown until the first task has finished
+
+    def predicted_memory(task_index):
+        return max(memory_per_cost * costs[task_index], peak_memory.get(task_index, 0))
+
+    def submit(task):
+        running[task[0]] = (task, pool.apply_async(function, (task,)))
+
+    while pending or retry or running:
+        # start tasks
+        if retry:
+            if not running:
+                task = retry.pop(0)
+                running_alone = task[0]
+                submit(task)
+        else:
+            while pending and len(running) < number_of_workers:
+                if running and (memory_per_cost is None or \
+                        sum(predicted_memory(task_index) for task_index in running) + predicted_memory(pending[0][0]) > memory_limit):
+                    break
+                submit(pending.pop(0))
+
+        # wait for a running task to finish or until the next check of the memory
+        next(iter(running.values()))[1].wait(poll_interval)
+        progress.read_started()
+
+        # collect the finished tasks
+        for task_index, (task, async_result) in list(running.items()):
+            if async_result.ready():
+                del running[task_index]
+                death_times.pop(task_index, None)
+                # a task that finished before its memory was measured was short and hence small
+                memory_per_cost = max(memory_per_cost or 0., peak_memory.pop(task_index, 0) / max(costs[task_index], 1e-300))
+                yield async_result.get()
+
+        # monitor the memory of the running tasks
+        memory = {}
+        for task_index in list(running.keys()):
+            process_id = progress.process_ids.get(task_index)
+            if process_id is None: # not started yet
+                continue
+            resident_memory = _resident_memory(process_id)
+            if resident_memory is not None:
+                worker_memory = _proportional_memory(process_id)
+                if worker_memory is None:
+                    worker_memory = max(resident_memory - progress.initial_memory.get(task_index, 0), 0)
+                memory[task_index] = worker_memory
+                peak_memory[task_index] = max(peak_memory.get(task_index, 0), worker_memory)
+                continue
+
+            # The worker has terminated without returning a result.
+            # Give the pool some time to deliver a result that is on its way.
+            death_time = death_times.setdefault(task_index, time())
+            if time() - death_time < 5 * poll_interval:
+                continue
+            if task_index == running_alone:
+                raise RuntimeError('The worker process died while processing sector %i alone. Its memory requirement probably exceeds the available memory.' % task_index)
+            print('the worker process died while processing sector %i; retrying it alone later' % task_index)
+            retry.append(running.pop(task_index)[0])
+            progress.process_ids.pop(task_index, None)
+
+        # kill the largest worker if the `memory_limit` is exceeded
+        if sum(memory.values()) > memory_limit:
+            task_index = max(memory, key=memory.get)
+            process_id = progress.process_ids[task_index]
+            print('memory limit exceeded: stopping sector %i (%.0f MB)' % (task_index, memory[task_index] / 1024.**2))
+            os.kill(process_id, signal.SIGKILL)
+            if task_index == running_alone or len(running) == 1:
+                raise RuntimeError('Sector %i exceeds the `memory_limit` even when processed alone.' % task_index)
 
 def _process_secondary_sector(environment):
     'Function to process the `secondary_sectors` in parallel.'
@@ -824,7 +1373,6 @@ def _process_secondary_sector(environment):
     file_renamings = environment['file_renamings']
     regulators = environment['regulators']
     all_integration_variables = environment['all_integration_variables']
-    pole_structures = environment['pole_structures']
     ibp_power_goal_this_primary_sector = environment['ibp_power_goal_this_primary_sector']
     nested_series_type = environment['nested_series_type']
     form_insertion_depth = environment['form_insertion_depth']
@@ -850,12 +1398,12 @@ def _process_secondary_sector(environment):
     split = environment['split']
     elementary_monomials = environment['elementary_monomials']
     symbols_remainder_expression = environment['symbols_remainder_expression']
-    symbol = environment['symbol']
     enforce_complex = environment['enforce_complex']
     polynomials_to_decompose = environment['polynomials_to_decompose']
     error_token = environment['error_token']
     template_replacements = environment['template_replacements']
     prefactor = environment['prefactor']
+    stage_timer = environment['stage_timer']
     if contour_deformation_polynomial is not None:
         contourdef_Jacobian_determinant = environment['contourdef_Jacobian_determinant']
         contourdef_Jacobian = environment['contourdef_Jacobian']
@@ -915,103 +1463,104 @@ def _process_secondary_sector(environment):
             poly.expolist[:,:-len(regulators)-len(polynomial_names)] += \
                 np.einsum('i,k->ik', poly.expolist[:,-len(polynomial_names):][:,i], mono.expolist[0,:-len(regulators)-len(polynomial_names)])
 
-    # define symbols for the `polynomials_to_decompose` --> shorter expressions and faster in python
-    symbolic_polynomials_to_decompose = []
-    symbolic_polynomials_to_decompose_all_symbols_undeformed = []
-    names_polynomials_to_decompose = []
-    for i in range(len(polynomials_to_decompose)):
-        try:
-            poly_name = str(polynomial_names[i])
-        except IndexError:
-            poly_name = FORM_names['cast_polynomial'] + str(i)
-        symbolic_polynomials_to_decompose_all_symbols_undeformed.append(
-                MaxDegreeFunction(
-                                  poly_name,
-                                  *elementary_monomials_all_symbols,
-                                  maxdegrees=MaxDegreeFunction.get_maxdegrees(
-                                                                                  sector.cast[i].factors[1],
-                                                                                  ignore_subclass=True
-                                                                             )
-                                  )
-        )
-        symbolic_polynomials_to_decompose.append(
-            Pow(
-                MaxDegreeFunction(
-                                  poly_name,
-                                  *(elementary_monomials if contour_deformation_polynomial is None else symbolic_deformed_variables),
-                                  maxdegrees=MaxDegreeFunction.get_maxdegrees(
-                                                                                  sector.cast[i].factors[1],
-                                                                                  indices=None if contour_deformation_polynomial is None else regulator_indices,
-                                                                                  ignore_subclass=True
-                                                                             )
-                                  ),
-                Expression(sector.cast[i].factors[1].exponent, symbols_polynomials_to_decompose),
-                copy = False
-            )
-        )
-        names_polynomials_to_decompose.append(poly_name)
-
-    # convert all coefficients to pySecDec expressions
-    parse_coeffs(sector, symbols_polynomials_to_decompose+polynomial_names, symbols_other_polynomials+polynomial_names)
-
-    # remove `polynomial_names` - keep polynomial part symbolic as dummy function:
-    #  - from `other_polynomials`
-    replacements = []
-    for k in range(1, len(reversed_polynomial_names) + 1):
-        replacement = symbolic_polynomials_to_decompose_all_symbols_undeformed[len(polynomial_names)-k]
-        for i in range(k):
-            replacement = replacement.replace(-1, error_token, remove=True)
-        replacements.append(replacement)
-    for replacement in replacements:
-        for i, poly in enumerate(sector.other):
-            poly = poly.replace(-1, replacement, remove=True)
-            for j, coeff in enumerate(poly.coeffs):
-                poly.coeffs[j] = coeff.simplify()
-            sector.other[i] = poly
-
-    #  - from `polynomials_to_decompose`
-    for i in range(len(polynomials_to_decompose)):
-        # no dependence here, just remove the symbols
-        prod = sector.cast[i]
-        for poly_name in reversed_polynomial_names:
-            prod = prod.replace(-1, error_token, remove=True)
-        sector.cast[i] = prod
-
-    #  - from `Jacobian`
-    Jacobian = sector.Jacobian
-    for poly_name in reversed_polynomial_names:
-        Jacobian = Jacobian.replace(-1, error_token, remove=True)
-
-    #  - from `this_transformations`
-    if not use_symmetries:
-        for i in range(len(all_integration_variables)):
-            for poly_name in reversed_polynomial_names:
-                this_transformations[i] = this_transformations[i].replace(-1, error_token, remove=True)
-
-    # convert all exponents to pySecDec expressions
-    parse_exponents(sector, symbols_polynomials_to_decompose, symbols_other_polynomials)
-
-    # factorize
-    #  - the polynomials in ``sector.other``
-    for i,to_factorize in enumerate(sector.other):
-        to_factorize = sector.other[i] = \
-            Product(
-                ExponentiatedPolynomial(
-                    np.zeros([1,len(symbols_other_polynomials)], dtype=int), np.array([1]), to_factorize.exponent.copy(), symbols_other_polynomials, copy=False
-                ),
-                to_factorize
+    with stage_timer('parse_sector'):
+        # define symbols for the `polynomials_to_decompose` --> shorter expressions and faster in python
+        symbolic_polynomials_to_decompose = []
+        symbolic_polynomials_to_decompose_all_symbols_undeformed = []
+        names_polynomials_to_decompose = []
+        for i in range(len(polynomials_to_decompose)):
+            try:
+                poly_name = str(polynomial_names[i])
+            except IndexError:
+                poly_name = FORM_names['cast_polynomial'] + str(i)
+            symbolic_polynomials_to_decompose_all_symbols_undeformed.append(
+                    MaxDegreeFunction(
+                                      poly_name,
+                                      *elementary_monomials_all_symbols,
+                                      maxdegrees=MaxDegreeFunction.get_maxdegrees(
+                                                                                      sector.cast[i].factors[1],
+                                                                                      ignore_subclass=True
+                                                                                 )
+                                      )
             )
-        decomposition.refactorize(to_factorize)
-
-    #  - the Jacobian
-    Jacobian = \
-            Product(
-                ExponentiatedPolynomial(
-                    np.zeros([1,len(Jacobian.polysymbols)], dtype=int), np.array([1]), exponent=polynomial_one, polysymbols=Jacobian.polysymbols, copy=False
-                ),
-                ExponentiatedPolynomial(Jacobian.expolist, Jacobian.coeffs, polysymbols=Jacobian.polysymbols, exponent=polynomial_one, copy=False)
+            symbolic_polynomials_to_decompose.append(
+                Pow(
+                    MaxDegreeFunction(
+                                      poly_name,
+                                      *(elementary_monomials if contour_deformation_polynomial is None else symbolic_deformed_variables),
+                                      maxdegrees=MaxDegreeFunction.get_maxdegrees(
+                                                                                      sector.cast[i].factors[1],
+                                                                                      indices=None if contour_deformation_polynomial is None else regulator_indices,
+                                                                                      ignore_subclass=True
+                                                                                 )
+                                      ),
+                    Expression(sector.cast[i].factors[1].exponent, symbols_polynomials_to_decompose),
+                    copy = False
+                )
             )
-    decomposition.refactorize(Jacobian)
+            names_polynomials_to_decompose.append(poly_name)
+
+        # convert all coefficients to pySecDec expressions
+        parse_coeffs(sector, symbols_polynomials_to_decompose+polynomial_names, symbols_other_polynomials+polynomial_names)
+
+        # remove `polynomial_names` - keep polynomial part symbolic as dummy function:
+        #  - from `other_polynomials`
+        replacements = []
+        for k in range(1, len(reversed_polynomial_names) + 1):
+            replacement = symbolic_polynomials_to_decompose_all_symbols_undeformed[len(polynomial_names)-k]
+            for i in range(k):
+                replacement = replacement.replace(-1, error_token, remove=True)
+            replacements.append(replacement)
+        for replacement in replacements:
+            for i, poly in enumerate(sector.other):
+                poly = poly.replace(-1, replacement, remove=True)
+                for j, coeff in enumerate(poly.coeffs):
+                    poly.coeffs[j] = coeff.simplify()
+                sector.other[i] = poly
+
+        #  - from `polynomials_to_decompose`
+        for i in range(len(polynomials_to_decompose)):
+            # no dependence here, just remove the symbols
+            prod = sector.cast[i]
+            for poly_name in reversed_polynomial_names:
+                prod = prod.replace(-1, error_token, remove=True)
+            sector.cast[i] = prod
+
+        #  - from `Jacobian`
+        Jacobian = sector.Jacobian
+        for poly_name in reversed_polynomial_names:
+            Jacobian = Jacobian.replace(-1, error_token, remove=True)
+
+        #  - from `this_transformations`
+        if not use_symmetries:
+            for i in range(len(all_integration_variables)):
+                for poly_name in reversed_polynomial_names:
+                    this_transformations[i] = this_transformations[i].replace(-1, error_token, remove=True)
+
+        # convert all exponents to pySecDec expressions
+        parse_exponents(sector, symbols_polynomials_to_decompose, symbols_other_polynomials)
+
+        # factorize
+        #  - the polynomials in ``sector.other``
+        for i,to_factorize in enumerate(sector.other):
+            to_factorize = sector.other[i] = \
+                Product(
+                    ExponentiatedPolynomial(
+                        np.zeros([1,len(symbols_other_polynomials)], dtype=int), np.array([1]), to_factorize.exponent.copy(), symbols_other_polynomials, copy=False
+                    ),
+                    to_factorize
+                )
+            decomposition.refactorize(to_factorize)
+
+        #  - the Jacobian
+        Jacobian = \
+                Product(
+                    ExponentiatedPolynomial(
+                        np.zeros([1,len(Jacobian.polysymbols)], dtype=int), np.array([1]), exponent=polynomial_one, polysymbols=Jacobian.polysymbols, copy=False
+                    ),
+                    ExponentiatedPolynomial(Jacobian.expolist, Jacobian.coeffs, polysymbols=Jacobian.polysymbols, exponent=polynomial_one, copy=False)
+                )
+        decomposition.refactorize(Jacobian)
 
     # define symbols for the `other_polynomials --> shorter expressions and faster in python
     symbolic_other_polynomials = [
@@ -1099,174 +1648,203 @@ def _process_secondary_sector(environment):
     # call the subtraction routines
     # Integrate by parts until the `ibp_power_goal` is reached,
     # then do the original subtraction (`integrate_pole_part`).
-    after_ibp = integrate_by_parts(subtraction_initializer, ibp_power_goal_this_primary_sector, integration_variable_indices)
-    subtracted = []
-    for item in after_ibp:
-        subtracted.extend(  integrate_pole_part(item, *integration_variable_indices)  )
-
-    # intialize expansion
-    pole_parts = [s.factors[1].simplify() for s in subtracted]
-    regular_parts = [Product( *([s.factors[0]] + s.factors[2:]), copy=False ) for s in subtracted]
-
-    # expand poles
-    integrand_summands = []
-    for i,(regular,singular) in enumerate(zip(regular_parts, pole_parts)):
-        # must expand every term to the requested order plus the highest pole it multiplies
-        # We calculated the highest pole order of the prefactor (variable ``highest_prefactor_pole_orders``) above.
-        # In addition, we have to take the poles of the current term into account.
+    with stage_timer('integrate_by_parts') as stage:
+        after_ibp = integrate_by_parts(subtraction_initializer, ibp_power_goal_this_primary_sector, integration_variable_indices)
+        stage['terms'] = len(after_ibp)
+
+    with stage_timer('integrate_pole_part') as stage:
+        subtracted = []
+        for item in after_ibp:
+            subtracted.extend(  integrate_pole_part(item, *integration_variable_indices)  )
+        stage['terms'] = len(subtracted)
+
+    with stage_timer('expansion') as stage:
+        # intialize expansion
+        pole_parts = [s.factors[1].simplify() for s in subtracted]
+        regular_parts = [Product( *([s.factors[0]] + s.factors[2:]), copy=False ) for s in subtracted]
+
+        # expand poles
+        integrand_summands = []
+        for i,(regular,singular) in enumerate(zip(regular_parts, pole_parts)):
+            # must expand every term to the requested order plus the highest pole it multiplies
+            # We calculated the highest pole order of the prefactor (variable ``highest_prefactor_pole_orders``) above.
+            # In addition, we have to take the poles of the current term into account.
 
-        try:
-            singular_expanded = expand_singular(Product(singular, copy=False), regulator_indices, required_orders)
-        except OrderError:
-            coeffs = np.array([_sympy_zero])
-            expolist = np.zeros((1, len(singular.symbols)), dtype=int)
-            expolist[:,regulator_indices] = required_orders
-            singular_expanded = Polynomial(expolist, coeffs, singular.symbols, copy=False)
+            try:
+                singular_expanded = expand_singular(Product(singular, copy=False), regulator_indices, required_orders)
+            except OrderError:
+                coeffs = np.array([_sympy_zero])
+                expolist = np.zeros((1, len(singular.symbols)), dtype=int)
+                expolist[:,regulator_indices] = required_orders
+                singular_expanded = Polynomial(expolist, coeffs, singular.symbols, copy=False)
 
-        highest_poles_current_term = - singular_expanded.expolist[:,regulator_indices].min(axis=0)
-        expansion_orders = required_orders + highest_poles_current_term
+            highest_poles_current_term = - singular_expanded.expolist[:,regulator_indices].min(axis=0)
+            expansion_orders = required_orders + highest_poles_current_term
 
-        try:
-            regular_expanded = expand_Taylor(regular, regulator_indices, expansion_orders)
-        except OrderError:
-            coeffs = np.array([_sympy_zero])
+            try:
+                regular_expanded = expand_Taylor(regular, regulator_indices, expansion_orders)
+            except OrderError:
+                coeffs = np.array([_sympy_zero])
+                expolist = np.zeros((1, len(singular.symbols)), dtype=int)
+                expolist[:,regulator_indices] = expansion_orders
+                regular_expanded = Polynomial(expolist, coeffs, singular.symbols, copy=False)
+
+            if i == 0: # first iteration; ``highest_poles_current_sector`` not yet set
+                highest_poles_current_sector = highest_poles_current_term
+            else:
+                highest_poles_current_sector = np.maximum(highest_poles_current_sector, highest_poles_current_term)
+
+            # multiply as truncated series --> do not compute orders beyond `required_orders`
+            singular_series = TruncatedSeries.from_polynomial(singular_expanded, regulator_indices, required_orders)
+            regular_series = TruncatedSeries.from_polynomial(regular_expanded, regulator_indices, expansion_orders)
+            integrand_summands.append( singular_series.multiply(regular_series, required_orders) )
+
+        # write the integrand as sum of ``<regulator monomial> * <coefficient>``
+        integrand_series = TruncatedSeries.sum(*integrand_summands)
+        integrand_summands = []
+        for position in np.ndindex(*integrand_series.coeffs.shape):
+            coeff = integrand_series.coeffs[position]
+            if not isinstance(coeff, _Expression):
+                if coeff == 0:
+                    continue
+                coeff = Polynomial(np.zeros((1, len(singular.symbols)), dtype=int), np.array([coeff]), singular.symbols, copy=False)
             expolist = np.zeros((1, len(singular.symbols)), dtype=int)
-            expolist[:,regulator_indices] = expansion_orders
-            regular_expanded = Polynomial(expolist, coeffs, singular.symbols, copy=False)
+            expolist[:,regulator_indices] = integrand_series.lowest_orders + position
+            monomial = Polynomial(expolist, np.array([1]), singular.symbols, copy=False)
+            integrand_summands.append( Product(monomial,coeff,copy=False) )
+        if not integrand_summands:
+            integrand_summands.append( Polynomial(np.zeros((1, len(singular.symbols)), dtype=int), np.array([0]), singular.symbols, copy=False) )
 
-        if i == 0: # first iteration; ``highest_poles_current_sector`` not yet set
-            highest_poles_current_sector = highest_poles_current_term
-        else:
-            highest_poles_current_sector = np.maximum(highest_poles_current_sector, highest_poles_current_term)
-
-        integrand_summands.append( Product(singular_expanded,regular_expanded,copy=False) )
-
-    integrand = Sum(*integrand_summands, copy=False)
+        integrand = Sum(*integrand_summands, copy=False)
+        stage['terms'] = len(integrand_summands)
 
     # update the `lowest_orders`
     lowest_orders = np.minimum(lowest_orders, -highest_poles_current_sector)
 
-    # initialize the CFunctions for FORM
-    cal_I_derivative_functions = []
-    contourdef_Jacobian_derivative_functions = []
-    deformed_integration_variable_derivative_functions = []
-    decomposed_polynomial_derivatives = []
-    other_functions = []
-
-    # compute the required derivatives
-    cal_I_derivatives = {}
-    other_derivatives = {}
-    decomposed_derivatives = {}
-    contourdef_Jacobian_derivatives = {}
-    deformed_integration_variable_derivatives = {}
-
-    # python dictionaries are unordered but some insertions depend on others --> need an ordering
-    ordered_cal_I_derivative_names = []
-    ordered_other_derivative_names = []
-    ordered_decomposed_derivative_names = []
-    ordered_contourdef_Jacobian_derivative_names = []
-    ordered_deformed_integration_variable_derivative_names = []
-
-    def update_derivatives(basename, derivative_tracker, full_expression, derivatives=other_derivatives, ordered_derivative_names=ordered_other_derivative_names, functions=other_functions):
-        derivatives[basename] = full_expression # include undifferentiated expression
-        ordered_derivative_names.append(basename)
-        functions.append(basename) # define the symbol as CFunction in FORM
-        for multiindex,expression in derivative_tracker.compute_derivatives(full_expression).items():
-            name = _derivative_muliindex_to_name(basename, multiindex)
-            derivatives[name] = expression
-            ordered_derivative_names.append(name)
-            functions.append(name) # define the symbol as CFunction in FORM
-
-    #  - for cal_I
-    update_derivatives(basename=FORM_names['cal_I'], derivative_tracker=symbolic_cal_I, full_expression=cal_I,
-                       derivatives=cal_I_derivatives, ordered_derivative_names=ordered_cal_I_derivative_names,
-                       functions=cal_I_derivative_functions)
-
-    #  - for the `remainder_expression`
-    update_derivatives(basename=FORM_names['remainder_expression'],
-                       derivative_tracker=symbolic_remainder_expression,
-                       full_expression=this_primary_sector_remainder_expression)
-
-    #  - for the additional factors
-    if contour_deformation_polynomial is not None:
-        update_derivatives(
-            FORM_names['additional_deformation_factor'], # basename
-            symbolic_additional_deformation_factor, # derivative tracker
-            additional_deformation_factor # full_expression
-        )
-        for k,(symbolic_factor,factor) in \
-        enumerate(zip(symbolic_deformation_factors,deformation_factors)):
+    with stage_timer('derivatives') as stage:
+        # initialize the CFunctions for FORM
+        cal_I_derivative_functions = []
+        contourdef_Jacobian_derivative_functions = []
+        deformed_integration_variable_derivative_functions = []
+        decomposed_polynomial_derivatives = []
+        other_functions = []
+
+        # compute the required derivatives
+        cal_I_derivatives = {}
+        other_derivatives = {}
+        decomposed_derivatives = {}
+        contourdef_Jacobian_derivatives = {}
+        deformed_integration_variable_derivatives = {}
+
+        # python dictionaries are unordered but some insertions depend on others --> need an ordering
+        ordered_cal_I_derivative_names = []
+        ordered_other_derivative_names = []
+        ordered_decomposed_derivative_names = []
+        ordered_contourdef_Jacobian_derivative_names = []
+        ordered_deformed_integration_variable_derivative_names = []
+
+        def update_derivatives(basename, derivative_tracker, full_expression, derivatives=other_derivatives, ordered_derivative_names=ordered_other_derivative_names, functions=other_functions):
+            derivatives[basename] = full_expression # include undifferentiated expression
+            ordered_derivative_names.append(basename)
+            functions.append(basename) # define the symbol as CFunction in FORM
+            for multiindex,expression in derivative_tracker.compute_derivatives(full_expression).items():
+                name = _derivative_muliindex_to_name(basename, multiindex)
+                derivatives[name] = expression
+                ordered_derivative_names.append(name)
+                functions.append(name) # define the symbol as CFunction in FORM
+
+        #  - for cal_I
+        update_derivatives(basename=FORM_names['cal_I'], derivative_tracker=symbolic_cal_I, full_expression=cal_I,
+                           derivatives=cal_I_derivatives, ordered_derivative_names=ordered_cal_I_derivative_names,
+                           functions=cal_I_derivative_functions)
+
+        #  - for the `remainder_expression`
+        update_derivatives(basename=FORM_names['remainder_expression'],
+                           derivative_tracker=symbolic_remainder_expression,
+                           full_expression=this_primary_sector_remainder_expression)
+
+        #  - for the additional factors
+        if contour_deformation_polynomial is not None:
             update_derivatives(
-                FORM_names['additional_deformation_factor'] + str(integration_variables[k]), # basename
-                symbolic_factor, # derivative tracker
-                factor, # full_expression
-                deformed_integration_variable_derivatives, # derivatives
-                ordered_deformed_integration_variable_derivative_names, # ordered_derivative_names
-                deformed_integration_variable_derivative_functions # functions
+                FORM_names['additional_deformation_factor'], # basename
+                symbolic_additional_deformation_factor, # derivative tracker
+                additional_deformation_factor # full_expression
             )
+            for k,(symbolic_factor,factor) in \
+            enumerate(zip(symbolic_deformation_factors,deformation_factors)):
+                update_derivatives(
+                    FORM_names['additional_deformation_factor'] + str(integration_variables[k]), # basename
+                    symbolic_factor, # derivative tracker
+                    factor, # full_expression
+                    deformed_integration_variable_derivatives, # derivatives
+                    ordered_deformed_integration_variable_derivative_names, # ordered_derivative_names
+                    deformed_integration_variable_derivative_functions # functions
+                )
 
-    #  - for the `other_polynomials`
-    for prod, exponentiated_function, basename in zip(sector.other, symbolic_other_polynomials, names_other_polynomials):
-        _, expression = prod.factors
-        expression.exponent = 1 # exponent is already part of the `tracker`
-        update_derivatives(
-            basename=basename, # name as defined in `polynomial_names` or dummy name
-            derivative_tracker=exponentiated_function.base,
-            full_expression=expression
-        )
-
-    #  - for the `polynomials_to_decompose`
-    for i,symbolic_polynomials in enumerate((symbolic_polynomials_to_decompose,symbolic_polynomials_to_decompose_all_symbols_undeformed)):
-        for prod, exponentiated_function, basename in zip(sector.cast , symbolic_polynomials, names_polynomials_to_decompose):
+        #  - for the `other_polynomials`
+        for prod, exponentiated_function, basename in zip(sector.other, symbolic_other_polynomials, names_other_polynomials):
             _, expression = prod.factors
             expression.exponent = 1 # exponent is already part of the `tracker`
             update_derivatives(
                 basename=basename, # name as defined in `polynomial_names` or dummy name
-                derivative_tracker=exponentiated_function.base if i == 0 else exponentiated_function,
-                full_expression=expression,
-                derivatives=decomposed_derivatives,
-                ordered_derivative_names=ordered_decomposed_derivative_names,
-                functions=decomposed_polynomial_derivatives
+                derivative_tracker=exponentiated_function.base,
+                full_expression=expression
             )
 
-    if contour_deformation_polynomial is not None:
-    #  - for the contour deformation Jacobian
-        update_derivatives(
-            FORM_names['contourdef_Jacobian'], # basename
-            symbolic_contourdef_Jacobian, # derivative tracker
-            contourdef_Jacobian_determinant, # full_expression
-            contourdef_Jacobian_derivatives, # derivatives
-            ordered_contourdef_Jacobian_derivative_names, # ordered_derivative_names
-            contourdef_Jacobian_derivative_functions # functions
-        )
-        # deformed variable derivative tracker is copied in ``parallel_det(contourdef_Jacobian, pool)``
-        #   --> make sure all required derivatives are generated anyway
-        for undeformed_name,deformed_variable in zip(integration_variables,symbolic_deformed_variables):
-            for j in range(len(integration_variables)):
-                symbolic_contourdef_Jacobian.compute_derivatives(deformed_variable.derive(j))
-
-    #  - for the deformed integration variables
-        for undeformed_name,deformed_variable,derivative_tracker in zip(integration_variables,deformed_integration_parameters,symbolic_deformed_variables):
+        #  - for the `polynomials_to_decompose`
+        for i,symbolic_polynomials in enumerate((symbolic_polynomials_to_decompose,symbolic_polynomials_to_decompose_all_symbols_undeformed)):
+            for prod, exponentiated_function, basename in zip(sector.cast , symbolic_polynomials, names_polynomials_to_decompose):
+                _, expression = prod.factors
+                expression.exponent = 1 # exponent is already part of the `tracker`
+                update_derivatives(
+                    basename=basename, # name as defined in `polynomial_names` or dummy name
+                    derivative_tracker=exponentiated_function.base if i == 0 else exponentiated_function,
+                    full_expression=expression,
+                    derivatives=decomposed_derivatives,
+                    ordered_derivative_names=ordered_decomposed_derivative_names,
+                    functions=decomposed_polynomial_derivatives
+                )
+
+        if contour_deformation_polynomial is not None:
+        #  - for the contour deformation Jacobian
             update_derivatives(
-                FORM_names['deformed_variable'] + str(undeformed_name), # basename
-                derivative_tracker,
-                deformed_variable, # full_expression
-                deformed_integration_variable_derivatives, # derivatives
-                ordered_deformed_integration_variable_derivative_names, # ordered_derivative_names
-                deformed_integration_variable_derivative_functions # functions
+                FORM_names['contourdef_Jacobian'], # basename
+                symbolic_contourdef_Jacobian, # derivative tracker
+                contourdef_Jacobian_determinant, # full_expression
+                contourdef_Jacobian_derivatives, # derivatives
+                ordered_contourdef_Jacobian_derivative_names, # ordered_derivative_names
+                contourdef_Jacobian_derivative_functions # functions
             )
+            # deformed variable derivative tracker is copied in ``parallel_det(contourdef_Jacobian, pool)``
+            #   --> make sure all required derivatives are generated anyway
+            for undeformed_name,deformed_variable in zip(integration_variables,symbolic_deformed_variables):
+                for j in range(len(integration_variables)):
+                    symbolic_contourdef_Jacobian.compute_derivatives(deformed_variable.derive(j))
+
+        #  - for the deformed integration variables
+            for undeformed_name,deformed_variable,derivative_tracker in zip(integration_variables,deformed_integration_parameters,symbolic_deformed_variables):
+                update_derivatives(
+                    FORM_names['deformed_variable'] + str(undeformed_name), # basename
+                    derivative_tracker,
+                    deformed_variable, # full_expression
+                    deformed_integration_variable_derivatives, # derivatives
+                    ordered_deformed_integration_variable_derivative_names, # ordered_derivative_names
+                    deformed_integration_variable_derivative_functions # functions
+                )
 
-    #  - for the contour deformation polynomial
-        full_expression = sector.cast[contour_deformation_polynomial_index].factors[1]
-        full_expression.exponent = 1 # exponent is already part of the `tracker`
-        update_derivatives(
-            str(contour_deformation_polynomial), # basename
-            symbolic_contour_deformation_polynomial, # derivative tracker
-            full_expression, # full_expression
-            decomposed_derivatives, # derivatives
-            ordered_decomposed_derivative_names, # ordered_derivative_names
-            decomposed_polynomial_derivatives # functions
-        )
+        #  - for the contour deformation polynomial
+            full_expression = sector.cast[contour_deformation_polynomial_index].factors[1]
+            full_expression.exponent = 1 # exponent is already part of the `tracker`
+            update_derivatives(
+                str(contour_deformation_polynomial), # basename
+                symbolic_contour_deformation_polynomial, # derivative tracker
+                full_expression, # full_expression
+                decomposed_derivatives, # derivatives
+                ordered_decomposed_derivative_names, # ordered_derivative_names
+                decomposed_polynomial_derivatives # functions
+            )
+        stage['derivatives'] = len(cal_I_derivatives) + len(other_derivatives) + len(decomposed_derivatives) + \
+                               len(contourdef_Jacobian_derivatives) + len(deformed_integration_variable_derivatives)
 
     # determine which derivatives of the user input ``functions`` are needed and
     # generate the corresponding c++ "function_declarations"
@@ -1276,89 +1854,95 @@ def _process_secondary_sector(environment):
         functions.update(derivative_symbols)
         for derivative_symbol in derivative_symbols:
             function_declarations.add( _make_CXX_function_declaration(derivative_symbol, number_of_arguments) )
-    other_functions.extend(functions)
+    other_functions.extend(sorted(functions))
 
     # remove repetitions in `decomposed_polynomial_derivatives`
-    decomposed_polynomial_derivatives = set(decomposed_polynomial_derivatives)
-    ordered_decomposed_derivative_names = set(ordered_decomposed_derivative_names)
-
-    # generate the function definitions for the insertion in FORM
-    if contour_deformation_polynomial is not None:
-        FORM_vanishing_deformed_integration_variable_calls = ''.join(
-                    '  Id %s(' % _derivative_muliindex_to_name(FORM_names['deformed_variable'] + str(outer_var), multiindex) + \
-                    ','.join(str(inner_var) + ('?{0,1}' if i == j else '?') for j,inner_var in enumerate(integration_variables)) + \
-                    ') = %s;\n' % ('0' if np.any(multiindex) else str(outer_var))
-                    if multiindex[i] == 0 else ''
-                for i,outer_var in enumerate(integration_variables)
-            for multiindex in chain([[0]*len(integration_variables)], symbolic_deformed_variables[i].derivative_tracks.keys())
-        )
-        FORM_deformed_integration_variable_definitions = ''.join(
-            _make_FORM_function_definition(
-                name, deformed_integration_variable_derivatives[name], integration_variables, limit=10**6
+    # sort rather than iterate a set; the order of the definitions in the sector headers must not depend on the hash seed
+    decomposed_polynomial_derivatives = sorted(set(decomposed_polynomial_derivatives))
+    ordered_decomposed_derivative_names = sorted(set(ordered_decomposed_derivative_names))
+
+    with stage_timer('FORM_definitions') as stage:
+        # generate the function definitions for the insertion in FORM
+        if contour_deformation_polynomial is not None:
+            FORM_vanishing_deformed_integration_variable_calls = ''.join(
+                        '  Id %s(' % _derivative_muliindex_to_name(FORM_names['deformed_variable'] + str(outer_var), multiindex) + \
+                        ','.join(str(inner_var) + ('?{0,1}' if i == j else '?') for j,inner_var in enumerate(integration_variables)) + \
+                        ') = %s;\n' % ('0' if np.any(multiindex) else str(outer_var))
+                        if multiindex[i] == 0 else ''
+                    for i,outer_var in enumerate(integration_variables)
+                for multiindex in chain([[0]*len(integration_variables)], symbolic_deformed_variables[i].derivative_tracks.keys())
             )
-            for name in ordered_deformed_integration_variable_derivative_names
-        )
-        FORM_contourdef_Jacobian_derivative_definitions = ''.join(
-            _make_FORM_function_definition(
-                name, contourdef_Jacobian_derivatives[name], integration_variables, limit=10**6
+            FORM_deformed_integration_variable_definitions = ''.join(
+                _make_FORM_function_definition(
+                    name, deformed_integration_variable_derivatives[name], integration_variables, limit=10**6
+                )
+                for name in ordered_deformed_integration_variable_derivative_names
             )
-            for name in ordered_contourdef_Jacobian_derivative_names
+            FORM_contourdef_Jacobian_derivative_definitions = ''.join(
+                _make_FORM_function_definition(
+                    name, contourdef_Jacobian_derivatives[name], integration_variables, limit=10**6
+                )
+                for name in ordered_contourdef_Jacobian_derivative_names
+            )
+        FORM_cal_I_definitions = ''.join(
+            _make_FORM_function_definition(name, cal_I_derivatives[name], symbols_other_polynomials, limit=10**6)
+            for name in ordered_cal_I_derivative_names
         )
-    FORM_cal_I_definitions = ''.join(
-        _make_FORM_function_definition(name, cal_I_derivatives[name], symbols_other_polynomials, limit=10**6)
-        for name in ordered_cal_I_derivative_names
-    )
-    FORM_other_definitions = ''.join(
-        _make_FORM_function_definition(name, other_derivatives[name], symbols_remainder_expression, limit=10**6)
-        for name in ordered_other_derivative_names
-    )
-    FORM_decomposed_definitions = ''.join(
-        _make_FORM_function_definition(name, decomposed_derivatives[name], symbols_remainder_expression, limit=10**6)
-        for name in ordered_decomposed_derivative_names
-    )
-
-    # generate list over all occuring orders in the regulators
-    regulator_powers = list( rangecomb(np.zeros_like(required_orders), required_orders + highest_poles_current_sector) )
-    number_of_orders = len(regulator_powers)
-
-    # generate the definitions of the FORM preprocessor variables "shiftedRegulator`regulatorIndex'PowerOrder`shiftedOrderIndex'"
-    regulator_powers = _make_FORM_shifted_orders(regulator_powers)
-
-    # parse template file "sector.h"
-    template_replacements['functions'] = _make_FORM_list(other_functions)
-    template_replacements['cal_I_derivatives'] = _make_FORM_list(cal_I_derivative_functions)
-    template_replacements['decomposed_polynomial_derivatives'] = _make_FORM_list(decomposed_polynomial_derivatives)
-    template_replacements['insert_cal_I_procedure'] = FORM_cal_I_definitions
-    template_replacements['insert_other_procedure'] = FORM_other_definitions
-    template_replacements['insert_decomposed_procedure'] = FORM_decomposed_definitions
-    template_replacements['integrand_definition_procedure'] = _make_FORM_function_definition(internal_prefix+'sDUMMYIntegrand', integrand, args=None, limit=10**6)
-    template_replacements['sector_container_initializer'] = _make_CXX_Series_initialization(regulators, -highest_poles_current_sector,
-                                                                                            required_orders, sector_index,
-                                                                                            contour_deformation_polynomial is not None)
-    template_replacements['highest_regulator_poles'] = _make_FORM_list(highest_poles_current_sector)
-    template_replacements['regulator_powers'] = regulator_powers
-    template_replacements['number_of_orders'] = number_of_orders
-    parse_template_file(os.path.join(template_sources, 'codegen', 'sector.h'), # source
-                        os.path.join(name,             'codegen', 'sector%i.h' % sector_index), # dest
-                        template_replacements)
-
-    if contour_deformation_polynomial is not None:
-        # parse template file "contour_deformation.h"
-        template_replacements['contourdef_Jacobian_derivative_functions'] = _make_FORM_list(contourdef_Jacobian_derivative_functions)
-        template_replacements['deformed_integration_variable_derivative_functions'] = _make_FORM_list(deformed_integration_variable_derivative_functions)
-        template_replacements['contour_deformation_polynomial'] = contour_deformation_polynomial
-        template_replacements['positive_polynomials'] = _make_FORM_list(positive_polynomials)
-        template_replacements['nullify_vanishing_deformed_integration_variable_calls_procedure'] = FORM_vanishing_deformed_integration_variable_calls
-        template_replacements['insert_deformed_integration_variables_procedure'] = FORM_deformed_integration_variable_definitions
-        template_replacements['insert_contourdef_Jacobian_derivatives_procedure'] = FORM_contourdef_Jacobian_derivative_definitions
-        template_replacements['deformation_parameters'] = _make_FORM_list(deformation_parameters)
-        parse_template_file(os.path.join(template_sources, 'codegen', 'contour_deformation.h'), # source
-                            os.path.join(name,             'codegen', 'contour_deformation_sector%i.h' % sector_index), # dest
+        FORM_other_definitions = ''.join(
+            _make_FORM_function_definition(name, other_derivatives[name], symbols_remainder_expression, limit=10**6)
+            for name in ordered_other_derivative_names
+        )
+        FORM_decomposed_definitions = ''.join(
+            _make_FORM_function_definition(name, decomposed_derivatives[name], symbols_remainder_expression, limit=10**6)
+            for name in ordered_decomposed_derivative_names
+        )
+        FORM_integrand_definition = _make_FORM_function_definition(internal_prefix+'sDUMMYIntegrand', integrand, args=None, limit=10**6)
+        stage['characters'] = len(FORM_cal_I_definitions) + len(FORM_other_definitions) + \
+                              len(FORM_decomposed_definitions) + len(FORM_integrand_definition)
+
+    with stage_timer('write_files'):
+        # generate list over all occuring orders in the regulators
+        regulator_powers = list( rangecomb(np.zeros_like(required_orders), required_orders + highest_poles_current_sector) )
+        number_of_orders = len(regulator_powers)
+
+        # generate the definitions of the FORM preprocessor variables "shiftedRegulator`regulatorIndex'PowerOrder`shiftedOrderIndex'"
+        regulator_powers = _make_FORM_shifted_orders(regulator_powers)
+
+        # parse template file "sector.h"
+        template_replacements['functions'] = _make_FORM_list(other_functions)
+        template_replacements['cal_I_derivatives'] = _make_FORM_list(cal_I_derivative_functions)
+        template_replacements['decomposed_polynomial_derivatives'] = _make_FORM_list(decomposed_polynomial_derivatives)
+        template_replacements['insert_cal_I_procedure'] = FORM_cal_I_definitions
+        template_replacements['insert_other_procedure'] = FORM_other_definitions
+        template_replacements['insert_decomposed_procedure'] = FORM_decomposed_definitions
+        template_replacements['integrand_definition_procedure'] = FORM_integrand_definition
+        template_replacements['sector_container_initializer'] = _make_CXX_Series_initialization(regulators, -highest_poles_current_sector,
+                                                                                                required_orders, sector_index,
+                                                                                                contour_deformation_polynomial is not None)
+        template_replacements['highest_regulator_poles'] = _make_FORM_list(highest_poles_current_sector)
+        template_replacements['regulator_powers'] = regulator_powers
+        template_replacements['number_of_orders'] = number_of_orders
+        parse_template_file(os.path.join(template_sources, 'codegen', 'sector.h'), # source
+                            os.path.join(name,             'codegen', 'sector%i.h' % sector_index), # dest
                             template_replacements)
 
+        if contour_deformation_polynomial is not None:
+            # parse template file "contour_deformation.h"
+            template_replacements['contourdef_Jacobian_derivative_functions'] = _make_FORM_list(contourdef_Jacobian_derivative_functions)
+            template_replacements['deformed_integration_variable_derivative_functions'] = _make_FORM_list(deformed_integration_variable_derivative_functions)
+            template_replacements['contour_deformation_polynomial'] = contour_deformation_polynomial
+            template_replacements['positive_polynomials'] = _make_FORM_list(positive_polynomials)
+            template_replacements['nullify_vanishing_deformed_integration_variable_calls_procedure'] = FORM_vanishing_deformed_integration_variable_calls
+            template_replacements['insert_deformed_integration_variables_procedure'] = FORM_deformed_integration_variable_definitions
+            template_replacements['insert_contourdef_Jacobian_derivatives_procedure'] = FORM_contourdef_Jacobian_derivative_definitions
+            template_replacements['deformation_parameters'] = _make_FORM_list(deformation_parameters)
+            parse_template_file(os.path.join(template_sources, 'codegen', 'contour_deformation.h'), # source
+                                os.path.join(name,             'codegen', 'contour_deformation_sector%i.h' % sector_index), # dest
+                                template_replacements)
+
     return lowest_orders, function_declarations, this_pole_structures
 
-def _reduce_sectors_by_symmetries(sectors, message, indices, use_iterative_sort, use_light_Pak_sort, use_Pak, use_dreadnaut, name):
+def _reduce_sectors_by_symmetries(sectors, message, indices, use_iterative_sort, use_light_Pak_sort, use_Pak, use_dreadnaut, workdir):
     '''
     Function that reduces the number of sectors by
     identifying symmetries.
@@ -1376,7 +1960,7 @@ def _reduce_sectors_by_symmetries(sectors, message, indices, use_iterative_sort,
         sectors = decomposition.squash_symmetry_redundant_sectors_sort(sectors, Pak_sort, indices)
         print(message + ' after symmetry finding (full Pak):', len(sectors))
     if use_dreadnaut:
-        sectors = decomposition.squash_symmetry_redundant_sectors_dreadnaut(sectors, indices, use_dreadnaut, os.path.join(name,'dreadnaut_workdir'))
+        sectors = decomposition.squash_symmetry_redundant_sectors_dreadnaut(sectors, indices, use_dreadnaut, workdir)
         print(message + ' after symmetry finding (dreadnaut):', len(sectors))
     return sectors
 
@@ -1389,7 +1973,9 @@ def make_package(name, integration_variables, regulators, requested_orders,
                  form_insertion_depth=5, contour_deformation_polynomial=None, positive_polynomials=[],
                  decomposition_method='iterative_no_primary', normaliz_executable='normaliz',
                  enforce_complex=False, split=False, ibp_power_goal=-1, use_iterative_sort=True,
-                 use_light_Pak=True, use_dreadnaut=False, use_Pak=True, processes=None):
+                 use_light_Pak=True, use_dreadnaut=False, use_Pak=True, processes=None,
+                 polytope_cache=None, optimize_split=False, resume=False, shard=None,
+                 profile=False, memory_limit=None, max_tasks_per_worker=None, dry_run=False):
     r'''
     Decompose, subtract and expand an expression.
     Return it as c++ package.
@@ -1406,7 +1992,14 @@ def make_package(name, integration_variables, regulators, requested_orders,
     :param name:
         string;
         The name of the c++ namepace and the output
-        directory.
+        directory. If the output directory exists
+        already, it is updated in place: Files whose
+        content does not change are left untouched
+        (including their modification time) and the
+        files of sectors that no longer exist are
+        removed. Hence, rebuilding the package after
+        small changes only processes the affected
+        sectors.
 
     :param integration_variables:
         iterable of strings or sympy symbols;
@@ -1559,10 +2152,11 @@ def make_package(name, integration_variables, regulators, requested_orders,
         function :func:`pySecDec.loop_integral.loop_package`.
 
     :param normaliz_executable:
-        string, optional;
+        string or None, optional;
         The command to run `normaliz`. `normaliz` is only
         required if `decomposition_method` starts with
-        'geometric'.
+        'geometric'. Pass ``None`` to use the built-in
+        polytope routines instead of `normaliz`.
         Default: 'normaliz'
 
     :param enforce_complex:
@@ -1590,6 +2184,16 @@ def make_package(name, integration_variables, regulators, requested_orders,
         used as seed to generate the splitting point.
         Default: ``False``
 
+    :param optimize_split:
+        bool, optional;
+        Whether or not to choose the splitting points
+        with the cost model of
+        :func:`pySecDec.decomposition.splitting.optimize_split`
+        instead of randomly. The predicted and the actual
+        number of split sectors are printed. Only
+        relevant if `split` is set.
+        Default: ``False``
+
     :param ibp_power_goal:
         number or iterable of number, optional;
         The `power_goal` that is forwarded to
@@ -1654,6 +2258,110 @@ def make_package(name, integration_variables, regulators, requested_orders,
         `New in version 1.3`.
         Default: ``None``
 
+    :param polytope_cache:
+        string or None, optional;
+        A directory where the results of the polytope
+        computations of the geometric decomposition
+        methods are stored; see
+        :class:`pySecDec.polytope.PolytopeCache`. Results
+        found there are reused, which is useful if
+        several integrals with the same polynomials are
+        generated. Within one call to :func:`.make_package`,
+        identical polytopes are always computed only once.
+        Default: ``None``
+
+    :param resume:
+        bool, optional;
+        Whether or not to make the run resumable and to
+        resume an interrupted run. If ``True``, the
+        progress of :func:`.make_package` is recorded in
+        the file "make_package_journal.pickle" in the
+        output directory: the decomposed and
+        symmetry-reduced sectors and the results of the
+        finished sectors. If the journal exists already,
+        the sectors are read from the journal, the
+        finished sectors are skipped, and only the
+        remaining sectors and the global files are
+        generated. The input must be identical to the
+        interrupted run, which must also have been
+        started with ``resume=True``. The journal is
+        removed once the package is complete.
+        Default: ``False``
+
+    :param shard:
+        tuple ``(k, n)`` of integers with ``0 <= k < n``, optional;
+        Generate only the sectors with
+        ``sector_index % n == k``. This allows to distribute
+        the generation of a package over `n` jobs, e.g. on
+        different nodes of a cluster that share the output
+        directory. Every shard performs the (deterministic)
+        decomposition but processes only its own sectors.
+        Instead of the global files, a shard writes the
+        manifest "shard_<k>_of_<n>.pickle" to the output
+        directory. Once all shards are done, call
+        :func:`.merge_package` to write the global files.
+        Default: ``None``; i.e. generate all sectors
+
+    :param profile:
+        bool or ``'memory'``, optional;
+        Whether or not to record the wall time, the CPU
+        time, and the sizes of the intermediate
+        expressions of every stage of the computation
+        for every sector. If ``'memory'``, also record
+        the peak memory of every stage using
+        :mod:`tracemalloc`, which slows down the
+        computation considerably. The records are
+        written to "make_package_timings.jsonl" in the
+        output directory. See
+        :func:`pySecDec.code_writer.profiling.summarize_timings`.
+        Default: ``False``
+
+    :param memory_limit:
+        integer or string, optional;
+        The memory that the worker processes processing
+        the sectors may use together; in bytes or as
+        string with one of the suffixes "K", "M", "G",
+        and "T", e.g. ``'16G'``. Sectors are only started
+        if their predicted memory fits into the limit
+        next to the sectors that are running. If the
+        limit is exceeded, the worker with the largest
+        memory is stopped and its sector is retried
+        later without other sectors running. The same
+        applies to sectors whose worker is killed by
+        the operating system. Until the first sector is
+        done, the sectors are processed one at a time.
+        The memory is monitored through the "/proc"
+        filesystem (Linux); without it, the limit is
+        ignored.
+        Default: ``None``; i.e. no limit
+
+    :param max_tasks_per_worker:
+        integer, optional;
+        The number of sectors a worker process handles
+        before it is replaced by a fresh process. This
+        releases the memory that accumulates in the
+        caches of long running workers.
+        Default: ``None``; i.e. workers live as long as
+        the pool
+
+    :param dry_run:
+        bool, optional;
+        Whether or not to only estimate the size of the
+        package. If ``True``, only the decomposition and
+        the symmetry finding are performed. The properties
+        of every sector (the number of integration
+        variables and terms, the pole orders, whether
+        the contour is deformed, and the orders to
+        which the sector must be expanded) and the time
+        predicted for the generation of the sectors (see
+        :func:`pySecDec.code_writer.profiling.predict_time`)
+        are written to "make_package_dry_run.json" in the
+        output directory. The time spent in FORM and in the
+        compilation is not predicted. No other files are written and
+        the journal is neither read nor written.
+        Return the report as dictionary.
+        Default: ``False``
+
     '''
     print('running "make_package" for "' + name + '"')
 
@@ -1673,20 +2381,61 @@ def make_package(name, integration_variables, regulators, requested_orders,
                    form_work_space, form_insertion_depth, contour_deformation_polynomial,
                    positive_polynomials, decomposition_method)
 
+    # identify the input to make sure that a journal is only used for the same input
+    fingerprint = hashlib.sha1(repr([
+        str(item) for item in (
+            version, name, integration_variables, regulators, requested_orders,
+            polynomials_to_decompose, polynomial_names, other_polynomials, prefactor,
+            remainder_expression, functions, real_parameters, complex_parameters,
+            form_optimization_level, form_work_space, form_insertion_depth,
+            contour_deformation_polynomial, positive_polynomials, decomposition_method,
+            sorted((str(variable), power_goal) for variable,power_goal in ibp_power_goal.items()),
+            split, use_iterative_sort, use_light_Pak, use_dreadnaut, use_Pak, optimize_split
+        )
+    ]).encode('utf-8')).hexdigest()
+
+    # every shard uses its own journal and scratch directories
+    if shard is None:
+        shard_suffix = ''
+    else:
+        shard_index, number_of_shards = shard
+        if not 0 <= shard_index < number_of_shards:
+            raise ValueError('Invalid `shard` %s. Must be ``(k, n)`` with ``0 <= k < n``.' % (shard,))
+        shard_suffix = '_shard_%i_of_%i' % (shard_index, number_of_shards)
+    normaliz_workdir = os.path.join(name, 'normaliz_workdir' + shard_suffix)
+    dreadnaut_workdir = os.path.join(name, 'dreadnaut_workdir' + shard_suffix)
+
+    # keep a journal only if requested; resume only if there is a journal
+    journal_filename = os.path.join(name, 'make_package_journal' + shard_suffix + '.pickle')
+    keep_journal = bool(resume) and not dry_run
+    resume = keep_journal and os.path.isfile(journal_filename)
+    if resume:
+        print('resuming from "' + journal_filename + '"')
+
+    # remove scratch directories that an interrupted run may have left behind
+    for workdir in [normaliz_workdir, dreadnaut_workdir]:
+        if os.path.isdir(workdir):
+            shutil.rmtree(workdir)
+
     # construct the c++ type "nested_series_t"
     # for two regulators, the resulting code should read:
     # "secdecutil::Series<secdecutil::Series<T>>"
     nested_series_type = 'secdecutil::Series<' * len(regulators) + 'T' + '>' * len(regulators)
 
-    # configure the template parser and parse global files
-    template_sources, template_replacements, file_renamings = \
-        _parse_global_templates(
-        name, regulators, polynomial_names,
-        real_parameters, complex_parameters, form_optimization_level,
-        form_work_space, form_insertion_depth, requested_orders,
-        contour_deformation_polynomial, nested_series_type,
-        enforce_complex
-    )
+    if dry_run:
+        # only the report is written
+        if not os.path.isdir(name):
+            os.makedirs(name)
+    else:
+        # configure the template parser and parse global files
+        template_sources, template_replacements, file_renamings = \
+            _parse_global_templates(
+            name, regulators, polynomial_names,
+            real_parameters, complex_parameters, form_optimization_level,
+            form_work_space, form_insertion_depth, requested_orders,
+            contour_deformation_polynomial, nested_series_type,
+            enforce_complex
+        )
 
     # get the highest poles from the ``prefactor``
     highest_prefactor_pole_orders = -np.array([lowest_order(prefactor, regulator) for regulator in regulators])
@@ -1695,7 +2444,7 @@ def make_package(name, integration_variables, regulators, requested_orders,
     required_orders = requested_orders + highest_prefactor_pole_orders
 
     # get the decomposition routines
-    strategy = get_decomposition_routines(decomposition_method, normaliz_executable, os.path.join(name,'normaliz_workdir'))
+    strategy = get_decomposition_routines(decomposition_method, normaliz_executable, normaliz_workdir, processes, PolytopeCache(polytope_cache))
 
     # get dreadnaut command if desired
     if use_dreadnaut:
@@ -1740,6 +2489,22 @@ def make_package(name, integration_variables, regulators, requested_orders,
 
         original_decomposition_strategies = strategy
 
+        # predicted and actual number of sectors after splitting with `optimize_split`
+        split_sector_counts = [0, 0]
+
+        def split_singular(sector, indices):
+            if not optimize_split:
+                return list( decomposition.splitting.split_singular(sector, split, indices) )
+
+            singular_parameters, splitting_point, predicted_number_of_sectors = decomposition.splitting.optimize_split(sector, indices)
+            split_sectors = list( decomposition.splitting.split_at(sector, splitting_point, *singular_parameters) )
+            if singular_parameters:
+                # the prediction includes another split of the sectors that are still singular at one
+                split_sector_counts[0] += predicted_number_of_sectors
+                split_sector_counts[1] += len(split_sectors) + \
+                    sum(1 for split_sector in split_sectors if decomposition.splitting.find_singular_parameters(split_sector, indices))
+            return split_sectors
+
         def primary_decomposition_with_splitting(sector, indices):
             # investigate symmetries before the split
             if use_symmetries:
@@ -1752,7 +2517,7 @@ def make_package(name, integration_variables, regulators, requested_orders,
                     use_light_Pak,
                     use_Pak,
                     dreadnaut_executable if use_dreadnaut else False,
-                    name
+                    dreadnaut_workdir
                 )
             else:
                 primary_sectors = original_decomposition_strategies['primary'](sector, indices)
@@ -1762,11 +2527,11 @@ def make_package(name, integration_variables, regulators, requested_orders,
         def secondary_decomposition_with_splitting(sector, indices, split_sectors=None):
             if split_sectors is None:
                 # split and decompose the `sector`
-                split_sectors = decomposition.splitting.split_singular(sector, split, indices)
+                split_sectors = split_singular(sector, indices)
             for split_sector in split_sectors:
                 for decomposed_sector in original_decomposition_strategies['secondary'](split_sector, indices):
                     # check if another split is necessary
-                    split_decomposed_sector = list( decomposition.splitting.split_singular(decomposed_sector, split, indices) )
+                    split_decomposed_sector = split_singular(decomposed_sector, indices)
                     if len(split_decomposed_sector) == 1:
                         yield decomposed_sector
                     else:
@@ -1779,11 +2544,17 @@ def make_package(name, integration_variables, regulators, requested_orders,
     # initialize the counter
     sector_index = 0
 
+    # identify the sectors in the order of their `sector_index`; see :func:`.merge_package`
+    sector_list_hash = hashlib.sha1()
+
     # initialize the global lowest orders
     lowest_orders = requested_orders.copy()
 
-    # initialize list of pole structures
-    pole_structures = []
+    # initialize the pole structures of the sectors by `sector_index`
+    pole_structures = {}
+
+    # initialize the statistics of the sectors collected in a dry run
+    sector_statistics = []
 
     # define the imaginary unit
     imaginary_unit = sympify_expression('I')
@@ -1842,7 +2613,7 @@ def make_package(name, integration_variables, regulators, requested_orders,
                 use_light_Pak,
                 use_Pak,
                 dreadnaut_executable if use_dreadnaut else False,
-                name
+                dreadnaut_workdir
             )
 
         # rename the `integration_variables` in all `primary_sectors` --> must have the same names in all primary sectors
@@ -1861,10 +2632,15 @@ def make_package(name, integration_variables, regulators, requested_orders,
     else: # if we cannot take advantage of symmetries
         primary_sectors_to_consider = strategy['primary'](initial_sector, range(len(integration_variables)))
 
-    # initialize the multiprocessing pool to process the `secondary_sectors` in parallel
-    pool = Pool(processes)
+    # record the progress to be able to resume
+    journal = _Journal(journal_filename if keep_journal else None, fingerprint, resume)
+
+    # record the time spent in the different stages if desired
+    main_timer = StageTimer(profile == 'memory')
+    if profile:
+        timings_file = open(os.path.join(name, 'make_package_timings' + shard_suffix + '.jsonl'), 'a' if resume else 'w')
 
-    # ty-finally blcok to make sure that the pool is closed
+    # try-finally block to make sure that the journal is closed
     try:
         for primary_sector_index, primary_sector in enumerate(primary_sectors_to_consider):
 
@@ -1874,6 +2650,46 @@ def make_package(name, integration_variables, regulators, requested_orders,
             symbols_remainder_expression = integration_variables + regulators
             all_symbols = integration_variables + regulators + polynomial_names
 
+            with main_timer('decomposition', primary_sector=primary_sector_index) as stage:
+                if primary_sector_index in journal.sectors:
+                    # the decomposition has been done in an interrupted run
+                    secondary_sectors = journal.sectors[primary_sector_index]
+                elif use_symmetries and not split:
+                    # search for symmetries throughout the secondary decomposition
+                    indices = range(len(integration_variables))
+                    secondary_sectors = []
+                    for symmetric_primary_sector in primary_sectors:
+                        secondary_sectors.extend( strategy['secondary'](symmetric_primary_sector, indices) )
+                    secondary_sectors = _reduce_sectors_by_symmetries\
+                    (
+                        secondary_sectors,
+                        'total number sectors',
+                        indices,
+                        use_iterative_sort,
+                        use_light_Pak,
+                        use_Pak,
+                        dreadnaut_executable if use_dreadnaut else False,
+                        dreadnaut_workdir
+                    )
+                else:
+                    secondary_sectors = list( strategy['secondary'](primary_sector, range(len(integration_variables))) )
+                if primary_sector_index not in journal.sectors:
+                    journal.record_sectors(primary_sector_index, secondary_sectors)
+                stage['sectors'] = len(secondary_sectors)
+
+            if dry_run:
+                # only collect the statistics of the sectors
+                for this_sector_index, sector in enumerate(secondary_sectors, sector_index + 1):
+                    this_sector_statistics = _sector_statistics(sector, len(integration_variables), regulators, contour_deformation_polynomial is not None)
+                    this_sector_statistics['sector'] = this_sector_index
+                    this_sector_statistics['primary_sector'] = primary_sector_index
+                    sector_statistics.append(this_sector_statistics)
+                sector_index = sector_index + len(secondary_sectors)
+                if profile:
+                    write_records(main_timer.records, timings_file)
+                    main_timer.records = []
+                continue
+
             # define `integration_variables` in the template system
             template_replacements['number_of_integration_variables'] = len(integration_variables)
             template_replacements['integration_variables'] = _make_FORM_list(integration_variables)
@@ -1961,7 +2777,14 @@ def make_package(name, integration_variables, regulators, requested_orders,
                 for i in range(len(integration_variables)):
                     for j in range(len(integration_variables)):
                         contourdef_Jacobian[i,j] = symbolic_deformed_variables[i].derive(j).simplify()
-                contourdef_Jacobian_determinant = parallel_det(contourdef_Jacobian, pool)
+                # the worker pool for the `secondary_sectors` needs the determinant --> use a separate pool before
+                det_pool = Pool(processes)
+                try:
+                    contourdef_Jacobian_determinant = parallel_det(contourdef_Jacobian, det_pool)
+                    det_pool.close()
+                finally:
+                    det_pool.terminate()
+                    det_pool.join()
 
             # remove `polynomial_names` from the `remainder_expression`
             this_primary_sector_remainder_expression = remainder_expression
@@ -1974,48 +2797,226 @@ def make_package(name, integration_variables, regulators, requested_orders,
                     this_primary_sector_remainder_expression = this_primary_sector_remainder_expression.replace(i,1,remove=True)
                     break
 
-            if use_symmetries and not split:
-                # search for symmetries throughout the secondary decomposition
-                indices = range(len(integration_variables))
-                secondary_sectors = []
-                for primary_sector in primary_sectors:
-                    secondary_sectors.extend( strategy['secondary'](primary_sector, indices) )
-                secondary_sectors = _reduce_sectors_by_symmetries\
-                (
-                    secondary_sectors,
-                    'total number sectors',
-                    indices,
-                    use_iterative_sort,
-                    use_light_Pak,
-                    use_Pak,
-                    dreadnaut_executable if use_dreadnaut else False,
-                    name
-                )
-            else:
-                secondary_sectors = strategy['secondary'](primary_sector, range(len(integration_variables)))
+            # skip the sectors that have been processed in an interrupted run
+            # schedule the most expensive sectors first ("longest processing time first")
+            tasks = []
+            finished_results = []
+            for this_sector_index, sector in enumerate(secondary_sectors, sector_index + 1):
+                sector_list_hash.update( _sector_exponents(sector) )
+                if shard is not None and this_sector_index % number_of_shards != shard_index:
+                    # sector belongs to a different shard
+                    continue
+                if this_sector_index in journal.results:
+                    finished_results.append( (this_sector_index, journal.results[this_sector_index], []) )
+                else:
+                    tasks.append( (this_sector_index, sector) )
+            if finished_results:
+                print('skipping %i sectors that have been processed already' % len(finished_results))
+            costs = dict(
+                (this_sector_index, _estimate_sector_cost(sector, len(integration_variables), regulators, contour_deformation_polynomial is not None))
+                for this_sector_index, sector in tasks
+            )
+            tasks.sort(key=lambda task: -costs[task[0]]) # stable --> sectors with equal cost in the order of the `sector_index`
 
             # process the `secondary_sectors` in parallel
-            lowest_orders_and_function_declarations_and_pole_structures = \
-                pool.map(
-                            _process_secondary_sector,
-                            _make_environment( locals() )
-                        )
+            # send the shared environment only once to every worker process
+            environment = _make_environment( locals() )
+            started_queue = Queue()
+            environment['started_queue'] = started_queue
+            sector_pool = worker_pool(processes, environment, max_tasks_per_worker)
+            progress = _SectorProgress(len(tasks), started_queue)
+            try:
+                # combine the results as they arrive
+                # A chunksize of one makes sure that the workers always pick up the most expensive pending sector.
+                if memory_limit is None:
+                    computed_results = sector_pool.imap_unordered(_process_secondary_sector_in_worker, tasks, 1)
+                else:
+                    computed_results = _imap_memory_bounded(sector_pool, _process_secondary_sector_in_worker, tasks, costs,
+                                                            processes or cpu_count(), _parse_memory_size(memory_limit), progress)
+                for this_sector_index, result, records in chain(finished_results, computed_results):
+                    if this_sector_index not in journal.results:
+                        journal.record_result(this_sector_index, result)
+                        progress.update(this_sector_index)
+                    if profile:
+                        write_records(records, timings_file)
+                    this_lowest_orders, this_function_declarations, this_pole_structure = result
+                    lowest_orders = np.minimum(lowest_orders, this_lowest_orders)
+                    function_declarations.update(this_function_declarations)
+                    pole_structures[this_sector_index] = this_pole_structure
+                sector_pool.close()
+            finally:
+                sector_pool.terminate()
+                sector_pool.join()
 
             # get the `sector_index` after processing the secondary sectors
-            sector_index = sector_index + len(lowest_orders_and_function_declarations_and_pole_structures)
-
-            # update the global `lowest_orders`
-            lowest_orders = np.min([item[0] for item in lowest_orders_and_function_declarations_and_pole_structures],axis=0)
+            sector_index = sector_index + len(secondary_sectors)
 
-            # update the global `function_declarations` and `pole_structures`
-            for item in lowest_orders_and_function_declarations_and_pole_structures:
-                _,f,p = item
-                function_declarations.update(f)
-                pole_structures.append(p)
+            if profile:
+                write_records(main_timer.records, timings_file)
+                main_timer.records = []
 
     finally:
-        # make sure the pool is closed
-        pool.close()
+        # make sure the journal is closed
+        journal.close()
+        if profile:
+            timings_file.close()
+
+    if split and optimize_split:
+        print('number of split sectors predicted by the cost model: %i, actual: %i' % tuple(split_sector_counts))
+
+    if dry_run:
+        return _write_dry_run_report(name, sector_statistics, regulators, required_orders)
+
+    # remove the files of sectors from previous runs that no longer exist
+    _remove_stale_sector_files(name, sector_index)
+
+    # the input to `_write_global_files` that does not depend on the sectors
+    global_data = dict(
+        template_sources = template_sources,
+        template_replacements = template_replacements,
+        regulators = regulators,
+        requested_orders = requested_orders,
+        required_orders = required_orders,
+        highest_prefactor_pole_orders = highest_prefactor_pole_orders,
+        prefactor = prefactor,
+        real_parameters = real_parameters,
+        complex_parameters = complex_parameters,
+        have_dummy_functions = have_dummy_functions,
+        number_of_sectors = sector_index
+    )
+
+    if shard is not None:
+        # write the results of this shard for `merge_package`
+        manifest = dict(global_data, fingerprint=fingerprint, shard=(shard_index, number_of_shards),
+                        sector_list_hash=sector_list_hash.hexdigest(),
+                        lowest_orders=lowest_orders, function_declarations=function_declarations,
+                        pole_structures=pole_structures)
+        manifest_filename = os.path.join(name, 'shard_%i_of_%i.pickle' % (shard_index, number_of_shards))
+        with open(manifest_filename + '.tmp', 'wb') as manifest_file:
+            pickle.dump(manifest, manifest_file, 2)
+        os.rename(manifest_filename + '.tmp', manifest_filename) # atomic --> `merge_package` never reads a partial manifest
+        _remove_journal(journal_filename)
+        print('"' + name + '" shard %i of %i done' % (shard_index, number_of_shards))
+        return template_replacements
+
+    with main_timer('global_files'):
+        template_replacements = _write_global_files(name, lowest_orders=lowest_orders, function_declarations=function_declarations,
+                                                    pole_structures=pole_structures, **global_data)
+    if profile:
+        with open(os.path.join(name, 'make_package_timings' + shard_suffix + '.jsonl'), 'a') as timings_file:
+            write_records(main_timer.records, timings_file)
+
+    # the package is complete --> nothing to resume
+    _remove_journal(journal_filename)
+
+    return template_replacements
+
+def _write_dry_run_report(name, sector_statistics, regulators, required_orders):
+    '''
+    Complete the `sector_statistics` collected by
+    :func:`.make_package` with ``dry_run=True`` by the
+    predicted expansion orders, predict the time required
+    to generate the package, and write the report
+    to "<name>/make_package_dry_run.json".
+    Print a summary and return the report.
+
+    '''
+    for statistics in sector_statistics:
+        # the singular part of a sector must be expanded beyond the `required_orders` by its highest poles
+        statistics['expansion_orders'] = [int(order) for order in required_orders + np.array(statistics['highest_poles'])]
+
+    predicted_time = predict_time(sector_statistics)
+    report = dict(
+        name = name,
+        regulators = [str(regulator) for regulator in regulators],
+        required_orders = [int(order) for order in required_orders],
+        number_of_sectors = len(sector_statistics),
+        predicted_generation_time = predicted_time,
+        sectors = sector_statistics
+    )
+    with open(os.path.join(name, 'make_package_dry_run.json'), 'w') as report_file:
+        json.dump(report, report_file, indent=1, sort_keys=True)
+
+    print('"' + name + '" dry run: %i sectors' % len(sector_statistics))
+    print('    predicted time for the generation: %.0fs' % predicted_time)
+    return report
+
+def merge_package(name, shards):
+    '''
+    Combine the shards of a package generated by
+    :func:`.make_package` with ``shard=(k, n)`` for
+    ``k = 0, ..., n-1``. Read the manifests written by
+    the shards and write the files that depend on all
+    sectors; i.e. "name.hpp", "src/integrands.cpp",
+    "src/pole_structures.cpp", etc.
+    Return the replacements in the template files
+    like :func:`.make_package`.
+
+    :param name:
+        string;
+        The name of the c++ namepace and the output
+        directory that is shared by the shards.
+
+    :param shards:
+        integer;
+        The number of shards `n`.
+
+    '''
+    print('running "merge_package" for "' + name + '"')
+
+    manifest_filenames = [os.path.join(name, 'shard_%i_of_%i.pickle' % (shard_index, shards)) for shard_index in range(shards)]
+    missing_shards = [shard_index for shard_index, manifest_filename in enumerate(manifest_filenames) if not os.path.isfile(manifest_filename)]
+    if missing_shards:
+        raise ValueError('Cannot merge "%s": The shards %s have not finished.' % (name, missing_shards))
+
+    manifests = []
+    for manifest_filename in manifest_filenames:
+        with open(manifest_filename, 'rb') as manifest_file:
+            manifests.append( pickle.load(manifest_file) )
+
+    # all shards must belong to the same package
+    for manifest in manifests[1:]:
+        if manifest['fingerprint'] != manifests[0]['fingerprint'] or manifest['number_of_sectors'] != manifests[0]['number_of_sectors']:
+            raise ValueError('Cannot merge "%s": The shards have been generated for different input.' % name)
+        if manifest['sector_list_hash'] != manifests[0]['sector_list_hash']:
+            raise ValueError('Cannot merge "%s": The shards have enumerated the sectors differently.' % name)
+
+    # combine the results of the shards
+    lowest_orders = manifests[0]['lowest_orders']
+    function_declarations = set()
+    pole_structures = {}
+    for manifest in manifests:
+        lowest_orders = np.minimum(lowest_orders, manifest['lowest_orders'])
+        function_declarations.update(manifest['function_declarations'])
+        pole_structures.update(manifest['pole_structures'])
+    assert len(pole_structures) == manifests[0]['number_of_sectors']
+
+    global_data = dict(manifests[0])
+    for key in ['fingerprint', 'shard', 'sector_list_hash', 'lowest_orders', 'function_declarations', 'pole_structures']:
+        global_data.pop(key)
+
+    return _write_global_files(name, lowest_orders=lowest_orders, function_declarations=function_declarations,
+                               pole_structures=pole_structures, **global_data)
+
+def _write_global_files(name, template_sources, template_replacements, regulators, requested_orders,
+                        required_orders, highest_prefactor_pole_orders, prefactor, real_parameters,
+                        complex_parameters, have_dummy_functions, number_of_sectors, lowest_orders,
+                        function_declarations, pole_structures):
+    '''
+    Write the files of the package that depend on all
+    sectors; i.e. "name.hpp", "integrands.cpp",
+    "prefactor.cpp", "pole_structures.cpp",
+    "functions.hpp", and the pylink files.
+    Return the replacements in the template files.
+
+    :param pole_structures:
+        dict;
+        The pole structures of all sectors keyed by the
+        sector index.
+
+    '''
+    # the `pole_structures` in the order of the sectors
+    pole_structures = [pole_structures[sector_index] for sector_index in range(1,number_of_sectors+1)]
 
     # expand the `prefactor` to the required orders
     print('expanding the prefactor')
@@ -2033,17 +3034,17 @@ def make_package(name, integration_variables, regulators, requested_orders,
                                '>' * (len(regulators) + 2)
 
     # parse the template files "integrands.cpp", "name.hpp", "pole_structures.cpp", "prefactor.cpp", and "functions.hpp"
-    template_replacements['function_declarations'] = '\n'.join(function_declarations)
+    template_replacements['function_declarations'] = '\n'.join(sorted(function_declarations))
     template_replacements['make_integrands_return_t'] = make_integrands_return_t
     template_replacements['prefactor_type'] = prefactor_type
     template_replacements['prefactor_function_body'] = prefactor_function_body
-    template_replacements['number_of_sectors'] = sector_index
+    template_replacements['number_of_sectors'] = number_of_sectors
     template_replacements['lowest_orders'] = _make_FORM_list(lowest_orders)
     template_replacements['highest_orders'] = _make_FORM_list(required_orders)
     template_replacements['lowest_prefactor_orders'] = _make_FORM_list(-highest_prefactor_pole_orders)
     template_replacements['highest_prefactor_orders'] = _make_FORM_list(required_prefactor_orders)
-    template_replacements['integrand_getters'] = ''.join( 'nested_series_t<sector_container_t> get_integrand_of_sector_%i();\n' % i for i in range(1,sector_index+1) )
-    template_replacements['sectors_initializer'] = ','.join( 'get_integrand_of_sector_%i()' % i for i in range(1,sector_index+1) )
+    template_replacements['integrand_getters'] = ''.join( 'nested_series_t<sector_container_t> get_integrand_of_sector_%i();\n' % i for i in range(1,number_of_sectors+1) )
+    template_replacements['sectors_initializer'] = ','.join( 'get_integrand_of_sector_%i()' % i for i in range(1,number_of_sectors+1) )
     template_replacements['pole_structures_initializer'] = str(pole_structures).replace(' ','').replace("'","").replace('[','{').replace(']','}')
     parse_template_file(os.path.join(template_sources, 'name.hpp'), # source
                         os.path.join(name,            name + '.hpp'), # dest
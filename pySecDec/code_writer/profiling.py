@@ -0,0 +1,221 @@
+"""
+Functions to measure where :func:`pySecDec.code_writer.make_package`
+spends its time and memory, and to predict the time required to
+generate a package from a dry run.
+
+"""
+
+from __future__ import print_function
+from contextlib import contextmanager
+from time import time
+import os, json
+
+try:
+    import tracemalloc
+except ImportError: # python 2
+    tracemalloc = None
+
+def _cpu_time():
+    'Return the user plus system time of the current process.'
+    times = os.times()
+    return times[0] + times[1]
+
+class StageTimer(object):
+    '''
+    Record the wall time, the CPU time, and optionally
+    the peak memory of the stages of a computation.
+    Every stage is measured by a context manager that
+    yields the record of the stage. Further quantities
+    such as the sizes of expressions can be added to the
+    record:
+
+        >>> timer = StageTimer(sector=1)
+        >>> with timer('integrate_by_parts') as stage:
+        ...     terms = [1,2,3]
+        ...     stage['terms'] = len(terms)
+        >>> sorted(timer.records[0].keys())
+        ['cpu_time', 'sector', 'stage', 'terms', 'wall_time']
+
+    The stages should not be nested.
+
+    :param trace_memory:
+        bool, optional;
+        Whether or not to record the peak memory
+        allocated by python during every stage (in
+        bytes) using :mod:`tracemalloc`. This slows down
+        the computation considerably. Ignored if
+        :mod:`tracemalloc` is not available.
+        Default: ``False``
+
+    :param labels:
+        Additional entries of every record; e.g. the
+        index of the sector.
+
+    '''
+    def __init__(self, trace_memory=False, **labels):
+        self.trace_memory = bool(trace_memory) and tracemalloc is not None
+        self.labels = labels
+        self.records = []
+
+    @contextmanager
+    def __call__(self, stage, **labels):
+        record = dict(self.labels, stage=stage)
+        record.update(labels)
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            elif hasattr(tracemalloc, 'reset_peak'): # python >= 3.9
+                tracemalloc.reset_peak()
+        start_wall_time = time()
+        start_cpu_time = _cpu_time()
+        try:
+            yield record
+        finally:
+            record['wall_time'] = time() - start_wall_time
+            record['cpu_time'] = _cpu_time() - start_cpu_time
+            if self.trace_memory:
+                record['peak_memory'] = tracemalloc.get_traced_memory()[1]
+            self.records.append(record)
+
+def write_records(records, timings_file):
+    '''
+    Append `records` to the open `timings_file` in the
+    JSON lines format; i.e. one record per line.
+
+    :param records:
+        iterable of dict;
+        The records, e.g. :attr:`StageTimer.records`.
+
+    :param timings_file:
+        file;
+        The file to write to.
+
+    '''
+    for record in records:
+        timings_file.write(json.dumps(record, sort_keys=True) + '\n')
+    timings_file.flush()
+
+def summarize_timings(filename, number_of_slowest=5):
+    '''
+    Summarize the records written by
+    :func:`pySecDec.code_writer.make_package` with
+    ``profile=True``. Return a table of the total and
+    maximal time spent in every stage followed by the
+    slowest sectors.
+
+    :param filename:
+        str;
+        The JSON lines file to summarize; e.g.
+        "<name>/make_package_timings.jsonl".
+
+    :param number_of_slowest:
+        integer, optional;
+        The number of sectors to list with their
+        total time.
+        Default: ``5``
+
+    '''
+    stages = {}
+    time_per_sector = {}
+    with open(filename, 'r') as timings_file:
+        for line in timings_file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            stage = stages.setdefault(record['stage'], dict(count=0, wall_time=0., cpu_time=0., max_wall_time=0., slowest_sector=None, peak_memory=None))
+            stage['count'] += 1
+            stage['wall_time'] += record['wall_time']
+            stage['cpu_time'] += record['cpu_time']
+            if record['wall_time'] >= stage['max_wall_time']:
+                stage['max_wall_time'] = record['wall_time']
+                stage['slowest_sector'] = record.get('sector')
+            if 'peak_memory' in record:
+                stage['peak_memory'] = max(stage['peak_memory'] or 0, record['peak_memory'])
+            if record.get('sector') is not None:
+                time_per_sector[record['sector']] = time_per_sector.get(record['sector'], 0.) + record['wall_time']
+
+    lines = ['%-24s %7s %12s %12s %14s %8s %14s' % ('stage', 'count', 'wall [s]', 'cpu [s]', 'max wall [s]', 'sector', 'peak mem [MB]')]
+    for stage_name, stage in sorted(stages.items(), key=lambda item: -item[1]['wall_time']):
+        lines.append('%-24s %7i %12.2f %12.2f %14.2f %8s %14s' % (
+            stage_name, stage['count'], stage['wall_time'], stage['cpu_time'], stage['max_wall_time'],
+            '-' if stage['slowest_sector'] is None else stage['slowest_sector'],
+            '-' if stage['peak_memory'] is None else '%.1f' % (stage['peak_memory'] / 1024.**2)
+        ))
+    if time_per_sector:
+        lines.append('')
+        lines.append('slowest sectors:')
+        for sector, wall_time in sorted(time_per_sector.items(), key=lambda item: -item[1])[:number_of_slowest]:
+            lines.append('    sector %i: %.2fs' % (sector, wall_time))
+    return '\n'.join(lines)
+
+#: The cost model used by :func:`predict_time` as pair
+#: ``(coefficient, exponent)``. The time (in seconds on a single
+#: core) required to generate a sector is modeled as
+#: ``coefficient * cost**exponent``, where ``cost`` is estimated by
+#: :func:`pySecDec.code_writer.make_package._estimate_sector_cost`.
+#: The model has been fitted to the examples distributed with
+#: pySecDec.
+#:
+#: .. note::
+#:     The time spent in FORM and in the compilation is not
+#:     predicted.
+cost_model = (0.0095, 0.31)
+
+def predict_time(sectors, model=None):
+    '''
+    Predict the time in seconds (on a single core) required
+    to generate the `sectors` in python.
+
+    :param sectors:
+        list of dict;
+        The entry "sectors" of the report written by
+        :func:`pySecDec.code_writer.make_package` with
+        ``dry_run=True``.
+
+    :param model:
+        tuple, optional;
+        The coefficient and the exponent of the cost model.
+        Default: :data:`cost_model`
+
+    '''
+    coefficient, exponent = cost_model if model is None else model
+    return sum(coefficient * sector['cost']**exponent for sector in sectors)
+
+def calibrate_cost_model(report_filename, timings_filename):
+    '''
+    Fit the coefficient of the cost model to a package
+    that has been generated. Return a new model that can
+    be passed to :func:`predict_time`. The exponent is
+    taken from :data:`cost_model`.
+
+    :param report_filename:
+        str;
+        The report written by
+        :func:`pySecDec.code_writer.make_package` with
+        ``dry_run=True``; e.g.
+        "<name>/make_package_dry_run.json".
+
+    :param timings_filename:
+        str;
+        The records written by
+        :func:`pySecDec.code_writer.make_package` with
+        ``profile=True`` for the same input; e.g.
+        "<name>/make_package_timings.jsonl".
+
+    '''
+    exponent = cost_model[1]
+    with open(report_filename, 'r') as report_file:
+        total_cost = sum(sector['cost']**exponent for sector in json.load(report_file)['sectors'])
+
+    measured_time = 0.
+    with open(timings_filename, 'r') as timings_file:
+        for line in timings_file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get('sector') is not None:
+                measured_time += record['wall_time']
+
+    if total_cost == 0:
+        return cost_model
+    return (measured_time / total_cost, exponent)
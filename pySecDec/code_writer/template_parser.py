@@ -15,6 +15,13 @@ def parse_template_file(src, dest, replacements={}):
         If the file specified in `dest` exists, it
         is overwritten without prompt.
 
+    .. note::
+        If `dest` already has the content to be
+        written, it is left untouched. In particular,
+        its modification time is preserved such that
+        ``make`` does not rebuild targets that depend
+        on it.
+
     .. seealso::
         :func:`.parse_template_tree`
 
@@ -45,6 +52,12 @@ def parse_template_file(src, dest, replacements={}):
     # apply replacements
     string = string % replacements
 
+    # do not touch `dest` if it is up to date
+    if os.path.isfile(dest):
+        with open(dest, 'r') as dest_file:
+            if dest_file.read() == string:
+                return
+
     # write parsed file
     with open(dest, 'w') as dest_file:
         dest_file.write(string)
@@ -54,7 +67,8 @@ def parse_template_tree(src, dest, replacements_in_files={}, filesystem_replacem
     Copy a directory tree from `src` to `dest` using
     :func:`.parse_template_file` for each file and
     replacing the filenames according to
-    `filesystem_replacements`.
+    `filesystem_replacements`. Directories that
+    exist already are reused.
 
     .. seealso::
         :func:`.parse_template_file`
@@ -117,7 +131,13 @@ def parse_template_tree(src, dest, replacements_in_files={}, filesystem_replacem
         else:
             this_target_directory = dest
 
-        os.mkdir(this_target_directory)
+        if not os.path.isdir(this_target_directory):
+            try:
+                os.mkdir(this_target_directory)
+            except OSError:
+                # another process may have created the directory in the meantime
+                if not os.path.isdir(this_target_directory):
+                    raise
 
         # parse files
         for source_filename in filenames:
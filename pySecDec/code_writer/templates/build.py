@@ -0,0 +1,362 @@
+'''
+Build the library with a job scheduler that balances
+the number of FORM threads against the number of
+parallel jobs. Run in the directory of this file as
+
+    python build.py [--cores N] [--memory SIZE] [GOAL]
+
+or ``make build-GOAL`` with the variables ``BUILDCORES``
+and ``BUILDMEMORY`` from "Makefile.conf", where ``GOAL``
+is one of "source", "static", "dynamic", and "pylink"
+(default).
+
+The jobs are the FORM runs of the sectors ("sector<id>-stamp"
+in "codegen") and the compilation of the object files in
+"src" and "pylink". Every job is run by the corresponding
+rule of the Makefiles. The remaining steps, e.g. the
+linking, are done by ``make GOAL`` afterwards.
+
+ o The size of a sector is measured by the size of its
+   FORM input; see "codegen/batches.py". The jobs are
+   started in the order of the size of their sector,
+   the largest first. The compilation of the code of
+   a sector is started as soon as FORM is done with it.
+   The files that do not belong to a sector are compiled
+   after all FORM jobs are done.
+ o A FORM job gets as many threads (``FORMTHREADS``) as
+   the share of its sector in the total size of all
+   sectors times the number of cores, at least one. The
+   largest sectors thus get many threads while small
+   sectors run in parallel with one thread each. If
+   fewer cores are idle, the next job gets fewer threads
+   instead of waiting. Compilations use one core.
+ o The peak memory of a job is predicted as the size of
+   its sector times the largest memory per size observed
+   for a job of the same kind so far. A job is only
+   started if the predicted memory of all running jobs
+   fits into the memory budget, or if no other job is
+   running. As long as no job of a kind has finished,
+   only one job of that kind runs at a time. The memory
+   is measured as the proportional set size (PSS) through
+   the "/proc" filesystem such that pages shared between
+   processes are not counted several times; without
+   "/proc", only the number of cores limits the number
+   of jobs.
+
+'''
+
+from __future__ import print_function
+from argparse import ArgumentParser
+from glob import glob
+from math import ceil
+from multiprocessing import cpu_count
+from re import match
+from subprocess import Popen, check_call
+from time import sleep, time
+import os, sys
+
+class Job(object):
+    '''
+    A command to be run by the scheduler.
+
+    :param kind:
+        string;
+        Either "FORM", "compile" (the code of a
+        sector), or "compile_other".
+
+    :param target:
+        list of strings;
+        The directory and the target to be passed
+        to make.
+
+    :param size:
+        integer;
+        The size of the sector in bytes of FORM input.
+        Jobs that do not belong to a sector get the size
+        of the largest sector, i.e. they are started
+        early.
+
+    :param sector_id:
+        string or None;
+        The id of the sector, ``None`` if the job
+        does not belong to a sector.
+
+    '''
+    def __init__(self, kind, target, size, sector_id=None):
+        self.kind = kind
+        self.target = target
+        self.size = size
+        self.sector_id = sector_id
+        self.threads = 1
+        self.peak_memory = 0
+
+def parse_memory_size(size):
+    '''
+    Convert `size` to bytes. The `size` is either
+    an integer or a string with one of the suffixes
+    "K", "M", "G", and "T"; e.g. "500M".
+
+    '''
+    size = size.strip().upper()
+    units = dict(K=1024, M=1024**2, G=1024**3, T=1024**4)
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+def physical_memory():
+    'Return the physical memory in bytes or ``None`` if unknown.'
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def proportional_memory(process_id):
+    '''
+    Return the proportional set size (PSS) of a process
+    in bytes, i.e. its resident memory with every page
+    shared with other processes counted by its share.
+    Return ``None`` if "/proc/<pid>/smaps_rollup" is not
+    available.
+
+    '''
+    try:
+        with open(os.path.join('/proc', str(process_id), 'smaps_rollup'), 'r') as smaps_file:
+            for line in smaps_file:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024 # in kB
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    return None
+
+def process_tree_memory(process_ids):
+    '''
+    Return a dict with the memory in bytes of each
+    process in `process_ids` including all of its
+    descendants. The memory of a process is its
+    proportional set size if available and its resident
+    memory otherwise. Requires the "/proc" filesystem.
+
+    '''
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    parents = {}
+    resident_memory = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(os.path.join('/proc', entry, 'stat'), 'r') as stat_file:
+                fields = stat_file.read().rsplit(')',1)[1].split()
+        except (IOError, OSError, IndexError): # process does not exist (anymore)
+            continue
+        parents[int(entry)] = int(fields[1])
+        resident_memory[int(entry)] = int(fields[21]) * page_size
+
+    memory = dict((process_id, 0) for process_id in process_ids)
+    for process_id, rss in resident_memory.items():
+        ancestor = process_id
+        while ancestor > 1 and ancestor not in memory:
+            ancestor = parents.get(ancestor, 0)
+        if ancestor in memory:
+            pss = proportional_memory(process_id)
+            memory[ancestor] += rss if pss is None else pss
+    return memory
+
+def sector_sizes():
+    'Return the sizes of all sectors and the ids of the sectors that need FORM.'
+    sys.path.insert(0, 'codegen')
+    import batches
+    os.chdir('codegen')
+    try:
+        sizes = {}
+        for filename in glob('sector*.h'):
+            sector_id = match(r'^sector(\d+)\.h$', filename)
+            if sector_id is not None:
+                sizes[sector_id.group(1)] = batches.size(sector_id.group(1))
+        outdated_sectors = batches.outdated_sectors()
+    finally:
+        os.chdir('..')
+    return sizes, outdated_sectors
+
+def FORM_jobs(sizes, outdated_sectors, cores):
+    '''
+    Return the FORM jobs of the `outdated_sectors`. The
+    number of threads of a job is proportional to the
+    size of its sector such that the sectors together
+    get about `cores` threads, at least one each.
+
+    '''
+    fair_share = max(sum(sizes[sector_id] for sector_id in outdated_sectors), 1) / float(cores)
+    jobs = []
+    for sector_id in outdated_sectors:
+        job = Job('FORM', ['codegen', 'sector' + sector_id + '-stamp'], sizes[sector_id], sector_id)
+        job.threads = max(1, min(cores, int(ceil(sizes[sector_id] / fair_share))))
+        jobs.append(job)
+    return jobs
+
+def compile_jobs(directory, sizes, sector_id=None):
+    '''
+    Return the jobs that compile the outdated object
+    files in `directory`. If `sector_id` is given, only
+    the files of that sector are considered. Otherwise,
+    only the files that do not belong to any sector.
+
+    '''
+    jobs = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.cpp'):
+            continue
+        # e.g. "sector_1.cpp", "sector_1_n1_0.cpp", or "contour_deformation_sector_12_0_1.cpp"
+        sector = match(r'^.*sector_(\d+)(?:_[n0-9_]+)?\.cpp$', filename)
+        if (sector is None) != (sector_id is None) or (sector is not None and sector.group(1) != sector_id):
+            continue
+        object_filename = filename[:-len('.cpp')] + '.o'
+        source_file = os.path.join(directory, filename)
+        object_file = os.path.join(directory, object_filename)
+        if os.path.exists(object_file) and os.path.getmtime(object_file) >= os.path.getmtime(source_file):
+            continue
+        if sector_id is None:
+            jobs.append(Job('compile_other', [directory, object_filename], max(list(sizes.values()) + [1])))
+        else:
+            jobs.append(Job('compile', [directory, object_filename], sizes[sector_id], sector_id))
+    return jobs
+
+def predicted_memory(job, memory_per_size):
+    '''
+    Return the peak memory of `job` in bytes predicted from
+    the largest memory per size observed for its kind so
+    far, at least the memory it already uses.
+
+    '''
+    return max(memory_per_size.get(job.kind, 0.) * job.size, job.peak_memory)
+
+def exceeds_memory(job, running_jobs, memory_per_size, memory):
+    '''
+    Return whether starting `job` in addition to the
+    `running_jobs` may exceed the memory budget `memory`.
+    As long as no job of the kind of `job` has finished,
+    i.e. `memory_per_size` does not contain its kind,
+    `job` is not started in parallel to another job of
+    the same kind.
+
+    '''
+    if memory is None:
+        return False
+    if job.kind not in memory_per_size and any(other.kind == job.kind for other in running_jobs):
+        return True
+    return sum(predicted_memory(other, memory_per_size) for other in running_jobs) + \
+        predicted_memory(job, memory_per_size) > memory
+
+def build(goal='pylink', cores=None, memory=None, make='make', poll_interval=0.2):
+    '''
+    Run the FORM and compilation jobs needed for
+    `goal` and finally ``make goal``.
+
+    :param goal:
+        string;
+        One of "source", "static", "dynamic", and "pylink".
+
+    :param cores:
+        integer, optional;
+        The number of cores to use. Default: all.
+
+    :param memory:
+        integer, optional;
+        The memory budget in bytes. Default: the
+        physical memory.
+
+    :param make:
+        string;
+        The make executable.
+
+    :param poll_interval:
+        float;
+        Time in seconds between checks of the jobs.
+
+    '''
+    cores = cores or cpu_count()
+    memory = memory or physical_memory()
+    have_procfs = os.path.isdir('/proc/self')
+    directories = dict(source=[], static=['src'], dynamic=['src'], pylink=['src','pylink'])[goal]
+
+    # the FORM jobs; let make update "codegen/formopt-stamp" first
+    check_call([make, '-s', '-C', 'codegen', 'formopt-stamp'])
+    sizes, outdated_sectors = sector_sizes()
+    queue = FORM_jobs(sizes, outdated_sectors, cores)
+
+    # the compilation of the code of sectors that FORM is already done with
+    if 'src' in directories:
+        for sector_id in set(sizes).difference(outdated_sectors):
+            queue.extend(compile_jobs('src', sizes, sector_id))
+    remaining_FORM_jobs = len(outdated_sectors)
+    if not remaining_FORM_jobs:
+        for directory in directories:
+            queue.extend(compile_jobs(directory, sizes))
+
+    running = {} # process id -> (job, process)
+    memory_per_size = {} # kind -> largest peak memory per size of the finished jobs
+    failed_jobs = []
+    start_time = time()
+    if not have_procfs:
+        memory = None
+
+    while queue or running:
+        # start jobs, the largest sector first
+        queue.sort(key=lambda job: -job.size)
+        while queue and not failed_jobs:
+            idle_cores = cores - sum(job.threads for job, process in running.values())
+            if running and (idle_cores < 1 or \
+                    exceeds_memory(queue[0], [job for job, process in running.values()], memory_per_size, memory)):
+                break
+            job = queue.pop(0)
+            job.threads = max(1, min(job.threads, idle_cores))
+            command = [make, '-C'] + job.target
+            if job.kind == 'FORM':
+                command.append('FORMTHREADS=' + str(job.threads))
+            print(' '.join(command))
+            sys.stdout.flush()
+            process = Popen(command)
+            running[process.pid] = (job, process)
+
+        sleep(poll_interval)
+
+        # monitor the memory of the running jobs
+        if have_procfs and running:
+            for process_id, rss in process_tree_memory(running.keys()).items():
+                job = running[process_id][0]
+                job.peak_memory = max(job.peak_memory, rss)
+
+        # collect the finished jobs
+        for process_id, (job, process) in list(running.items()):
+            if process.poll() is None:
+                continue
+            del running[process_id]
+            if process.returncode != 0:
+                failed_jobs.append(job)
+                continue
+            if memory is not None:
+                memory_per_size[job.kind] = max(memory_per_size.get(job.kind, 0.), job.peak_memory / float(max(job.size, 1)))
+            if job.kind == 'FORM':
+                remaining_FORM_jobs -= 1
+                if 'src' in directories:
+                    queue.extend(compile_jobs('src', sizes, job.sector_id))
+                if not remaining_FORM_jobs:
+                    for directory in directories:
+                        queue.extend(compile_jobs(directory, sizes))
+
+        if failed_jobs and not running:
+            raise RuntimeError('"' + '", "'.join(' '.join(job.target) for job in failed_jobs) + '" failed.')
+
+    print('scheduled jobs done after {0:.1f}s'.format(time() - start_time))
+    sys.stdout.flush()
+    check_call([make, goal])
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Build the library with FORM threads balanced against parallel jobs.')
+    parser.add_argument('goal', nargs='?', default='pylink', choices=['source','static','dynamic','pylink'])
+    parser.add_argument('--cores', type=int, default=None, help='the number of cores to use; default: all')
+    parser.add_argument('--memory', default=None, help='the memory budget, e.g. "16G"; default: the physical memory')
+    parser.add_argument('--make', default='make', help='the make executable')
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    build(args.goal, args.cores, args.memory and parse_memory_size(args.memory), args.make)
@@ -0,0 +1,130 @@
+'''
+Run FORM for groups of sectors ("batches") instead
+of one make job per sector. This mode is enabled by
+setting the variable ``FORMBATCHSIZE`` in
+"../Makefile.conf".
+
+ o ``python batches.py plan <batch size>``
+   Print the make targets "batch-<id>_<id>_..."
+   of the sectors whose code must be (re)generated.
+   The size of a sector is measured by the size of
+   its FORM input. The sectors are distributed to
+   batches of about ``<batch size>`` bytes such
+   that the batches have similar sizes. If
+   ``<batch size>`` is "auto", the size of the
+   largest sector is used; i.e. no batch takes
+   much longer than the largest sector alone.
+
+ o ``python batches.py run "<FORM call>" <id> <id> ...``
+   Run FORM once for all the sectors, which
+   "write_batch.frm" processes one after the
+   other, move the generated code to "../src", and
+   mark the sectors as done.
+
+The sectors are considered up to date under the
+same conditions as in the "Makefile".
+
+'''
+
+from __future__ import print_function
+from glob import glob
+from math import ceil
+from re import match
+from shlex import split
+from subprocess import check_call
+from sys import argv
+from os import getpid, path, rename
+from mv import move
+
+def inputs(sector_id):
+    'Return the files that the code of the sector `sector_id` is generated from.'
+    filenames = ['sector' + sector_id + '.h', 'write_integrand.frm', 'form.set', 'formopt-stamp']
+    for filename in ['contour_deformation_sector' + sector_id + '.h', 'write_contour_deformation.frm']:
+        if path.exists(filename):
+            filenames.append(filename)
+    return filenames
+
+def is_outdated(sector_id):
+    'Return whether or not the code of the sector `sector_id` must be (re)generated.'
+    stamp = 'sector' + sector_id + '-stamp'
+    if not path.exists(stamp):
+        return True
+    stamp_time = path.getmtime(stamp)
+    return any(path.getmtime(filename) > stamp_time for filename in inputs(sector_id))
+
+def size(sector_id):
+    'Return the size of the FORM input of the sector `sector_id` in bytes.'
+    total_size = 0
+    for filename in ['sector' + sector_id + '.h', 'contour_deformation_sector' + sector_id + '.h']:
+        if path.exists(filename):
+            total_size += path.getsize(filename)
+    return total_size
+
+def outdated_sectors():
+    'Return the ids of the sectors whose code must be (re)generated.'
+    sector_ids = []
+    for filename in glob('sector*.h'):
+        sector = match(r'^sector(\d+)\.h$', filename)
+        if sector is not None and is_outdated(sector.group(1)):
+            sector_ids.append(sector.group(1))
+    return sector_ids
+
+def plan(batch_size):
+    'Return the make targets of the batches of outdated sectors, the largest batch first.'
+    sector_ids = outdated_sectors()
+    if not sector_ids:
+        return []
+
+    sizes = dict((sector_id, size(sector_id)) for sector_id in sector_ids)
+    if batch_size == 'auto':
+        batch_size = max(sizes.values())
+    number_of_batches = min(len(sector_ids), max(1, int(ceil(sum(sizes.values()) / float(batch_size)))))
+
+    # add the largest remaining sector to the smallest batch
+    batches = [[] for i in range(number_of_batches)]
+    batch_sizes = [0] * number_of_batches
+    for sector_id in sorted(sector_ids, key=lambda sector_id: (-sizes[sector_id], int(sector_id))):
+        smallest_batch = batch_sizes.index(min(batch_sizes))
+        batches[smallest_batch].append(sector_id)
+        batch_sizes[smallest_batch] += sizes[sector_id]
+
+    batches = [batches[i] for i in sorted(range(number_of_batches), key=lambda i: -batch_sizes[i])]
+    return ['batch-' + '_'.join(sorted(batch, key=int)) for batch in batches]
+
+def write_sector_program():
+    '''
+    Write "write_integrand_sector.frm", the program of
+    "write_integrand.frm" with the final ".end" replaced
+    by ".store", to be included by "write_batch.frm"
+    once per sector.
+
+    '''
+    with open('write_integrand.frm', 'r') as program_file:
+        lines = program_file.read().rstrip('\n').split('\n')
+    if lines[-1].strip() != '.end':
+        raise RuntimeError('"write_integrand.frm" does not end with ".end".')
+    lines[-1] = '.store'
+    # several batches may run in parallel --> write atomically
+    temporary_filename = 'write_integrand_sector.frm.' + str(getpid())
+    with open(temporary_filename, 'w') as program_file:
+        program_file.write('\n'.join(lines) + '\n')
+    rename(temporary_filename, 'write_integrand_sector.frm')
+
+def run(form_call, sector_ids):
+    'Generate the code of the sectors `sector_ids` in one FORM run called by `form_call`.'
+    write_sector_program()
+    check_call(split(form_call) + ['-D', 'sectorIDs=' + ','.join(sector_ids), 'write_batch.frm'])
+    for sector_id in sector_ids:
+        move(
+                ['sector_' + sector_id + '.cpp'] + glob('*sector_' + sector_id + '_*.hpp') + glob('*sector_' + sector_id + '_*.cpp'),
+                path.join('..', 'src')
+            )
+        open('sector' + sector_id + '-stamp', 'w').close()
+
+if __name__ == '__main__':
+    if argv[1] == 'plan':
+        print(' '.join(plan(argv[2])))
+    elif argv[1] == 'run':
+        run(argv[2], argv[3:])
+    else:
+        raise ValueError('Unknown command "' + argv[1] + '".')
@@ -15,29 +15,30 @@ Move a file with the following modifications:
 
 This is necessary because FORMs formatting
 is incompatible with c++.
-The source is the first, the destination
-is the second command line argument.
+The sources are the first, the destination
+directory is the last command line argument.
 
 '''
 
 from sys import argv
 from os import remove, path
 
-dest_dirname = argv[-1]
-src_filenames = argv[1:-1]
+def move(src_filenames, dest_dirname):
+    for src_filename in src_filenames:
+        dest_filepath = path.join(dest_dirname, src_filename)
+        txt = []
+        with open(src_filename, 'r') as src:
+            for line in src:
+                txt.append(line.strip('\\\t\n '))
+        txt = ''.join(txt).replace("#@SecDecInternalNewline@#",'\n')
+        txt = txt.replace('#@SecDecInternalSpace@#', ' ')
+        txt = txt.replace(';#@no_split_expression@# +=', '+')
+        txt = txt.replace('#@SecDecInternalDblquote@#', '"')
+        txt = txt.replace('#@SecDecInternalEscapedDblquote@#', r'\"')
+        with open(dest_filepath, 'w') as dest:
+            dest.write(txt)
 
-for src_filename in src_filenames:
-    dest_filepath = path.join(dest_dirname, src_filename)
-    txt = []
-    with open(src_filename, 'r') as src:
-        for line in src:
-            txt.append(line.strip('\\\t\n '))
-    txt = ''.join(txt).replace("#@SecDecInternalNewline@#",'\n')
-    txt = txt.replace('#@SecDecInternalSpace@#', ' ')
-    txt = txt.replace(';#@no_split_expression@# +=', '+')
-    txt = txt.replace('#@SecDecInternalDblquote@#', '"')
-    txt = txt.replace('#@SecDecInternalEscapedDblquote@#', r'\"')
-    with open(dest_filepath, 'w') as dest:
-        dest.write(txt)
+        remove(src_filename)
 
-    remove(src_filename)
+if __name__ == '__main__':
+    move(argv[1:-1], argv[-1])
@@ -5,11 +5,17 @@ from .make_package import _convert_input, _make_FORM_definition, \
                           _derivative_muliindex_to_name, _make_FORM_shifted_orders, \
                           _make_CXX_Series_initialization, _validate, \
                           _make_prefactor_function, _make_CXX_function_declaration, \
-                          _make_cpp_list
-from ..algebra import Function, Polynomial, Product, ProductRule, Sum
-from ..misc import sympify_expression
+                          _make_cpp_list, _SectorProgress, _Journal, \
+                          _remove_stale_sector_files, _estimate_sector_cost, _sector_statistics, \
+                          _parse_memory_size, _imap_memory_bounded, _resident_memory, _proportional_memory, \
+                          _make_environment, \
+                          _shared_environment_keys, _contour_deformation_environment_keys
+from ..algebra import Function, Polynomial, ExponentiatedPolynomial, Product, ProductRule, Sum
+from ..decomposition import Sector
+from ..misc import sympify_expression, worker_pool, worker_environment
 from nose.plugins.attrib import attr
-import sys, shutil
+import sys, os, pickle, shutil, subprocess, tempfile, time, json
+from multiprocessing import Queue
 import unittest
 
 python_major_version = sys.version[0]
@@ -90,6 +96,101 @@ class TestMidLevel(TestMakePackage):
 
         self.assertEqual(template_replacements['pole_structures_initializer'], '{{-1,0}}')
 
+    #@attr('active')
+    def test_journal_removed_when_complete(self):
+        self.tmpdir = 'tmpdir_test_journal_removed_when_complete_python' + python_major_version
+        journal_filename = os.path.join(self.tmpdir, 'make_package_journal.pickle')
+        make_package_args = dict(
+                                    name=self.tmpdir,
+                                    integration_variables = ['x','y'],
+                                    regulators = ['eps'],
+
+                                    requested_orders = [0],
+                                    polynomials_to_decompose = ['(x+y)^(-2+eps)']
+                                )
+
+        # without `resume`, no journal is written
+        make_package(**make_package_args)
+        self.assertFalse(os.path.exists(journal_filename))
+
+        # a journal left behind by an interrupted run is removed once the package is complete
+        for resume in (False, True):
+            with open(journal_filename, 'wb') as journal_file:
+                journal_file.write(b'incomplete')
+            make_package(resume=resume, **make_package_args)
+            self.assertFalse(os.path.exists(journal_filename))
+
+    #@attr('active')
+    def test_dry_run(self):
+        self.tmpdir = 'tmpdir_test_dry_run_python' + python_major_version
+
+        report = \
+        make_package(
+                        name=self.tmpdir,
+                        integration_variables = ['x','y'],
+                        regulators = ['eps'],
+
+                        requested_orders = [0],
+                        polynomials_to_decompose = ['(x+y)^(-2+eps)'],
+
+                        dry_run=True
+                    )
+
+        self.assertEqual(report['number_of_sectors'], 1)
+        self.assertEqual(len(report['sectors']), 1)
+        sector = report['sectors'][0]
+        self.assertEqual(sector['sector'], 1)
+        self.assertEqual(sector['pole_orders'], [1,0])
+        self.assertEqual(sector['highest_poles'], [1])
+        self.assertEqual(sector['expansion_orders'], [1])
+        self.assertFalse(sector['contour_deformation'])
+        self.assertTrue(report['predicted_generation_time'] > 0)
+        self.assertFalse('FORM' in json.dumps(report))
+
+        # only the report is written
+        self.assertEqual(os.listdir(self.tmpdir), ['make_package_dry_run.json'])
+        with open(os.path.join(self.tmpdir, 'make_package_dry_run.json'), 'r') as report_file:
+            self.assertEqual(json.load(report_file), report)
+
+    #@attr('active')
+    def test_regenerate_with_other_hash_seed(self):
+        self.tmpdir = 'tmpdir_test_regenerate_with_other_hash_seed_python' + python_major_version
+
+        # generate in fresh processes; the hash seed is fixed at startup
+        script = \
+        '''
+from pySecDec.code_writer import make_package
+make_package(
+                name=%r,
+                integration_variables = ['x0','x1','x2'],
+                regulators = ['eps','alpha'],
+
+                requested_orders = [0,0],
+                polynomials_to_decompose = ['(x0+x1+x2)**(-2+eps)', '(x0*x1+x1*x2+3*x0*x2)**(-1-2*eps+alpha)', 'x0**(alpha-1)'],
+                remainder_expression = 'f(x0,x1)*g(x2)',
+                functions = ['f','g'],
+
+                processes = 1
+            )
+''' % self.tmpdir
+        package_directory = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        def generate(hash_seed):
+            environment = dict(os.environ, PYTHONHASHSEED=str(hash_seed),
+                               PYTHONPATH=os.pathsep.join([package_directory, os.environ.get('PYTHONPATH','')]))
+            with open(os.devnull, 'w') as devnull:
+                subprocess.check_call([sys.executable, '-c', script], env=environment, stdout=devnull)
+
+        generate(1)
+        filenames = [os.path.join('codegen', filename) for filename in os.listdir(os.path.join(self.tmpdir, 'codegen')) if filename.endswith('.h')] + \
+                    [os.path.join('src', filename) for filename in os.listdir(os.path.join(self.tmpdir, 'src'))]
+        for filename in filenames:
+            os.utime(os.path.join(self.tmpdir, filename), (1000000000, 1000000000))
+
+        # the files of an unchanged package must be left untouched
+        generate(2)
+        for filename in filenames:
+            self.assertEqual(os.path.getmtime(os.path.join(self.tmpdir, filename)), 1000000000, filename)
+
 # ----------------------------------- parse input -----------------------------------
 class TestConvertInput(TestMakePackage):
     def setUp(self):
@@ -824,6 +925,167 @@ class TestMiscellaneous(unittest.TestCase):
         target_cpp_list = str() # empty string
         self.assertEqual(cpp_list, target_cpp_list)
 
+    #@attr('active')
+    def test_sector_progress(self):
+        try:
+            from queue import Queue
+        except ImportError: # python 2
+            from Queue import Queue
+        started_queue = Queue()
+        progress = _SectorProgress(3, started_queue)
+        started_queue.put( (1, progress.start_time) )
+        started_queue.put( (2, progress.start_time) )
+
+        progress.update(1)
+        self.assertEqual(sorted(progress.running.keys()), [2])
+
+        # the start of a sector may be reported after it has finished
+        progress.update(3)
+        started_queue.put( (3, progress.start_time) )
+        progress.update(2)
+        self.assertEqual(progress.running, {})
+        self.assertEqual(progress.finished, set([1,2,3]))
+
+    #@attr('active')
+    def test_journal(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'journal')
+            journal = _Journal(filename, 'fingerprint')
+            journal.record_sectors(0, ['sector1', 'sector2'])
+            journal.record_result(1, ([0,-1], set(['f']), [[1,0]]))
+            journal.close()
+
+            # simulate an interruption while writing a record
+            with open(filename, 'ab') as journal_file:
+                journal_file.write(b'\x80\x02(X')
+
+            journal = _Journal(filename, 'fingerprint', resume=True)
+            self.assertEqual(journal.sectors, {0: ['sector1', 'sector2']})
+            self.assertEqual(journal.results, {1: ([0,-1], set(['f']), [[1,0]])})
+            journal.record_result(2, ([0,0], set(), [[0,0]]))
+            journal.close()
+
+            journal = _Journal(filename, 'fingerprint', resume=True)
+            self.assertEqual(sorted(journal.results.keys()), [1,2])
+            journal.close()
+
+            self.assertRaisesRegexp(ValueError, 'different input', _Journal, filename, 'other fingerprint', resume=True)
+
+            # a journal without a complete header gets a new one
+            with open(filename, 'wb') as journal_file:
+                journal_file.write(b'\x80\x02(X')
+            journal = _Journal(filename, 'fingerprint', resume=True)
+            journal.close()
+            self.assertRaisesRegexp(ValueError, 'different input', _Journal, filename, 'other fingerprint', resume=True)
+
+            # without `resume`, the journal is overwritten
+            journal = _Journal(filename, 'other fingerprint')
+            journal.close()
+            journal = _Journal(filename, 'other fingerprint', resume=True)
+            self.assertEqual(journal.sectors, {})
+            self.assertEqual(journal.results, {})
+            journal.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    #@attr('active')
+    def test_remove_stale_sector_files(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(tmpdir, 'codegen'))
+            os.mkdir(os.path.join(tmpdir, 'src'))
+            files = {
+                'codegen' : ['Makefile', 'sector2.h', 'sector2-stamp', 'contour_deformation_sector2.h',
+                             'sector12.h', 'sector12-stamp', 'contour_deformation_sector12.h'],
+                'src' : ['integrands.cpp', 'sector_2.cpp', 'sector_2_n1_0.hpp', 'contour_deformation_sector_2_0.o',
+                         'sector_12.cpp', 'sector_12_n1_0.hpp', 'sector_12_n1_0.o', 'contour_deformation_sector_12_0.cpp']
+            }
+            for directory, filenames in files.items():
+                for filename in filenames:
+                    open(os.path.join(tmpdir, directory, filename), 'w').close()
+
+            _remove_stale_sector_files(tmpdir, 2)
+
+            self.assertEqual(sorted(os.listdir(os.path.join(tmpdir, 'codegen'))),
+                             ['Makefile', 'contour_deformation_sector2.h', 'sector2-stamp', 'sector2.h'])
+            self.assertEqual(sorted(os.listdir(os.path.join(tmpdir, 'src'))),
+                             ['contour_deformation_sector_2_0.o', 'integrands.cpp', 'sector_2.cpp', 'sector_2_n1_0.hpp'])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    #@attr('active')
+    def test_merge_package_checks_shards(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            def write_manifest(shard_index, fingerprint, sector_list_hash='x'):
+                with open(os.path.join(tmpdir, 'shard_%i_of_3.pickle' % shard_index), 'wb') as manifest_file:
+                    pickle.dump(dict(fingerprint=fingerprint, number_of_sectors=3, sector_list_hash=sector_list_hash), manifest_file)
+
+            write_manifest(1, 'a')
+            self.assertRaisesRegexp(ValueError, r'shards \[0, 2\] have not finished', merge_package, tmpdir, 3)
+
+            write_manifest(0, 'a')
+            write_manifest(2, 'b')
+            self.assertRaisesRegexp(ValueError, 'different input', merge_package, tmpdir, 3)
+
+            # same input, but the sectors are numbered differently
+            write_manifest(2, 'a', 'y')
+            self.assertRaisesRegexp(ValueError, 'enumerated the sectors differently', merge_package, tmpdir, 3)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    #@attr('active')
+    def test_parse_memory_size(self):
+        self.assertEqual(_parse_memory_size(1000), 1000)
+        self.assertEqual(_parse_memory_size('1000'), 1000)
+        self.assertEqual(_parse_memory_size('500M'), 500 * 1024**2)
+        self.assertEqual(_parse_memory_size('1.5g'), 3 * 1024**3 // 2)
+
+    #@attr('active')
+    def test_estimate_sector_cost(self):
+        def sector(exponent):
+            # the polynomial factorizes as ``x1**exponent * (x0 + 1)**exponent``
+            return Sector([ExponentiatedPolynomial([(1,1,0),(0,1,0)], ['a','b'], exponent, ['x0','x1','eps'])])
+        regulators = [sympify_expression('eps')]
+
+        costs = [_estimate_sector_cost(sector(exponent), 2, regulators) for exponent in ['eps', '-1+eps', '-3/2+eps', '-2+eps']]
+        self.assertLess(costs[0], costs[1])
+        self.assertEqual(costs[1], costs[2]) # same number of subtraction terms
+        self.assertLess(costs[2], costs[3])
+
+        self.assertEqual(_estimate_sector_cost(sector('-1+eps'), 2, regulators, contour_deformation=True), 2 * costs[1])
+
+    #@attr('active')
+    def test_make_environment(self):
+        local_variables = dict( (key, key) for key in _shared_environment_keys + _contour_deformation_environment_keys )
+        local_variables['journal'] = 'not picklable'
+
+        local_variables['contour_deformation_polynomial'] = None
+        environment = _make_environment(local_variables)
+        self.assertEqual(sorted(environment.keys()), sorted(_shared_environment_keys))
+        self.assertEqual(environment['name'], 'name')
+
+        local_variables['contour_deformation_polynomial'] = 'F'
+        environment = _make_environment(local_variables)
+        self.assertEqual(sorted(environment.keys()), sorted(_shared_environment_keys + _contour_deformation_environment_keys))
+
+    #@attr('active')
+    def test_sector_statistics(self):
+        # the polynomial factorizes as ``x1**exponent * (x0 + 1)**exponent``
+        sector = Sector([ExponentiatedPolynomial([(1,1,0,0),(0,1,0,0)], ['a','b'], '-2+alpha', ['x0','x1','eps','alpha'])],
+                        [Polynomial([(1,0,0,0),(0,1,0,0),(0,0,0,0)], ['c','d','e'], ['x0','x1','eps','alpha'])])
+        regulators = [sympify_expression('eps'), sympify_expression('alpha')]
+
+        statistics = _sector_statistics(sector, 2, regulators, contour_deformation=True)
+
+        self.assertEqual(statistics['integration_variables'], 2)
+        self.assertEqual(statistics['terms'], 5)
+        self.assertEqual(statistics['pole_orders'], [0,2])
+        self.assertEqual(statistics['highest_poles'], [0,2])
+        self.assertTrue(statistics['contour_deformation'])
+        self.assertEqual(statistics['cost'], _estimate_sector_cost(sector, 2, regulators, contour_deformation=True))
+
     #@attr('active')
     def test_make_FORM_shifted_orders(self):
         powers = [(0,0,0), (1,0,0), (0,1,1)]
@@ -844,6 +1106,79 @@ class TestMiscellaneous(unittest.TestCase):
 
         self.assertEqual(FORM_code, target_FORM_code)
 
+# helpers for `TestMemoryBoundedPool`; must be defined at module level to be sent to the worker processes
+def _memory_test_task(task):
+    task_index, action, marker = task
+    worker_environment()['started_queue'].put( (task_index, time.time(), os.getpid()) )
+    if action == 'die_once' and not os.path.exists(marker):
+        open(marker, 'w').close()
+        time.sleep(1) # let the queue deliver the process id
+        os._exit(1)
+    if action == 'allocate':
+        memory = b'x' * 300 * 1024**2
+        time.sleep(5)
+    if action == 'record':
+        with open(os.path.join(marker, str(task_index)), 'w') as record_file:
+            record_file.write('%r\n' % time.time())
+            time.sleep(1)
+            record_file.write('%r\n' % time.time())
+    return task_index, action, []
+
+class TestMemoryBoundedPool(unittest.TestCase):
+    def setUp(self):
+        if not os.path.isdir('/proc/self'):
+            raise unittest.SkipTest('requires the "/proc" filesystem')
+        self.tmpdir = tempfile.mkdtemp()
+        self.started_queue = Queue()
+        self.progress = _SectorProgress(3, self.started_queue)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_tasks(self, tasks, processes, memory_limit):
+        pool = worker_pool(processes, dict(started_queue=self.started_queue))
+        try:
+            costs = dict((task[0], 1.) for task in tasks)
+            return list(_imap_memory_bounded(pool, _memory_test_task, tasks, costs, processes, memory_limit, self.progress, poll_interval=0.1))
+        finally:
+            pool.terminate()
+            pool.join()
+
+    #@attr('active')
+    def test_retry_after_worker_died(self):
+        marker = os.path.join(self.tmpdir, 'died')
+        tasks = [(1, 'ok', marker), (2, 'die_once', marker), (3, 'ok', marker)]
+        results = self.run_tasks(tasks, 2, 10**15)
+        self.assertTrue(os.path.exists(marker))
+        self.assertEqual(sorted(results), [(1, 'ok', []), (2, 'die_once', []), (3, 'ok', [])])
+
+    #@attr('active')
+    def test_memory_limit_exceeded_alone(self):
+        with open('/proc/self/statm', 'r') as statm_file:
+            resident_memory = int(statm_file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        tasks = [(1, 'allocate', None)]
+        self.assertRaisesRegexp(RuntimeError, 'Sector 1 exceeds the `memory_limit`', self.run_tasks, tasks, 1, resident_memory + 100 * 1024**2)
+
+    #@attr('active')
+    def test_one_task_until_memory_known(self):
+        tasks = [(1, 'record', self.tmpdir), (2, 'record', self.tmpdir), (3, 'record', self.tmpdir)]
+        self.assertEqual(sorted(self.run_tasks(tasks, 3, 10**15)), [(i, 'record', []) for i in (1,2,3)])
+        start_time, end_time = {}, {}
+        for task_index in (1,2,3):
+            with open(os.path.join(self.tmpdir, str(task_index)), 'r') as record_file:
+                start_time[task_index], end_time[task_index] = [float(line) for line in record_file]
+
+        # the first task runs alone, the others in parallel once its memory is known
+        self.assertTrue(start_time[2] >= end_time[1])
+        self.assertTrue(start_time[3] >= end_time[1])
+        self.assertTrue(start_time[3] < end_time[2] and start_time[2] < end_time[3])
+
+    #@attr('active')
+    def test_proportional_memory(self):
+        proportional_memory = _proportional_memory(os.getpid())
+        if proportional_memory is not None:
+            self.assertTrue(0 < proportional_memory <= _resident_memory(os.getpid()))
+
 class TestWriteCppCodePrefactor(unittest.TestCase):
     #@attr('active')
     def test_one_regulator(self):
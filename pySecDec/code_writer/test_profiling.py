@@ -0,0 +1,98 @@
+from __future__ import print_function
+from .profiling import *
+from nose.plugins.attrib import attr
+import sys, os, shutil, tempfile, json
+import unittest
+
+class TestStageTimer(unittest.TestCase):
+    #@attr('active')
+    def test_records(self):
+        timer = StageTimer(sector=3)
+        with timer('first') as stage:
+            stage['terms'] = 5
+        with timer('second', primary_sector=0):
+            pass
+
+        self.assertEqual(len(timer.records), 2)
+        self.assertEqual(sorted(timer.records[0].keys()), ['cpu_time', 'sector', 'stage', 'terms', 'wall_time'])
+        self.assertEqual(timer.records[0]['stage'], 'first')
+        self.assertEqual(timer.records[0]['sector'], 3)
+        self.assertEqual(timer.records[0]['terms'], 5)
+        self.assertEqual(timer.records[1]['primary_sector'], 0)
+        for record in timer.records:
+            self.assertGreaterEqual(record['wall_time'], 0)
+
+    #@attr('active')
+    def test_record_on_error(self):
+        timer = StageTimer()
+        def fail():
+            with timer('failing'):
+                raise RuntimeError
+        self.assertRaises(RuntimeError, fail)
+        self.assertEqual([record['stage'] for record in timer.records], ['failing'])
+
+class TestSummarizeTimings(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    #@attr('active')
+    def test_summarize_timings(self):
+        records = [
+                      dict(stage='expansion', sector=1, wall_time=1.0, cpu_time=0.9),
+                      dict(stage='expansion', sector=2, wall_time=3.0, cpu_time=2.9, peak_memory=2*1024**2),
+                      dict(stage='derivatives', sector=2, wall_time=0.5, cpu_time=0.5),
+                      dict(stage='decomposition', primary_sector=0, wall_time=0.25, cpu_time=0.25)
+                  ]
+        filename = os.path.join(self.tmpdir, 'timings.jsonl')
+        with open(filename, 'w') as timings_file:
+            write_records(records, timings_file)
+
+        summary = summarize_timings(filename).split('\n')
+        print('\n'.join(summary))
+
+        # stages ordered by total wall time
+        self.assertEqual([line.split()[0] for line in summary[1:4]], ['expansion', 'derivatives', 'decomposition'])
+        self.assertEqual(summary[1].split(), ['expansion', '2', '4.00', '3.80', '3.00', '2', '2.0'])
+        self.assertEqual(summary[3].split(), ['decomposition', '1', '0.25', '0.25', '0.25', '-', '-'])
+
+        # slowest sectors
+        self.assertEqual(summary[-2:], ['    sector 2: 3.50s', '    sector 1: 1.00s'])
+
+class TestCostModel(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.sectors = [
+                           dict(sector=1, cost=8., terms=4, expansion_orders=[1]),
+                           dict(sector=2, cost=27., terms=8, expansion_orders=[0])
+                       ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    #@attr('active')
+    def test_predict_time(self):
+        self.assertAlmostEqual(predict_time(self.sectors, (1., 1./3.)), 2. + 3.)
+        self.assertAlmostEqual(predict_time(self.sectors), cost_model[0] * (8.**cost_model[1] + 27.**cost_model[1]))
+        self.assertEqual(predict_time([]), 0.)
+
+    #@attr('active')
+    def test_calibrate_cost_model(self):
+        report_filename = os.path.join(self.tmpdir, 'make_package_dry_run.json')
+        with open(report_filename, 'w') as report_file:
+            json.dump(dict(sectors=self.sectors), report_file)
+        timings_filename = os.path.join(self.tmpdir, 'timings.jsonl')
+        with open(timings_filename, 'w') as timings_file:
+            write_records([
+                              dict(stage='expansion', sector=1, wall_time=1.0, cpu_time=1.0),
+                              dict(stage='expansion', sector=2, wall_time=3.0, cpu_time=3.0),
+                              dict(stage='decomposition', primary_sector=0, wall_time=10.0, cpu_time=10.0)
+                          ], timings_file)
+
+        model = calibrate_cost_model(report_filename, timings_filename)
+        self.assertEqual(model[1], cost_model[1])
+
+        # the calibrated model reproduces the measured time
+        self.assertAlmostEqual(predict_time(self.sectors, model), 4.)
@@ -120,3 +120,29 @@ class TestTemplateParsing(unittest.TestCase):
             inserting string: Hello world'''
 
             self.assertEqual(parsed, target_parsed)
+
+    #@attr('active')
+    def test_keep_unchanged_files(self):
+        # create template file tree
+        path_to_template_tree = os.path.join(self.tmpdir, 'templates')
+        os.mkdir(path_to_template_tree)
+        for filename in ['file1', 'file2']:
+            with open(os.path.join(path_to_template_tree, filename), 'w') as template_file:
+                template_file.write(filename + ': %%(%s)i' % filename)
+
+        path_to_parsed_tree = os.path.join(self.tmpdir, 'parsed_tree')
+        path_to_parsed_file_1 = os.path.join(path_to_parsed_tree, 'file1')
+        path_to_parsed_file_2 = os.path.join(path_to_parsed_tree, 'file2')
+        parse_template_tree(path_to_template_tree, path_to_parsed_tree, dict(file1=1, file2=2))
+
+        # set the modification times to the past
+        for path_to_parsed_file in (path_to_parsed_file_1, path_to_parsed_file_2):
+            os.utime(path_to_parsed_file, (1000000000, 1000000000))
+
+        # parse again into the existing tree; only "file2" changes
+        parse_template_tree(path_to_template_tree, path_to_parsed_tree, dict(file1=1, file2=3))
+
+        self.assertEqual(os.path.getmtime(path_to_parsed_file_1), 1000000000)
+        self.assertNotEqual(os.path.getmtime(path_to_parsed_file_2), 1000000000)
+        with open(path_to_parsed_file_2, 'r') as parsed_file:
+            self.assertEqual(parsed_file.read(), 'file2: 3')
@@ -0,0 +1,206 @@
+from __future__ import print_function
+from nose.plugins.attrib import attr
+import sys, os, shutil, tempfile
+import unittest
+
+templates_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+def _load_script(directory, name):
+    'Import the script "<name>.py" of a generated package from the template `directory`.'
+    # do not leave compiled files in the templates; they would be copied into every package
+    dont_write_bytecode = sys.dont_write_bytecode
+    sys.dont_write_bytecode = True
+    sys.path.insert(0, directory) # also for the imports of the script
+    try:
+        return __import__(name)
+    finally:
+        sys.path.remove(directory)
+        sys.dont_write_bytecode = dont_write_bytecode
+
+build = _load_script(templates_directory, 'build')
+batches = _load_script(os.path.join(templates_directory, 'codegen'), 'batches')
+
+def _write(filename, content='', mtime=1000000000):
+    with open(filename, 'w') as f:
+        f.write(content)
+    os.utime(filename, (mtime, mtime))
+
+class TestBuild(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    #@attr('active')
+    def test_FORM_jobs(self):
+        sizes = {'1': 100, '2': 100, '3': 600, '4': 200, '5': 1000}
+        jobs = build.FORM_jobs(sizes, ['1', '2', '3', '4'], 8)
+        self.assertEqual([job.target for job in jobs], [['codegen', 'sector' + sector_id + '-stamp'] for sector_id in '1234'])
+        self.assertEqual([job.size for job in jobs], [100, 100, 600, 200])
+        self.assertEqual([job.threads for job in jobs], [1, 1, 5, 2])
+
+        self.assertEqual([job.threads for job in build.FORM_jobs(sizes, ['1', '2', '3', '4'], 1)], [1, 1, 1, 1])
+        self.assertEqual([job.threads for job in build.FORM_jobs(sizes, ['3'], 8)], [8])
+
+    #@attr('active')
+    def test_compile_jobs(self):
+        os.mkdir('src')
+        sector_files = {
+                           '1': ['sector_1.cpp', 'sector_1_n1.cpp', 'sector_1_n1_0.cpp', 'contour_deformation_sector_1_0.cpp',
+                                 'optimize_deformation_parameters_sector_1_0.cpp'],
+                           '12': ['sector_12.cpp', 'sector_12_0_1.cpp']
+                       }
+        other_files = ['integrands.cpp', 'pole_structures.cpp']
+        for filename in sum(sector_files.values(), other_files + ['sector_1.hpp', 'sector_1_n1.hpp']):
+            _write(os.path.join('src', filename))
+        sizes = {'1': 10, '12': 20}
+
+        for sector_id, filenames in sector_files.items():
+            jobs = build.compile_jobs('src', sizes, sector_id)
+            self.assertEqual(sorted(job.target[1] for job in jobs), sorted(filename[:-len('.cpp')] + '.o' for filename in filenames))
+            for job in jobs:
+                self.assertEqual((job.kind, job.sector_id, job.size), ('compile', sector_id, sizes[sector_id]))
+
+        jobs = build.compile_jobs('src', sizes)
+        self.assertEqual(sorted(job.target for job in jobs), [['src', 'integrands.o'], ['src', 'pole_structures.o']])
+        for job in jobs:
+            self.assertEqual((job.kind, job.sector_id, job.size), ('compile_other', None, 20))
+
+        # object files that are up to date
+        _write(os.path.join('src', 'sector_12_0_1.o'), mtime=1000000010)
+        _write(os.path.join('src', 'integrands.o'), mtime=1000000010)
+        self.assertEqual([job.target[1] for job in build.compile_jobs('src', sizes, '12')], ['sector_12.o'])
+        self.assertEqual([job.target[1] for job in build.compile_jobs('src', sizes)], ['pole_structures.o'])
+
+    #@attr('active')
+    def test_parse_memory_size(self):
+        self.assertEqual(build.parse_memory_size('1000'), 1000)
+        self.assertEqual(build.parse_memory_size('1.5k'), 1536)
+        self.assertEqual(build.parse_memory_size('2G'), 2 * 1024**3)
+
+    #@attr('active')
+    def test_exceeds_memory(self):
+        big_FORM_job = build.Job('FORM', ['codegen', 'sector1-stamp'], 1000, '1')
+        small_FORM_job = build.Job('FORM', ['codegen', 'sector2-stamp'], 10, '2')
+        compile_job = build.Job('compile', ['src', 'sector_3.o'], 10, '3')
+
+        # without a measurement, only one job of a kind at a time
+        self.assertFalse(build.exceeds_memory(big_FORM_job, [], {}, 10**9))
+        self.assertTrue(build.exceeds_memory(small_FORM_job, [big_FORM_job], {}, 10**9))
+        self.assertFalse(build.exceeds_memory(compile_job, [big_FORM_job], {}, 10**9))
+
+        # the memory already used by a running job counts
+        big_FORM_job.peak_memory = 10**9
+        self.assertTrue(build.exceeds_memory(compile_job, [big_FORM_job], {}, 10**9 - 1))
+        big_FORM_job.peak_memory = 0
+
+        # with a measurement, the jobs are started as long as they fit
+        memory_per_size = dict(FORM=10**5)
+        self.assertTrue(build.exceeds_memory(small_FORM_job, [big_FORM_job], memory_per_size, 10**8))
+        self.assertFalse(build.exceeds_memory(small_FORM_job, [big_FORM_job], memory_per_size, 2*10**8))
+
+        # without a memory budget, everything may be started
+        self.assertFalse(build.exceeds_memory(small_FORM_job, [big_FORM_job], {}, None))
+
+    #@attr('active')
+    def test_process_tree_memory(self):
+        if not os.path.exists('/proc/self/stat'):
+            return
+        memory = build.process_tree_memory([os.getpid()])
+        self.assertEqual(list(memory.keys()), [os.getpid()])
+        self.assertTrue(memory[os.getpid()] > 0)
+
+        # the proportional set size does not exceed the resident memory
+        pss = build.proportional_memory(os.getpid())
+        if pss is not None:
+            with open('/proc/self/statm', 'r') as statm_file:
+                rss = int(statm_file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+            self.assertTrue(0 < pss <= rss)
+
+class TestBatches(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.tmpdir, 'codegen'))
+        os.chdir(os.path.join(self.tmpdir, 'codegen'))
+        for filename in ['write_integrand.frm', 'form.set', 'formopt-stamp']:
+            _write(filename)
+
+        # sectors of size 100, 60, 50, and 10
+        _write('sector1.h', 'x' * 100)
+        _write('sector2.h', 'x' * 60)
+        _write('sector3.h', 'x' * 20)
+        _write('contour_deformation_sector3.h', 'x' * 30)
+        _write('sector4.h', 'x' * 10)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    #@attr('active')
+    def test_size(self):
+        self.assertEqual([batches.size(sector_id) for sector_id in '1234'], [100, 60, 50, 10])
+
+    #@attr('active')
+    def test_is_outdated(self):
+        # no stamp
+        self.assertTrue(batches.is_outdated('2'))
+
+        _write('sector2-stamp', mtime=1000000010)
+        self.assertFalse(batches.is_outdated('2'))
+
+        # an input changed
+        for filename in ['sector2.h', 'formopt-stamp', 'write_contour_deformation.frm']:
+            _write(filename, mtime=1000000020)
+            self.assertTrue(batches.is_outdated('2'))
+            _write(filename)
+
+        # the settings in "../Makefile.conf" are irrelevant
+        _write(os.path.join('..', 'Makefile.conf'), mtime=1000000020)
+        self.assertFalse(batches.is_outdated('2'))
+
+    #@attr('active')
+    def test_plan(self):
+        # the size of the largest sector --> three batches, the sectors 3 and 4 together
+        self.assertEqual(batches.plan('auto'), ['batch-1', 'batch-2', 'batch-3_4'])
+
+        self.assertEqual(batches.plan('1000'), ['batch-1_2_3_4'])
+        self.assertEqual(batches.plan('1'), ['batch-1', 'batch-2', 'batch-3', 'batch-4'])
+
+        # sectors that are up to date
+        for sector_id in '13':
+            _write('sector' + sector_id + '-stamp', mtime=1000000010)
+        self.assertEqual(batches.plan('auto'), ['batch-2', 'batch-4'])
+
+        for sector_id in '24':
+            _write('sector' + sector_id + '-stamp', mtime=1000000010)
+        self.assertEqual(batches.plan('auto'), [])
+
+
+    #@attr('active')
+    def test_run(self):
+        # a "FORM" that logs its arguments and writes the code of the sectors
+        _write('form.py', '\n'.join([
+            'import sys',
+            'with open("calls", "a") as f: f.write(" ".join(sys.argv[1:]) + "\\n")',
+            'for sector_id in sys.argv[2].split("=")[1].split(","):',
+            '    for filename in ["sector_%s.cpp", "sector_%s_0.hpp", "sector_%s_0.cpp"]:',
+            '        open(filename % sector_id, "w").close()',
+        ]))
+        os.mkdir(os.path.join('..', 'src'))
+        _write('write_integrand.frm', '#-\nOff statistics;\n.end\n')
+
+        batches.run(sys.executable + ' form.py', ['1', '3'])
+
+        with open('calls') as f:
+            self.assertEqual(f.read(), '-D sectorIDs=1,3 write_batch.frm\n')
+        # the single-sector program without its ".end" for "write_batch.frm"
+        with open('write_integrand_sector.frm') as f:
+            self.assertEqual(f.read(), '#-\nOff statistics;\n.store\n')
+        self.assertEqual(sorted(os.listdir(os.path.join('..', 'src'))),
+                         ['sector_1.cpp', 'sector_1_0.cpp', 'sector_1_0.hpp', 'sector_3.cpp', 'sector_3_0.cpp', 'sector_3_0.hpp'])
+        self.assertEqual(batches.plan('1'), ['batch-2', 'batch-4'])
@@ -8,7 +8,7 @@ from ..algebra import Polynomial, ExponentiatedPolynomial, Product
 from ..misc import argsort_ND_array, sympify_expression
 import numpy as np
 import sympy as sp
-import subprocess, shutil, os
+import subprocess, shutil, os, zlib
 
 class Sector(object):
     '''
@@ -181,13 +181,20 @@ def _collision_safe_hash(iterable):
     compare equal are equal), alter the hashes
     until there is no collision any more.
 
+    The hashes are computed from the string
+    representation of the objects rather than by
+    :func:`hash`, which depends on the hash seed
+    of the python process. The order of the sectors
+    found by :func:`.squash_symmetry_redundant_sectors_sort`
+    is thus the same in every process.
+
     :param iterable:
         iterable of hashable objects;
         The objects to be hashed.
 
     '''
     objects = np.asarray(iterable)
-    hashes = np.array([hash(i) for i in objects])
+    hashes = np.array([zlib.crc32(str(i).encode('utf-8')) & 0xffffffff for i in objects], dtype=np.int64)
 
     number_of_differing_objects = len( set(objects) )
     number_of_differing_hashes = len( set(hashes) )
@@ -5,8 +5,11 @@ The geometric sector decomposition routines.
 """
 
 from .common import Sector, refactorize
-from ..polytope import convex_hull, triangulate, Polytope
+from ..polytope import convex_hull, triangulate_cones, Polytope
 from ..algebra import Polynomial, ExponentiatedPolynomial, Product
+from ..misc import worker_pool, worker_environment
+from functools import reduce
+from multiprocessing import Pool, cpu_count
 import itertools, numpy as np, sympy as sp
 
 # *********************** primary decomposition ***********************
@@ -38,48 +41,152 @@ def Cheng_Wu(sector, index=-1):
     return Sector(cast, other, Jacobian)
 
 # ********************** geometric decomposition **********************
-def generate_fan(*polynomials):
+def generate_fan(*polynomials, **kwargs):
     '''
     Calculate the fan of the polynomials in the input. The rays of a
     cone are given by the exponent vectors after factoring out a monomial
     together with the standard basis vectors. Each choice of factored out
-    monomials gives a different cone.
+    monomials gives a different cone. The hyperplanes of each cone are
+    sorted lexicographically.
     Only full (:math:`N`-) dimensional cones in :math:`R^N_{\geq 0}` need to be
     considered.
+    The combinations of factored out monomials are processed in blocks
+    using numpy arrays.
 
     :param polynomials:
         abritrarily many instances of :class:`.Polynomial` where
         all of these have an equal number of variables;
         The polynomials to calculate the fan for.
+
+    :param cache:
+        :class:`pySecDec.polytope.PolytopeCache` or None, keyword only;
+        If given, the fan of polynomials with the same
+        exponent vectors is reused and new results are
+        stored in the `cache`.
+        Default: ``None``
+
+    :param processes:
+        integer or None, keyword only;
+        The number of worker processes to generate the
+        cones with if there are many combinations of
+        factored out monomials. If ``None``, the number
+        of CPUs is used.
+        Default: ``1``
     '''
+    cache = kwargs.pop('cache', None)
+    processes = kwargs.pop('processes', 1)
+    if kwargs:
+        raise TypeError('Unexpected keyword argument(s): ' + ', '.join(kwargs))
+
     expolists = [poly.expolist for poly in polynomials]
-    factors = itertools.product(*expolists)
+
+    if cache is not None:
+        key = cache.fingerprint('fan', *expolists)
+        fan = cache.get(key)
+        if fan is None:
+            fan = generate_fan(*polynomials, processes=processes)
+            cache.set(key, fan)
+        return fan
+
     number_of_variables = polynomials[0].number_of_variables
-    identity_polynomial = Polynomial(np.identity(number_of_variables, dtype=int), np.ones(number_of_variables, dtype=int), copy=False)
-    fan = []
+    expolists = [np.asarray(expolist, dtype=np.int64) for expolist in expolists]
+    lengths = [len(expolist) for expolist in expolists]
+    number_of_factors = int(np.prod(lengths))
+
+    # the entries of the candidate hyperplanes are bounded by the spread of the exponents
+    spans = np.ones(number_of_variables, dtype=np.int64)
+    for expolist in expolists:
+        spans = np.maximum(spans, expolist.max(axis=0) - expolist.min(axis=0))
+
+    # process the factor combinations in blocks to bound the memory usage
+    number_of_candidates = sum(lengths) + number_of_variables
+    block_size = max(1, _fan_block_size // (number_of_candidates * number_of_variables))
+    blocks = [(expolists, spans, start, min(start + block_size, number_of_factors)) for start in range(0, number_of_factors, block_size)]
+
+    if processes != 1 and number_of_factors >= _fan_parallel_threshold and len(blocks) > 1:
+        pool = Pool(processes)
+        try:
+            fans = pool.map(_generate_fan_block, blocks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        fans = map(_generate_fan_block, blocks)
 
-    for factor in factors:
-        factor = np.array(factor)
+    return list(itertools.chain.from_iterable(fans))
 
-        # reshape to use numpy's broadcasting
-        cone = np.vstack( tuple(expolists[i] - factor[i].reshape(1,number_of_variables) for i in range(len(polynomials))) )
+# maximal number of integers in the array of candidate hyperplanes of one block in `generate_fan`
+_fan_block_size = 2**22
 
-        # use `Polynomial` class to remove duplicates
-        cone_poly = Polynomial(cone, np.ones(len(cone),dtype=int), copy=False)
-        cone_poly += identity_polynomial # implicit simplify
-        for i,hyperplane in enumerate(cone_poly.expolist):
-            if (hyperplane > 0).all() or (hyperplane == 0).all():
-                cone_poly.coeffs[i] = 0
-        cone = cone_poly.simplify().expolist
+# minimal number of factor combinations for `generate_fan` to use worker processes
+_fan_parallel_threshold = 2**16
 
-        if (
-                len(cone) >= number_of_variables and
-                not (cone < 0).all(axis=1).any() and # if one hyperplane has only negative entries do not append to fan
-                not any( (hyperplane==cone).all(axis=-1).any() for hyperplane in -cone ) # do not append cones that have `hyperplane` and `-hyperplane`
-           ):
-                fan.append(cone)
+def _row_keys(rows, spans):
+    '''
+    Return integer keys for the rows of the three
+    dimensional array `rows` and for their negatives.
+    The keys are ordered like the rows in lexicographical
+    order. The entries in column `j` must be bounded by
+    ``spans[j]`` in absolute value.
 
-    return fan
+    '''
+    bases = [2 * int(span) + 1 for span in spans]
+    if reduce(lambda x,y: x*y, bases, 1) < np.iinfo(np.int64).max // 2:
+        # mixed radix representation with the first column as most significant digit
+        weights = np.array([reduce(lambda x,y: x*y, bases[j+1:], 1) for j in range(len(bases))], dtype=np.int64)
+        return (rows + spans).dot(weights), (spans - rows).dot(weights)
+
+    # the mixed radix representation overflows --> use the ranks instead
+    number_of_variables = rows.shape[-1]
+    all_rows = np.concatenate([rows, -rows]).reshape(-1, number_of_variables)
+    ranks = np.unique(all_rows, axis=0, return_inverse=True)[1].reshape(2, rows.shape[0], rows.shape[1])
+    return ranks[0], ranks[1]
+
+def _generate_fan_block(args):
+    '''
+    Generate the cones of :func:`.generate_fan` for the
+    factor combinations with the (flat) indices from
+    `start` to `stop`.
+
+    '''
+    expolists, spans, start, stop = args
+    number_of_variables = len(spans)
+
+    # `itertools.product` order of the factored out monomials
+    factor_indices = np.unravel_index(np.arange(start, stop), [len(expolist) for expolist in expolists])
+
+    # candidate hyperplanes; shape: (cones, hyperplanes, variables)
+    cones = np.concatenate(
+        [expolist[np.newaxis,:,:] - expolist[indices][:,np.newaxis,:] for expolist, indices in zip(expolists, factor_indices)] +
+        [np.broadcast_to(np.identity(number_of_variables, dtype=np.int64), (stop - start, number_of_variables, number_of_variables))],
+        axis=1
+    )
+
+    # drop hyperplanes that have only positive or only zero entries
+    invalid = (cones > 0).all(axis=2) | (cones == 0).all(axis=2)
+
+    # sort the hyperplanes of each cone lexicographically and remove duplicates
+    keys, negated_keys = _row_keys(cones, spans)
+    sentinel = np.iinfo(np.int64).max
+    keys[invalid] = sentinel
+    order = np.argsort(keys, axis=1, kind='mergesort')
+    keys = np.take_along_axis(keys, order, axis=1)
+    negated_keys = np.take_along_axis(negated_keys, order, axis=1)
+    cones = np.take_along_axis(cones, order[:,:,np.newaxis], axis=1)
+    valid = keys != sentinel
+    valid[:,1:] &= keys[:,1:] != keys[:,:-1]
+
+    # do not append cones that have `hyperplane` and `-hyperplane`
+    keys = np.where(valid, keys, sentinel)
+    negated_keys = np.where(valid, negated_keys, sentinel)
+    merged_keys = np.sort(np.concatenate([keys, negated_keys], axis=1), axis=1)
+    has_antipodal_pair = ( (merged_keys[:,1:] == merged_keys[:,:-1]) & (merged_keys[:,1:] != sentinel) ).any(axis=1)
+
+    # if one hyperplane has only negative entries do not append to fan
+    has_negative_hyperplane = ( valid & (cones < 0).all(axis=2) ).any(axis=1)
+
+    accepted = (valid.sum(axis=1) >= number_of_variables) & ~has_antipodal_pair & ~has_negative_hyperplane
+    return [cones[i][valid[i]] for i in np.where(accepted)[0]]
 
 def transform_variables(polynomial, transformation, polysymbols='y'):
     r'''
@@ -121,7 +228,7 @@ def transform_variables(polynomial, transformation, polysymbols='y'):
     outpoly.number_of_variables = number_of_new_variables
     return outpoly
 
-def geometric_decomposition(sector, indices=None, normaliz='normaliz', workdir='normaliz_tmp'):
+def geometric_decomposition(sector, indices=None, normaliz='normaliz', workdir='normaliz_tmp', processes=1, cache=None):
     '''
     Run the sector decomposition using the geomethod
     as described in [BHJ+15]_.
@@ -143,8 +250,10 @@ def geometric_decomposition(sector, indices=None, normaliz='normaliz', workdir='
         variables.
 
     :param normaliz:
-        string;
-        The shell command to run `normaliz`.
+        string or None;
+        The shell command to run `normaliz`. If ``None``,
+        the built-in routines of :mod:`pySecDec.polytope`
+        are used instead.
 
     :param workdir:
         string;
@@ -158,6 +267,25 @@ def geometric_decomposition(sector, indices=None, normaliz='normaliz', workdir='
             The communication with `normaliz` is done via
             files.
 
+    :param processes:
+        integer or None;
+        The maximal number of `normaliz` processes to
+        run at the same time when triangulating cones,
+        and the number of worker processes that construct
+        the sectors if there are many cones.
+        If ``None``, the number of CPUs is used.
+        Since `normaliz` is run once per non-simplicial
+        cone, the triangulation is only sped up if
+        `processes` is not ``1``; see
+        :func:`pySecDec.polytope.triangulate_cones`.
+        Default: ``1``
+
+    :param cache:
+        :class:`pySecDec.polytope.PolytopeCache` or None;
+        Reuse the results of previous polytope
+        computations stored in the `cache`.
+        Default: ``None``
+
     '''
     original_sector = sector
     sector = original_sector.copy()
@@ -185,7 +313,7 @@ def geometric_decomposition(sector, indices=None, normaliz='normaliz', workdir='
 
     polytope_vertices = convex_hull( *(product.factors[1] for product in sector.cast) )
     polytope = Polytope(vertices=polytope_vertices)
-    polytope.complete_representation(normaliz, workdir)
+    polytope.complete_representation(normaliz, workdir, cache=cache)
 
     transformation = polytope.facets.T[:-1] # do not need offset term "a_F"
     incidence_lists = polytope.vertex_incidence_lists()
@@ -202,47 +330,33 @@ def geometric_decomposition(sector, indices=None, normaliz='normaliz', workdir='
     # can multiply part encoded in the `expolist` here but the coefficient is specific for each subsector
     sector.Jacobian *= Polynomial([transformation.sum(axis=0) - 1], [1])
 
-    def make_sector(cone_indices, cone):
-        subsector = original_sector.copy()
-        Jacobian_coeff = abs(np.linalg.det(cone))
-        Jacobian_coeff_as_int = int(Jacobian_coeff + 0.5) # `Jacobian_coeff` is integral but numpy calculates it as float
-        assert abs(Jacobian_coeff_as_int - Jacobian_coeff) < 1.0e-5 * abs(Jacobian_coeff)
-        subsector.Jacobian *= Jacobian_coeff_as_int
-
-        # set variables to one that are not in `cone_indices`
-        number_of_variables = len(cone_indices) + original_sector.number_of_variables - len(indices)
-        assert number_of_variables == original_sector.number_of_variables
-        subsector.Jacobian.expolist[:,indices] = sector.Jacobian.expolist[:,cone_indices]
-        for resulting_product, output_product in zip(sector.cast, subsector.cast):
-            for j in range(2):
-                output_product.factors[j].expolist[:,indices] = resulting_product.factors[j].expolist[:,cone_indices]
-            refactorize(output_product)
-        for resulting_polynomial, output_polynomial in zip(sector.other, subsector.other):
-            output_polynomial.expolist[:,indices] = resulting_polynomial.expolist[:,cone_indices]
-
-        return subsector
-
+    # triangulate where neccessary; collect the cones to run `normaliz` for them in parallel
+    all_cone_indices = list(incidence_lists.values())
+    non_simplicial_cones = [transformation[:,cone_indices].T for cone_indices in all_cone_indices if len(cone_indices) != dim]
+    # assert len(cone) > dim # --> this check is done by `triangulate_cones`
+    triangulations = iter(triangulate_cones(non_simplicial_cones, normaliz, workdir, processes=processes, cache=cache))
 
-    for cone_indices in incidence_lists.values():
-        cone = transformation[:,cone_indices].T
+    # find the indices of the vectors defining the triangular cones
+    ray_indices = dict( (tuple(ray),i) for i,ray in enumerate(transformation.T.tolist()) )
 
-        # triangluate where neccessary
+    cones = []
+    for cone_indices in all_cone_indices:
         if len(cone_indices) != dim:
-            # assert len(cone) > dim # --> this check is done by `triangulate`
-            triangular_cones = triangulate(cone, normaliz, workdir)
+            triangular_cones = next(triangulations)
 
             assert len(triangular_cones.shape) == 3
-            for i, triangular_cone in enumerate(triangular_cones):
-                triangular_cone_indices = []
-                for vector in triangular_cone:
-                    # find the indices of the vectors defining the triangular cone
-                    triangular_cone_indices.append(int(  np.where( (vector == transformation.T).all(axis=1) )[0]  ))
-                yield make_sector(triangular_cone_indices, triangular_cone)
+            for triangular_cone in triangular_cones:
+                triangular_cone_indices = [ray_indices[tuple(vector)] for vector in triangular_cone.tolist()]
+                cones.append( (triangular_cone_indices, triangular_cone) )
 
         else:
-            yield make_sector(cone_indices, cone)
+            cones.append( (cone_indices, transformation[:,cone_indices].T) )
 
-def geometric_decomposition_ku(sector, indices=None, normaliz='normaliz', workdir='normaliz_tmp'):
+    environment = dict(original_sector=original_sector, transformed_sector=sector, indices=list(indices))
+    for subsector in _map_sectors(_make_sector, cones, environment, processes):
+        yield subsector
+
+def geometric_decomposition_ku(sector, indices=None, normaliz='normaliz', workdir='normaliz_tmp', processes=1, cache=None):
     '''
     Run the sector decomposition using the original geometric
     decomposition strategy by Kaneko and Ueda as described
@@ -265,8 +379,10 @@ def geometric_decomposition_ku(sector, indices=None, normaliz='normaliz', workdi
         variables.
 
     :param normaliz:
-        string;
-        The shell command to run `normaliz`.
+        string or None;
+        The shell command to run `normaliz`. If ``None``,
+        the built-in routines of :mod:`pySecDec.polytope`
+        are used instead.
 
     :param workdir:
         string;
@@ -280,6 +396,26 @@ def geometric_decomposition_ku(sector, indices=None, normaliz='normaliz', workdi
             The communication with `normaliz` is done via
             files.
 
+    :param processes:
+        integer or None;
+        The maximal number of `normaliz` processes to
+        run at the same time when triangulating cones,
+        and the number of worker processes of
+        :func:`.generate_fan` and of the worker processes
+        that construct the sectors if there are many cones.
+        If ``None``, the number of CPUs is used.
+        Since `normaliz` is run once per non-simplicial
+        cone, the triangulation is only sped up if
+        `processes` is not ``1``; see
+        :func:`pySecDec.polytope.triangulate_cones`.
+        Default: ``1``
+
+    :param cache:
+        :class:`pySecDec.polytope.PolytopeCache` or None;
+        Reuse the results of previous polytope
+        computations stored in the `cache`.
+        Default: ``None``
+
     '''
     original_sector = sector
     sector = original_sector.copy()
@@ -303,34 +439,101 @@ def geometric_decomposition_ku(sector, indices=None, normaliz='normaliz', workdi
             poly.expolist = poly.expolist[:,indices]
             poly.polysymbols = [poly.polysymbols[i] for i in indices]
 
-    def make_sector_ku(cone):
-        subsector = original_sector.copy()
-        transformation = np.identity(original_sector.number_of_variables, dtype = int)
-        index_array = np.array(indices)
-        transformation[index_array.reshape(-1,1),index_array] = cone
-
-        Jacobian_coeff = abs(np.linalg.det(cone))
-        Jacobian_coeff_as_int = int(Jacobian_coeff + 0.5) # `Jacobian_coeff` is integral but numpy calculates it as float
-        assert abs(Jacobian_coeff_as_int - Jacobian_coeff) < 1.0e-5 * abs(Jacobian_coeff)
-
-        subsector.Jacobian = Jacobian_coeff_as_int*transform_variables(subsector.Jacobian, transformation, subsector.Jacobian.polysymbols)
-
-        for i,product in enumerate(subsector.cast):
-            transformed_monomial = transform_variables(product.factors[0], transformation, product.factors[0].polysymbols)
-            transformed_polynomial = transform_variables(product.factors[1], transformation, product.factors[1].polysymbols)
-            subsector.cast[i] = Product(transformed_monomial, transformed_polynomial)
-            refactorize(subsector.cast[i])
-        for i,polynomial in enumerate(subsector.other):
-            subsector.other[i] = transform_variables(polynomial, transformation, polynomial.polysymbols)
-        # this transformation produces an extra Jacobian factor
-        # can multiply part encoded in the `expolist` here but the coefficient is specific for each subsector
-        subsector.Jacobian *= Polynomial([transformation.sum(axis=0) - 1], [1])
-
-        return subsector
-
-    fan = generate_fan( *(product.factors[1] for product in sector.cast) )
-    for cone in fan:
-        for dualcone in triangulate(cone, normaliz, workdir, switch_representation=True):
+    fan = generate_fan( *(product.factors[1] for product in sector.cast), cache=cache, processes=processes )
+    cones = []
+    for cone, dualcones in zip(fan, triangulate_cones(fan, normaliz, workdir, switch_representation=True, processes=processes, cache=cache)):
+        for dualcone in dualcones:
             # exclude lower dimensional cones
             if dualcone.shape[0] == cone.shape[1]:
-                yield make_sector_ku(dualcone.T)
+                cones.append( (dualcone.T,) )
+
+    environment = dict(original_sector=original_sector, indices=list(indices))
+    for subsector in _map_sectors(_make_sector_ku, cones, environment, processes):
+        yield subsector
+
+# minimal number of cones for `geometric_decomposition` and
+# `geometric_decomposition_ku` to construct the sectors in worker processes
+_sector_parallel_threshold = 2**6
+
+def _call_with_worker_environment(task):
+    function, arguments = task
+    return function(*arguments, **worker_environment())
+
+def _map_sectors(make_sector, cones, environment, processes):
+    '''
+    Yield ``make_sector(*cone, **environment)`` for all
+    `cones` in order. If there are many `cones` and
+    `processes` is not ``1``, the sectors are constructed
+    in a pool of worker processes. The `environment` is
+    sent to each worker only once.
+
+    '''
+    if processes == 1 or len(cones) < _sector_parallel_threshold:
+        for cone in cones:
+            yield make_sector(*cone, **environment)
+        return
+
+    pool = worker_pool(processes, environment)
+    try:
+        chunksize = max(1, len(cones) // (4 * (processes or cpu_count())))
+        for subsector in pool.imap(_call_with_worker_environment, ((make_sector, cone) for cone in cones), chunksize):
+            yield subsector
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+def _make_sector(cone_indices, cone, original_sector, transformed_sector, indices):
+    '''
+    Construct the sector of :func:`.geometric_decomposition`
+    that corresponds to the simplicial `cone`.
+
+    '''
+    subsector = original_sector.copy()
+    Jacobian_coeff = abs(np.linalg.det(cone))
+    Jacobian_coeff_as_int = int(Jacobian_coeff + 0.5) # `Jacobian_coeff` is integral but numpy calculates it as float
+    assert abs(Jacobian_coeff_as_int - Jacobian_coeff) < 1.0e-5 * abs(Jacobian_coeff)
+    subsector.Jacobian *= Jacobian_coeff_as_int
+
+    # set variables to one that are not in `cone_indices`
+    number_of_variables = len(cone_indices) + original_sector.number_of_variables - len(indices)
+    assert number_of_variables == original_sector.number_of_variables
+    subsector.Jacobian.expolist[:,indices] = transformed_sector.Jacobian.expolist[:,cone_indices]
+    for resulting_product, output_product in zip(transformed_sector.cast, subsector.cast):
+        for j in range(2):
+            output_product.factors[j].expolist[:,indices] = resulting_product.factors[j].expolist[:,cone_indices]
+        refactorize(output_product)
+    for resulting_polynomial, output_polynomial in zip(transformed_sector.other, subsector.other):
+        output_polynomial.expolist[:,indices] = resulting_polynomial.expolist[:,cone_indices]
+
+    return subsector
+
+def _make_sector_ku(cone, original_sector, indices):
+    '''
+    Construct the sector of :func:`.geometric_decomposition_ku`
+    that corresponds to the simplicial dual `cone`.
+
+    '''
+    subsector = original_sector.copy()
+    transformation = np.identity(original_sector.number_of_variables, dtype = int)
+    index_array = np.array(indices)
+    transformation[index_array.reshape(-1,1),index_array] = cone
+
+    Jacobian_coeff = abs(np.linalg.det(cone))
+    Jacobian_coeff_as_int = int(Jacobian_coeff + 0.5) # `Jacobian_coeff` is integral but numpy calculates it as float
+    assert abs(Jacobian_coeff_as_int - Jacobian_coeff) < 1.0e-5 * abs(Jacobian_coeff)
+
+    subsector.Jacobian = Jacobian_coeff_as_int*transform_variables(subsector.Jacobian, transformation, subsector.Jacobian.polysymbols)
+
+    for i,product in enumerate(subsector.cast):
+        transformed_monomial = transform_variables(product.factors[0], transformation, product.factors[0].polysymbols)
+        transformed_polynomial = transform_variables(product.factors[1], transformation, product.factors[1].polysymbols)
+        subsector.cast[i] = Product(transformed_monomial, transformed_polynomial)
+        refactorize(subsector.cast[i])
+    for i,polynomial in enumerate(subsector.other):
+        subsector.other[i] = transform_variables(polynomial, transformation, polynomial.polysymbols)
+    # this transformation produces an extra Jacobian factor
+    # can multiply part encoded in the `expolist` here but the coefficient is specific for each subsector
+    subsector.Jacobian *= Polynomial([transformation.sum(axis=0) - 1], [1])
+
+    return subsector
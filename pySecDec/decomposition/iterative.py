@@ -6,7 +6,7 @@ The iterative sector decomposition routines.
 
 from .common import Sector, refactorize
 from ..algebra import Polynomial, Product
-from ..misc import powerset
+from itertools import chain, combinations, islice
 import numpy as np
 
 # ********************** primary decomposition **********************
@@ -119,6 +119,9 @@ def primary_decomposition(sector, indices=None):
 
 # ********************** iterative decomposition **********************
 
+# number of candidate sets tested at once in `find_singular_set`
+_candidate_block_size = 4096
+
 class EndOfDecomposition(Exception):
     '''
     This exception is raised if the function
@@ -216,45 +219,48 @@ def find_singular_set(sector, indices=None):
     # find a polynomial to cast that is not in the form ``const + ... yet``
     polyprod = get_poly_to_transform(sector, indices)
     poly = polyprod.factors[1]
-    possible_sets = []
+    indices = list(indices)
+
+    # Encode the variables with positive exponent of each term
+    # as a bitmask over `indices`. The polynomial becomes zero
+    # for a set of variables if every term has at least one of
+    # them --> ``term_mask & set_mask != 0`` for all terms.
+    assert len(indices) <= 64, 'Bitmasks support at most 64 integration variables.'
+    bits = np.left_shift(np.uint64(1), np.arange(len(indices), dtype=np.uint64))
+    term_masks = np.bitwise_or.reduce(np.where(poly.expolist[:,indices] > 0, bits, np.uint64(0)), axis=1)
+    column_maxima = poly.expolist[:,indices].max(axis=0)
 
     # find sets that nullyfy the selected polynomial
     # only consider sets of the smallest possible size
-    for singular_set in powerset(indices,min_length=2):
-        if possible_sets and len(possible_sets[0])<len(singular_set):
-            break
-        if poly.becomes_zero_for(singular_set):
-            possible_sets.append(singular_set)
-    assert possible_sets
-
-    # First check how many poynomials of the sector nullify for
-    # each set of the `possible sets` of fixed length.
-    # Second only gather those sets which nullify the most polynomials
-    howmany_max = 1
-    howmany = 0
-    best_sets = []
-    for singular_set in possible_sets:
-        for polyprod in sector.cast:
-            if not polyprod.factors[1].has_constant_term(indices):
-                howmany += 1
-            if howmany > howmany_max:
-                best_sets = []
-                howmany_max = howmany
-        best_sets.append(singular_set)
-        howmany = 0
-
-    # Choose the set of Feynman parameters with the
-    # highest powers for remapping.
-    exposum_max = -np.inf
-    for test_set in best_sets:
-        exposum = poly.expolist[:,test_set].max(axis=0).sum()
-        if exposum > exposum_max:
-            exposum_max = exposum
-            best_set = test_set
-    assert np.isfinite(exposum_max)
-
-    # return the chosen set
-    return best_set
+    for set_size in range(2, len(indices)+1):
+        best_set = None
+        exposum_max = -np.inf
+        candidates = combinations(range(len(indices)), set_size)
+        while True:
+            # test a block of candidate sets at once
+            block = np.fromiter(chain.from_iterable(islice(candidates, _candidate_block_size)), dtype=np.intp)
+            if not len(block):
+                break
+            block = block.reshape(-1, set_size)
+            set_masks = np.bitwise_or.reduce(bits[block], axis=1)
+            nullifying = ((term_masks[np.newaxis,:] & set_masks[:,np.newaxis]) != 0).all(axis=1)
+            if not nullifying.any():
+                continue
+
+            # Choose the set of Feynman parameters with the
+            # highest powers for remapping. Among equal powers,
+            # the set that comes first in the powerset wins.
+            exposums = np.where(nullifying, column_maxima[block].sum(axis=1), -np.inf)
+            best_in_block = np.argmax(exposums)
+            if exposums[best_in_block] > exposum_max:
+                exposum_max = exposums[best_in_block]
+                best_set = tuple(indices[i] for i in block[best_in_block])
+
+        if best_set is not None:
+            # return the chosen set
+            return best_set
+
+    raise AssertionError('No set of variables nullifies %s' % poly)
 
 def iteration_step(sector, indices=None):
     '''
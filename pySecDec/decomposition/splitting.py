@@ -39,21 +39,26 @@ def remap_one_to_zero(polynomial, *indices):
      + (1) + (-1)*x0
 
     '''
-    coeffs = polynomial.coeffs
-    monomials = [Polynomial.from_expression(s, polynomial.polysymbols) for s in polynomial.polysymbols]
-    dummy_poly_coeffs = np.array([sympify_expression('coeffs_%i__'%i) for i in range(len(coeffs))])
-    dummy_poly_polysymbols = ('monomials_%i__'%i for i in range(len(polynomial.polysymbols)))
-    dummy_poly = Polynomial(polynomial.expolist.copy(), dummy_poly_coeffs,
-                                        dummy_poly_polysymbols, copy=False)
-    code_new_poly = str(dummy_poly).replace('__',']').replace('_', '[')
-    for index in indices:
-        code_new_poly = code_new_poly.replace('monomials[%i]'%index, '(1-monomials[%i])'%index)
-
-    remapped_polynomial = eval(code_new_poly)
+    remapped_polynomial = Polynomial(polynomial.expolist, polynomial.coeffs, polynomial.polysymbols, copy=True)
 
-    # make sure that `remapped_polynomial` is of type Polynomial
-    if not isinstance(remapped_polynomial, Polynomial):
-        remapped_polynomial = Polynomial(np.zeros([1,len(monomials)],dtype=int), np.array([remapped_polynomial]), polynomial.polysymbols, copy=1)
+    for index in indices:
+        # expand ``(1-x)**k = sum_j binomial(k,j) * (-1)**j * x**j`` for all terms at once
+        powers = remapped_polynomial.expolist[:,index]
+        assert (powers >= 0).all(), 'Cannot remap negative powers'
+        number_of_new_terms = powers + 1
+        term_indices = np.repeat(np.arange(len(powers)), number_of_new_terms)
+        new_powers = np.arange(number_of_new_terms.sum()) - np.repeat(np.cumsum(number_of_new_terms) - number_of_new_terms, number_of_new_terms)
+
+        factors = _binomial_coefficients(powers.max())[powers[term_indices], new_powers]
+        factors[new_powers % 2 == 1] *= -1
+        coeffs = remapped_polynomial.coeffs
+        if not np.issubdtype(coeffs.dtype, np.number):
+            # keep python integers for symbolic coefficients
+            factors = factors.astype(object)
+
+        expolist = remapped_polynomial.expolist[term_indices]
+        expolist[:,index] = new_powers
+        remapped_polynomial = Polynomial(expolist, coeffs[term_indices] * factors, remapped_polynomial.polysymbols, copy=False).simplify(deep=False)
 
     if hasattr(polynomial, 'exponent'):
         # convert to `ExponentiatedPolynomial`
@@ -67,6 +72,21 @@ def remap_one_to_zero(polynomial, *indices):
 
     return remapped_polynomial
 
+def _binomial_coefficients(n):
+    r'''
+    Return the array of the binomial coefficients
+    :math:`\binom{k}{j}` for :math:`0 \le j,k \le n`
+    (Pascal's triangle). The entries are python
+    integers if they do not fit into 64 bits.
+
+    '''
+    # binomial(66,33) is the largest central binomial coefficient below 2**63
+    table = np.zeros((n+1,n+1), dtype=np.int64 if n <= 66 else object)
+    table[:,0] = 1
+    for k in range(1,n+1):
+        table[k,1:] = table[k-1,1:] + table[k-1,:-1]
+    return table
+
 def find_singular_sets_at_one(polynomial):
     '''
     Find all possible sets of parameters such that the `polynomial`'s
@@ -133,66 +153,88 @@ def split(sector, seed, *indices):
     rng = np.random.RandomState( int(seed) )
     splitting_point = [   int( rng.randint(1,20) ) / sympify_expression(20)  for idx in indices   ]
 
-    def split_recursively(sector, indices, splitting_point):
-        if not indices:
-            yield sector.copy()
-            return
-
-        # We call this function recusively and pop the first index/splitting_value in each iteration
-        index = indices[0]
-        remaining_indices = indices[1:]
-        splitting_value = splitting_point[0]
-        splitting_point = splitting_point[1:]
-
-        # split the parameter with index `index`
-        #  - step1: make a copy with mapping "x --> 1 - x"
-        remapped_cast = []
-        remapped_other = []
-        for prod in sector.cast:
-            prod = prod.copy()
-            mono, poly = prod.factors
-
-            # multiply the monomial back to the polynomial and refactorize later
-            poly.expolist[:,index] += mono.expolist[0,index]
-            mono.expolist[:,index] = 0
-            prod.factors[1] = remap_one_to_zero(poly, index)
-            refactorize(prod, index)
-            remapped_cast.append(prod)
+    return split_at(sector, splitting_point, *indices)
 
-        for poly in sector.other:
-            remapped_other.append( remap_one_to_zero(poly, index) )
+def split_at(sector, splitting_point, *indices):
+    '''
+    Split the integration interval :math:`[0,1]`
+    for the parameters given by `indices` at the
+    given `splitting_point`.
 
-        remapped_Jacobian = remap_one_to_zero(sector.Jacobian, index)
+    Return an iterator of :class:`.Sector` - the
+    arising subsectors.
 
-        subsector0 = sector.copy()
-        subsector1 = Sector(remapped_cast, remapped_other, remapped_Jacobian)
+    :param sector:
+        :class:`.Sector`;
+        The sector to be split.
 
-        #  - step2: rescale the integration variable
-        def multiply_by(polynomial, number, index):
-            replaced_polynomial = polynomial.replace(index, number)
-            polynomial.coeffs = replaced_polynomial.coeffs
+    :param splitting_point:
+        iterable of numbers between zero and one;
+        The value to split each of the parameters
+        given by `indices` at.
 
-        for sector,remapping_factor in zip(
-                                              [     subsector0    ,     subsector1      ],
-                                              [  splitting_value  ,  1-splitting_value  ]
-                                          ):
-            sector.Jacobian *= remapping_factor
-            multiply_by(sector.Jacobian, remapping_factor, index)
-            for prod in sector.cast:
-                mono, poly = prod.factors
-                multiply_by(mono, remapping_factor, index)
-                multiply_by(poly, remapping_factor, index)
-            for poly in sector.other:
-                multiply_by(poly, remapping_factor, index)
+    :param indices:
+        arbitrarily many integers;
+        The indices of the variables to be split.
 
-        # recursively call `split` with the `remaining_indices`
-        for sector in (subsector0, subsector1):
-            for subsubsector in split_recursively(sector, remaining_indices, splitting_point):
-                yield subsubsector
+    '''
+    if not indices:
+        yield sector.copy()
+        return
+
+    # We call this function recusively and pop the first index/splitting_value in each iteration
+    index = indices[0]
+    remaining_indices = indices[1:]
+    splitting_value = splitting_point[0]
+    splitting_point = splitting_point[1:]
+
+    # split the parameter with index `index`
+    #  - step1: make a copy with mapping "x --> 1 - x"
+    remapped_cast = []
+    remapped_other = []
+    for prod in sector.cast:
+        prod = prod.copy()
+        mono, poly = prod.factors
+
+        # multiply the monomial back to the polynomial and refactorize later
+        poly.expolist[:,index] += mono.expolist[0,index]
+        mono.expolist[:,index] = 0
+        prod.factors[1] = remap_one_to_zero(poly, index)
+        refactorize(prod, index)
+        remapped_cast.append(prod)
+
+    for poly in sector.other:
+        remapped_other.append( remap_one_to_zero(poly, index) )
+
+    remapped_Jacobian = remap_one_to_zero(sector.Jacobian, index)
+
+    subsector0 = sector.copy()
+    subsector1 = Sector(remapped_cast, remapped_other, remapped_Jacobian)
+
+    #  - step2: rescale the integration variable
+    def multiply_by(polynomial, number, index):
+        replaced_polynomial = polynomial.replace(index, number)
+        polynomial.coeffs = replaced_polynomial.coeffs
+
+    for sector,remapping_factor in zip(
+                                          [     subsector0    ,     subsector1      ],
+                                          [  splitting_value  ,  1-splitting_value  ]
+                                      ):
+        sector.Jacobian *= remapping_factor
+        multiply_by(sector.Jacobian, remapping_factor, index)
+        for prod in sector.cast:
+            mono, poly = prod.factors
+            multiply_by(mono, remapping_factor, index)
+            multiply_by(poly, remapping_factor, index)
+        for poly in sector.other:
+            multiply_by(poly, remapping_factor, index)
 
-    return split_recursively(sector, indices, splitting_point)
+    # recursively call `split` with the `remaining_indices`
+    for sector in (subsector0, subsector1):
+        for subsubsector in split_at(sector, splitting_point, *remaining_indices):
+            yield subsubsector
 
-def split_singular(sector, seed, indices=[]):
+def split_singular(sector, seed, indices=[], optimize=False):
     '''
     Split the integration interval :math:`[0,1]`
     for the parameters that can lead to singularities
@@ -216,21 +258,132 @@ def split_singular(sector, seed, indices=[]):
         if required. An empty iterator means that
         all variables may potentially be split.
 
+    :param optimize:
+        bool;
+        Whether to choose the splitting point with
+        :func:`.optimize_split` instead of randomly.
+        The `seed` is ignored in that case.
+        Default: ``False``
+
     '''
-    # find the parameters to be split
-    singular_parameters = set()
+    if optimize:
+        singular_parameters, splitting_point, predicted_number_of_sectors = optimize_split(sector, indices)
+        return split_at(sector, splitting_point, *singular_parameters)
+
+    # split the `sector` in the `singular_parameters`
+    return split(sector, seed, *find_singular_parameters(sector, indices))
+
+def _find_singular_sets(sector, indices):
+    '''
+    Return the nonempty singular sets at one of
+    the polynomials in ``sector.cast`` restricted
+    to the `indices` (all parameters if `indices`
+    is empty) as list of sets.
+
+    '''
+    singular_sets = []
     for product in sector.cast:
         polynomial = product.factors[1]
         for singular_set in find_singular_sets_at_one(polynomial):
-            singular_parameters.update(singular_set)
+            singular_set = set(singular_set)
+            # restrict splitting to selected `indices`
+            if indices:
+                singular_set.intersection_update(indices)
+            if singular_set:
+                singular_sets.append(singular_set)
+    return singular_sets
 
-    # restrict splitting to selected `indices`
-    if indices:
-        singular_parameters.intersection_update(indices)
+def find_singular_parameters(sector, indices=[]):
+    '''
+    Return the sorted list of the parameters that can
+    lead to singularities at one for the polynomials
+    in ``sector.cast``; i.e. the parameters that
+    :func:`.split_singular` splits.
 
-    # order the `singular_parameters`
-    singular_parameters = list(singular_parameters)
-    singular_parameters.sort()
+    :param sector:
+        :class:`.Sector`;
+        The sector to search in.
 
-    # split the `sector` in the `singular_parameters`
-    return split(sector, seed, *singular_parameters)
+    :param indices:
+        iterables of integers;
+        The indices of the variables to be
+        considered. An empty iterator means that
+        all variables are considered.
+
+    '''
+    singular_parameters = set()
+    for singular_set in _find_singular_sets(sector, indices):
+        singular_parameters.update(singular_set)
+    return sorted(singular_parameters)
+
+# candidate splitting values for `optimize_split`; ordered by the distance to 1/2
+_splitting_values = sorted(
+                              (sympify_expression(k)/20 for k in range(1,20)),
+                              key=lambda value: abs(value - sympify_expression(1)/2)
+                          )
+
+def optimize_split(sector, indices=[]):
+    '''
+    Choose the splitting point for the parameters that
+    can lead to singularities at one (see
+    :func:`.split_singular`) using a cost model.
+
+    For each of these parameters, the candidate
+    splitting values :math:`k/20` (:math:`k=1,...,19`)
+    are tried one parameter at a time. The cost of a
+    value is determined by
+
+        1. the number of singular sets at one that
+           contain the parameter in the two arising
+           subsectors; these are created by
+           cancellations between the coefficients
+           and would require another split,
+        2. the number of terms of the polynomials
+           in ``sector.cast`` of the two subsectors.
+
+    The cheapest value is chosen where ties are broken
+    by the distance to :math:`1/2`. The choice is
+    deterministic.
+
+    Return a tuple of the parameters to split, the
+    splitting point, and the predicted number of
+    sectors after splitting and another split of the
+    subsectors with remaining singular sets.
+
+    :param sector:
+        :class:`.Sector`;
+        The sector to be split.
+
+    :param indices:
+        iterables of integers;
+        The indices of the variables to be split
+        if required. An empty iterator means that
+        all variables may potentially be split.
+
+    '''
+    singular_parameters = find_singular_parameters(sector, indices)
+
+    splitting_point = []
+    number_of_singular_halves = 0
+    for parameter in singular_parameters:
+        costs = []
+        for value in _splitting_values:
+            subsectors = list( split_at(sector, [value], parameter) )
+            singular_sets = [
+                                [singular_set for singular_set in _find_singular_sets(subsector, indices) if parameter in singular_set]
+                                for subsector in subsectors
+                            ]
+            number_of_singular_sets = sum(len(sets) for sets in singular_sets)
+            number_of_terms = sum(len(product.factors[1].coeffs) for subsector in subsectors for product in subsector.cast)
+            number_of_singular_subsectors = sum(1 for sets in singular_sets if sets)
+            costs.append( (number_of_singular_sets, number_of_terms, number_of_singular_subsectors) )
+        best = min(range(len(costs)), key=lambda i: costs[i][:2])
+        splitting_point.append(_splitting_values[best])
+        number_of_singular_halves += costs[best][2]
+
+    # every singular subsector of a single split is one half of the
+    # subsectors of the full split; each of them is split once more
+    number_of_sectors = 2**len(singular_parameters)
+    predicted_number_of_sectors = number_of_sectors + number_of_singular_halves * number_of_sectors // 2
+
+    return singular_parameters, splitting_point, predicted_number_of_sectors
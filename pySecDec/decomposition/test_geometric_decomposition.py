@@ -2,6 +2,7 @@ from .geometric import *
 from .common import Sector
 from ..algebra import Polynomial, ExponentiatedPolynomial, LogOfPolynomial
 from ..misc import argsort_2D_array, sympify_expression
+from ..polytope import triangulate
 from nose.plugins.attrib import attr
 import numpy as np
 import sympy as sp
@@ -76,6 +77,20 @@ class TestGeomethod(unittest.TestCase):
         sorted_hull = sort_2D_array(hull)
         np.testing.assert_array_equal(sorted_hull, self.sorted_target_hull)
 
+    #@attr('active')
+    def test_convex_hull_drops_non_vertices(self):
+        p0 = Polynomial.from_expression('1 + x0 + x0**2 + x1', ['x0','x1'])
+        p1 = Polynomial.from_expression('1 + x1', ['x0','x1'])
+        hull = convex_hull(p0, p1)
+
+        target_hull = np.array([[0,0],
+                                [0,2],
+                                [2,0],
+                                [2,1]])
+
+        # The ordering is not important but must be fixed to compare the arrays
+        np.testing.assert_array_equal(sort_2D_array(hull), sort_2D_array(target_hull))
+
     def test_generate_fan(self):
         fan_p01 = generate_fan(self.p0,self.p1)
         for cone, target_cone in zip(fan_p01, self.sorted_target_fan_p01):
@@ -85,6 +100,55 @@ class TestGeomethod(unittest.TestCase):
         for cone, target_cone in zip(fan_p2, self.sorted_target_fan_p2):
             np.testing.assert_array_equal(cone, target_cone)
 
+    #@attr('active')
+    def test_generate_fan_blocks(self):
+        from . import geometric
+        original_block_size = geometric._fan_block_size
+        original_parallel_threshold = geometric._fan_parallel_threshold
+        try:
+            # one factor combination per block
+            geometric._fan_block_size = 1
+            geometric._fan_parallel_threshold = 1
+            fans_p01 = [generate_fan(self.p0,self.p1), generate_fan(self.p0,self.p1, processes=2)]
+        finally:
+            geometric._fan_block_size = original_block_size
+            geometric._fan_parallel_threshold = original_parallel_threshold
+
+        for fan_p01 in fans_p01:
+            self.assertEqual(len(fan_p01), len(self.sorted_target_fan_p01))
+            for cone, target_cone in zip(fan_p01, self.sorted_target_fan_p01):
+                np.testing.assert_array_equal(cone, target_cone)
+
+    #@attr('active')
+    def test_generate_fan_large_exponents(self):
+        # the keys of the hyperplanes do not fit into a single integer
+        p0 = Polynomial([[0,0,0],[1,1,0],[0,0,10**6]], [1,1,1])
+        p1 = Polynomial([[0,0,0],[10**6,10**6,10**6]], [1,1])
+        fan = generate_fan(p0, p1)
+        target_fan = [
+                         [[ 0, 0, 1], [ 0, 0, 10**6], [0, 1, 0], [1, 0, 0], [1, 1,      0]],
+                         [[-1,-1, 0], [-1,-1, 10**6], [0, 0, 1], [0, 1, 0], [1, 0,      0]],
+                         [[ 0, 0,-10**6], [ 0, 0, 1], [0, 1, 0], [1, 0, 0], [1, 1, -10**6]]
+                     ]
+        self.assertEqual(len(fan), len(target_fan))
+        for cone, target_cone in zip(fan, target_fan):
+            np.testing.assert_array_equal(cone, target_cone)
+
+    #@attr('active')
+    def test_generate_fan_cached(self):
+        from ..polytope import PolytopeCache
+        cache = PolytopeCache()
+        self.assertRaisesRegexp(TypeError, 'nonexistent_argument', generate_fan, self.p0, self.p1, nonexistent_argument=1)
+
+        for i in range(2):
+            fan_p01 = generate_fan(self.p0, self.p1, cache=cache)
+            self.assertEqual(len(fan_p01), len(self.sorted_target_fan_p01))
+            for cone, target_cone in zip(fan_p01, self.sorted_target_fan_p01):
+                np.testing.assert_array_equal(cone, target_cone)
+
+            # modifying the output must not change the `cache`
+            fan_p01[0][:] = 0
+
     #@attr('active')
     def test_convex_hull_exponentiated_polynomial(self):
         p0 = ExponentiatedPolynomial(self.p0.expolist, self.p0.coeffs, polysymbols=self.p0.polysymbols, exponent='8-3*eps')
@@ -117,8 +181,44 @@ class TestGeomethod(unittest.TestCase):
                                     workdir='tmpdir_test_triangulate_python' + python_major_version
                                )
 
-        triangulated_cones = triangulate(cone, workdir='tmpdir_test_triangulate_python' + python_major_version)
-        triangulated_cones_normal = triangulate(cone_normal, workdir='tmpdir_test_triangulate_python' + python_major_version, switch_representation=True)
+        self._check_triangulate(cone, cone_normal, 'normaliz')
+
+    #@attr('active')
+    def test_triangulate_in_process(self):
+        cone = [[ 1,  0,  0], [ 0,  1,  0], [ 0, -1, -1], [-1,  0, -1]]
+        cone_normal = [[ -1, 1, 1], [ 1, 0, 0], [ 0, 1, 0], [ 0, 0, 1]]
+        self._check_triangulate(cone, cone_normal, None)
+
+    #@attr('active')
+    def test_triangulate_cones(self):
+        self._test_triangulate_cones('normaliz')
+
+    #@attr('active')
+    def test_triangulate_cones_in_process(self):
+        self._test_triangulate_cones(None)
+
+    def _test_triangulate_cones(self, normaliz):
+        from ..polytope import triangulate_cones
+        cones = [
+                    [[ 1,  0,  0], [ 0,  1,  0], [ 0, -1, -1], [-1,  0, -1]],
+                    [[ 1,  0,  0], [ 0,  1,  0], [ 0,  0,  1], [ 1,  1, -1]]
+                ]
+        workdir = 'tmpdir_test_triangulate_cones_python' + python_major_version
+        triangulated_cones = triangulate_cones(cones, normaliz, workdir, processes=2)
+
+        self.assertEqual(len(triangulated_cones), 2)
+        for cone, triangulation in zip(cones, triangulated_cones):
+            self.assertEqual(triangulation.shape[1:], (3,3))
+            for simplicial_cone in triangulation:
+                for ray in simplicial_cone.tolist():
+                    self.assertTrue(ray in cone)
+
+            # the triangulation must match `triangulate` for a single cone
+            np.testing.assert_array_equal(triangulation, triangulate(cone, normaliz, workdir))
+
+    def _check_triangulate(self, cone, cone_normal, normaliz):
+        triangulated_cones = triangulate(cone, normaliz, workdir='tmpdir_test_triangulate_python' + python_major_version)
+        triangulated_cones_normal = triangulate(cone_normal, normaliz, workdir='tmpdir_test_triangulate_python' + python_major_version, switch_representation=True)
 
         # there are two possibilities for the triangualtion
         target_triangulated_cones1 = np.array([
@@ -210,10 +310,17 @@ class TestGeomethod(unittest.TestCase):
 
     #@attr('active')
     def test_2D_geometric_decomposition(self):
+        self._test_2D_geometric_decomposition('normaliz')
+
+    #@attr('active')
+    def test_2D_geometric_decomposition_in_process(self):
+        self._test_2D_geometric_decomposition(None)
+
+    def _test_2D_geometric_decomposition(self, normaliz):
         poly = Polynomial.from_expression('x1 + x2 + x1*x2', ['dummy','x1','x2'])
         sector = Sector([poly])
         indices = [1,2]
-        subsectors = list( geometric_decomposition(sector, indices, workdir='tmpdir_test_2D_geometric_decomposition_python' + python_major_version) )
+        subsectors = list( geometric_decomposition(sector, indices, normaliz=normaliz, workdir='tmpdir_test_2D_geometric_decomposition_python' + python_major_version) )
 
         target_general_Jacobian = sympify_expression('x1**-2 * x2**-2 * x3')
         target_general_poly = sympify_expression('x1**-1 * x2**-1 * x3 * (x1 + x2 + x3)')
@@ -235,10 +342,17 @@ class TestGeomethod(unittest.TestCase):
 
     #@attr('active')
     def test_2D_geometric_decomposition_ku(self):
+        self._test_2D_geometric_decomposition_ku('normaliz')
+
+    #@attr('active')
+    def test_2D_geometric_decomposition_ku_in_process(self):
+        self._test_2D_geometric_decomposition_ku(None)
+
+    def _test_2D_geometric_decomposition_ku(self, normaliz):
         poly = Polynomial.from_expression('A*x1 + B*x2 + C*x1*x2', ['dummy','x1','x2'])
         sector = Sector([poly])
         indices = [1,2]
-        subsectors = list( geometric_decomposition_ku(sector, indices, workdir='tmpdir_test_2D_geometric_decomposition_ku_python' + python_major_version) )
+        subsectors = list( geometric_decomposition_ku(sector, indices, normaliz=normaliz, workdir='tmpdir_test_2D_geometric_decomposition_ku_python' + python_major_version) )
         print(subsectors)
         self.assertEqual(len(subsectors), 2)
 
@@ -264,6 +378,13 @@ class TestGeomethod(unittest.TestCase):
 
     #@attr('active')
     def test_geometric_ku_lower_dimensional_cones(self):
+        self._test_geometric_ku_lower_dimensional_cones('normaliz')
+
+    #@attr('active')
+    def test_geometric_ku_lower_dimensional_cones_in_process(self):
+        self._test_geometric_ku_lower_dimensional_cones(None)
+
+    def _test_geometric_ku_lower_dimensional_cones(self, normaliz):
         polysymbols = ['x0','x1','x3','x4','x5']
         poly1 = Polynomial.from_expression(
                                                '''
@@ -286,19 +407,61 @@ class TestGeomethod(unittest.TestCase):
         sector = Sector([poly1,poly2])
 
         # should not error
-        subsectors = list( geometric_decomposition_ku(sector, workdir='tmpdir_test_geometric_ku_lower_dimensional_cones_python' + python_major_version) )
+        subsectors = list( geometric_decomposition_ku(sector, normaliz=normaliz, workdir='tmpdir_test_geometric_ku_lower_dimensional_cones_python' + python_major_version) )
 
     #@attr('active')
     def test_3D_geometric_decomposition(self):
+        self._test_3D_geometric_decomposition('normaliz')
+
+    #@attr('active')
+    def test_3D_geometric_decomposition_in_process(self):
+        self._test_3D_geometric_decomposition(None)
+
+    def _test_3D_geometric_decomposition(self, normaliz):
         # 3D test case where triangulation is needed
         poly = Polynomial.from_expression('A*1 + B*x1 + C*x2 + D*x3 + E*x1*x2', ['x1','x2','x3']) # pyramid
         sector = Sector([poly])
-        subsectors = list( geometric_decomposition(sector, workdir='tmpdir_test_3D_geometric_decomposition_python' + python_major_version) )
+        subsectors = list( geometric_decomposition(sector, normaliz=normaliz, workdir='tmpdir_test_3D_geometric_decomposition_python' + python_major_version) )
 
     #@attr('active')
     def test_3D_geometric_decomposition_selected_indices(self):
+        self._test_3D_geometric_decomposition_selected_indices('normaliz')
+
+    #@attr('active')
+    def test_3D_geometric_decomposition_selected_indices_in_process(self):
+        self._test_3D_geometric_decomposition_selected_indices(None)
+
+    def _test_3D_geometric_decomposition_selected_indices(self, normaliz):
         # 3D test case where triangulation is needed
         poly = Polynomial.from_expression('A*1 + B*x1 + C*x2 + D*x3 + E*x1*x2', ['x1','dummy','x2','x3']) # pyramid
         sector = Sector([poly])
         indices = [0,2,3]
-        subsectors = list( geometric_decomposition(sector, indices, workdir='tmpdir_test_3D_geometric_decomposition_selected_indices_python' + python_major_version) )
+        subsectors = list( geometric_decomposition(sector, indices, normaliz=normaliz, workdir='tmpdir_test_3D_geometric_decomposition_selected_indices_python' + python_major_version) )
+
+    #@attr('active')
+    def test_sectors_in_worker_processes(self):
+        from . import geometric
+        poly = Polynomial.from_expression('A*1 + B*x1 + C*x2 + D*x3 + E*x1*x2', ['x1','dummy','x2','x3']) # pyramid
+        sector = Sector([poly], [Polynomial.from_expression('x1 + x3', ['x1','dummy','x2','x3'])])
+        indices = [0,2,3]
+
+        decompositions = [
+                             lambda processes: geometric_decomposition(sector, indices, normaliz=None, processes=processes),
+                             lambda processes: geometric_decomposition_ku(sector, indices, normaliz=None, processes=processes)
+                         ]
+
+        for decomposition in decompositions:
+            serial_subsectors = list( decomposition(1) )
+
+            original_parallel_threshold = geometric._sector_parallel_threshold
+            try:
+                geometric._sector_parallel_threshold = 1
+                parallel_subsectors = list( decomposition(2) )
+            finally:
+                geometric._sector_parallel_threshold = original_parallel_threshold
+
+            self.assertEqual(len(parallel_subsectors), len(serial_subsectors))
+            for serial_subsector, parallel_subsector in zip(serial_subsectors, parallel_subsectors):
+                self.assertEqual(str(parallel_subsector.Jacobian), str(serial_subsector.Jacobian))
+                self.assertEqual(str(parallel_subsector.cast), str(serial_subsector.cast))
+                self.assertEqual(str(parallel_subsector.other), str(serial_subsector.other))
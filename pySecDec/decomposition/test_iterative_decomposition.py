@@ -160,6 +160,23 @@ class TestIterativeDecomposition(unittest.TestCase):
         sector2 = Sector([F2,self.U])
         self.assertEqual( find_singular_set(sector2),(0,1) )
 
+    #@attr('active')
+    def test_find_singular_set_across_candidate_blocks(self):
+        from . import iterative
+        variables = ['x%i' %i for i in range(5)]
+
+        F = Polynomial.from_expression('x0*x1 + x2*x3**2 + x1*x4**2 + x3*x4',variables)
+        sector = Sector([F])
+        target_set = (1,3)
+        self.assertEqual( find_singular_set(sector),target_set )
+
+        original_block_size = iterative._candidate_block_size
+        try:
+            iterative._candidate_block_size = 3
+            self.assertEqual( find_singular_set(sector),target_set )
+        finally:
+            iterative._candidate_block_size = original_block_size
+
     def test_iteration_step(self):
         subsectors = list( iteration_step(self.sector) )
 
@@ -75,6 +75,24 @@ class TestRemapOneToZero(unittest.TestCase):
 
         self.assertEqual(  (remapped_exponentiated_polynomial - target_remapped_exponentiated_polynomial).simplify() , 0  )
 
+    #@attr('active')
+    def test_remap_exponentiated_type(self):
+        exponentiated_polynomial = ExponentiatedPolynomial([[2,0],[0,1]], [1,'a'], 'exponent', ['x0','x1'])
+        remapped = remap_one_to_zero(exponentiated_polynomial, 0)
+        self.assertTrue( type(remapped) is ExponentiatedPolynomial )
+        self.assertEqual( remapped.exponent, sympify_expression('exponent') )
+        np.testing.assert_array_equal(remapped.expolist, [[0,0],[0,1],[1,0],[2,0]])
+        self.assertEqual( [sympify_expression(coeff) for coeff in remapped.coeffs], [1, sympify_expression('a'), -2, 1] )
+
+    #@attr('active')
+    def test_remap_high_power(self):
+        # binomial coefficients that do not fit into 64 bits
+        polynomial = Polynomial([[70,0],[0,1]], [1,1], ['x0','x1'])
+        remapped = remap_one_to_zero(polynomial, 0)
+        x0, x1 = sp.symbols('x0 x1')
+        target_remapped = sp.expand( (1-x0)**70 + x1 )
+        self.assertEqual( (sympify_expression(remapped) - target_remapped).simplify() , 0 )
+
     #@attr('active')
     def test_remap_constant(self):
         polynomial = Polynomial.from_expression('coeff', self.Feynman_parameters)
@@ -261,3 +279,48 @@ class TestSplitSingular(unittest.TestCase):
             print(i)
             sympified_split_poly = sympify_expression(split_sectors[i].cast[0])
             self.assertEqual(  (sympified_split_poly - target_splits[i]).simplify() , 0  )
+
+class TestOptimizeSplit(unittest.TestCase):
+    #@attr('active')
+    def test_no_singularity(self):
+        poly = Polynomial.from_expression('1 + x0 + x1', ['x0','x1'])
+        self.assertEqual( optimize_split(Sector([poly])) , ([], [], 1) )
+
+    #@attr('active')
+    def test_split_at_one_half(self):
+        poly = Polynomial.from_expression('1 - x0 + A*x1', ['x0','x1'])
+        singular_parameters, splitting_point, predicted_number_of_sectors = optimize_split(Sector([poly]))
+        self.assertEqual(singular_parameters, [0])
+        self.assertEqual(splitting_point, [sympify_expression('1/2')])
+        self.assertEqual(predicted_number_of_sectors, 2)
+
+    #@attr('active')
+    def test_avoid_cancellation(self):
+        # ``1 - 2*x0 + 3*x1`` vanishes at ``x0 = 1/2, x1 = 0`` --> splitting at 1/2 creates singularities at one
+        poly0 = Polynomial.from_expression('1 - x0', ['x0','x1'])
+        poly1 = Polynomial.from_expression('1 - 2*x0 + 3*x1', ['x0','x1'])
+        sector = Sector([poly0, poly1])
+
+        singular_parameters, splitting_point, predicted_number_of_sectors = optimize_split(sector)
+        self.assertEqual(singular_parameters, [0])
+        self.assertEqual(splitting_point, [sympify_expression('9/20')])
+        self.assertEqual(predicted_number_of_sectors, 2)
+
+        split_sectors = list( split_singular(sector, 0, optimize=True) )
+        self.assertEqual(len(split_sectors), 2)
+        target_splits = sympify_expression(['1 - 2*x0*9/20 + 3*x1', '1 - 2*(1-x0*(1-9/20)) + 3*x1'])
+        for split_sector, target_split in zip(split_sectors, target_splits):
+            self.assertEqual( (sympify_expression(split_sector.cast[1]) - target_split).simplify() , 0 )
+            self.assertEqual( find_singular_parameters(split_sector) , [] )
+
+    #@attr('active')
+    def test_prediction(self):
+        # splitting at 1/2 would leave singularities at one in both subsectors
+        poly = Polynomial.from_expression('(1 - x0) * (1 - 2*x0)', ['x0'])
+        singular_parameters, splitting_point, predicted_number_of_sectors = optimize_split(Sector([poly]))
+        self.assertEqual(singular_parameters, [0])
+        self.assertEqual(splitting_point, [sympify_expression('9/20')])
+
+        split_sectors = list( split_at(Sector([poly]), splitting_point, *singular_parameters) )
+        number_of_singular_sectors = sum(1 for split_sector in split_sectors if find_singular_parameters(split_sector))
+        self.assertEqual(predicted_number_of_sectors, len(split_sectors) + number_of_singular_sectors)
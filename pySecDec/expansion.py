@@ -6,7 +6,8 @@ Routines to series expand singular and nonsingular expressions.
 
 """
 
-from .algebra import Product, Sum, Polynomial, ExponentiatedPolynomial
+from .algebra import _Expression, Product, Sum, Pow, Log, Polynomial, ExponentiatedPolynomial, LogOfPolynomial, \
+                     TruncatedSeries, _is_zero
 from .misc import sympify_symbols, flatten, sympify_expression
 from numpy import iterable
 import numpy as np
@@ -25,11 +26,205 @@ class OrderError(ValueError):
 
 # ------------------------ private functions ------------------------
 
+def _depends_on(expression, index, symbol):
+    '''
+    Return whether or not `expression` may depend on
+    the variable indexed by `index`. Expressions of
+    unknown type are assumed to depend on all variables.
+
+    '''
+    if isinstance(expression, Polynomial):
+        if expression.expolist[:,index].any():
+            return True
+        if isinstance(expression, ExponentiatedPolynomial) and _depends_on(expression.exponent, index, symbol):
+            return True
+        return _coeffs_depend_on(expression.coeffs, index, symbol)
+    if isinstance(expression, Sum):
+        return any(_depends_on(summand, index, symbol) for summand in expression.summands)
+    if isinstance(expression, Product):
+        return any(_depends_on(factor, index, symbol) for factor in expression.factors)
+    if isinstance(expression, Pow):
+        return _depends_on(expression.base, index, symbol) or _depends_on(expression.exponent, index, symbol)
+    if isinstance(expression, Log):
+        return _depends_on(expression.arg, index, symbol)
+    if isinstance(expression, _Expression):
+        return True
+    return symbol in getattr(expression, 'free_symbols', ())
+
+def _coeffs_depend_on(coeffs, index, symbol):
+    'Return whether or not any of the `coeffs` may depend on the variable indexed by `index`.'
+    if np.issubdtype(coeffs.dtype, np.number):
+        return False
+    return any(_depends_on(coeff, index, symbol) for coeff in coeffs)
+
+def _factors(expression):
+    '''
+    Return the factors of `expression`; i.e. the factors
+    of (nested) :class:`.algebra.Product` or a list
+    containing only the `expression` itself.
+
+    '''
+    if type(expression) is not Product:
+        return [expression]
+    return [f for factor in expression.factors for f in _factors(factor)]
+
+def _closed_form_factor(factor, index, symbol):
+    r'''
+    Write `factor` as :math:`A \exp(B \epsilon)`, where
+    :math:`\epsilon` is the variable indexed by `index`
+    and neither :math:`A` nor :math:`B` depend on
+    :math:`\epsilon`. Return the tuple ``(A, B)``, where
+    ``B=None`` means :math:`B=0`. Return ``None`` if
+    `factor` is not of that form.
+
+    Recognized are expressions that do not depend on
+    :math:`\epsilon` and :class:`.algebra.ExponentiatedPolynomial`
+    :math:`P^{a + b \epsilon}` with :math:`A=P^a` and
+    :math:`B=b \log(P)`.
+
+    '''
+    if not _depends_on(factor, index, symbol):
+        return factor, None
+    if type(factor) is not ExponentiatedPolynomial or type(factor.exponent) is not Polynomial:
+        return None
+
+    if factor.expolist[:,index].any() or _coeffs_depend_on(factor.coeffs, index, symbol):
+        return None
+    exponent = factor.exponent
+    powers = exponent.expolist[:,index]
+    if powers.max() > 1 or _coeffs_depend_on(exponent.coeffs, index, symbol):
+        return None
+
+    # split the exponent as ``a + b * epsilon``
+    constant = powers == 0
+    if constant.any():
+        a = Polynomial(exponent.expolist[constant], exponent.coeffs[constant], exponent.polysymbols)
+    else:
+        a = Polynomial(np.zeros([1,exponent.number_of_variables], dtype=int), np.array([0]), exponent.polysymbols, copy=False)
+    b = Polynomial(exponent.expolist[~constant], exponent.coeffs[~constant], exponent.polysymbols)
+    b.expolist[:,index] = 0
+
+    prefactor = ExponentiatedPolynomial(factor.expolist.copy(), factor.coeffs.copy(), a, factor.polysymbols, copy=False)
+    log_of_base = LogOfPolynomial(factor.expolist, factor.coeffs, factor.polysymbols).simplify()
+    if type(log_of_base) is not LogOfPolynomial: # ``log(1) = 0``
+        return prefactor, None
+    return prefactor, Product(b, log_of_base, copy=False)
+
+def _integer_exponent(factor):
+    '''
+    Return the exponent of the :class:`.algebra.ExponentiatedPolynomial`
+    `factor` as ``int`` or ``None`` if it is not an integer.
+
+    '''
+    exponent = factor.exponent
+    if type(exponent) is Polynomial:
+        if len(exponent.coeffs) != 1 or exponent.expolist.any():
+            return None
+        exponent = exponent.coeffs[0]
+    try:
+        integer = int(exponent)
+    except (TypeError, ValueError):
+        return None
+    return integer if integer == exponent else None
+
+def _split_closed_form(factors, index):
+    '''
+    Sort the `factors` into the ``prefactors`` and the
+    ``slopes`` (see :func:`._closed_form_factor`) and
+    the remaining factors that have no closed form
+    expansion.
+
+    '''
+    symbol = factors[0].symbols[index]
+    prefactors, slopes, remainder = [], [], []
+    for factor in factors:
+        closed_form = _closed_form_factor(factor, index, symbol)
+        if closed_form is None:
+            remainder.append(factor)
+        else:
+            prefactors.append(closed_form[0])
+            if closed_form[1] is not None:
+                slopes.append(closed_form[1])
+    return prefactors, slopes, remainder
+
+def _closed_form_coefficients(prefactors, slopes, order):
+    r'''
+    Return the Taylor coefficients
+    :math:`\prod_i A_i (\sum_j B_j)^k / k!` of
+    :math:`\prod_i A_i \exp(\epsilon \sum_j B_j)`
+    up to (including) :math:`k=` `order`. Vanishing
+    coefficients are represented by ``None``.
+
+    '''
+    symbols = prefactors[0].symbols
+    N = len(symbols)
+    coeffs = [Product(*[prefactor.copy() for prefactor in prefactors], copy=False)]
+    if not slopes:
+        return coeffs + [None] * order
+    exponent = slopes[0] if len(slopes) == 1 else Sum(*slopes, copy=False)
+    inverse_k_factorial = sympify_expression(1)
+    for k in range(1, order + 1):
+        inverse_k_factorial /= k
+        factors = [prefactor.copy() for prefactor in prefactors]
+        if k == 1:
+            factors.append(exponent.copy())
+        else:
+            factors.append(Polynomial(np.zeros([1,N], dtype=int), np.array([inverse_k_factorial]), symbols, copy=False))
+            factors.append(Pow(exponent.copy(), Polynomial(np.zeros([1,N], dtype=int), np.array([k]), symbols, copy=False), copy=False))
+        coeffs.append(Product(*factors, copy=False))
+    return coeffs
+
+def _multiply_series(first, second, first_order, order):
+    '''
+    Return the coefficients of the product of two
+    series up to (including) `order`. The first
+    coefficient of `first` is of order `first_order`,
+    the first coefficient of `second` of order zero.
+    Vanishing coefficients are represented by ``None``.
+
+    '''
+    coeffs = []
+    for n in range(first_order, order + 1):
+        terms = []
+        for i,first_coeff in enumerate(first):
+            j = n - first_order - i
+            if j < 0:
+                break
+            if j < len(second) and first_coeff is not None and second[j] is not None:
+                terms.append(Product(first_coeff, second[j], copy=False))
+        if not terms:
+            coeffs.append(None)
+        elif len(terms) == 1:
+            coeffs.append(terms[0])
+        else:
+            coeffs.append(Sum(*terms, copy=False))
+    return coeffs
+
+def _Taylor_coefficients(expression, index, order):
+    '''
+    Compute the Taylor coefficients of a nonsingular
+    `expression` around zero by repeated differentiation.
+
+    '''
+    expression_variable_set_to_zero = expression.replace(index, 0)
+    coeffs = [expression_variable_set_to_zero]
+    inverse_i_factorial = sympify_expression(1)
+    for order_i in range(order):
+        inverse_i_factorial /= order_i + 1
+        expression = expression.simplify().derive(index)
+        coeffs.append( expression.replace(index, 0) * inverse_i_factorial )
+    return coeffs
+
 def _expand_Taylor_step(expression, index, order):
     r'''
     Series/Taylor expand a nonsingular `expression` around
     zero.
 
+    Factors of the form :math:`P^{a + b \epsilon}` are
+    expanded in closed form,
+    :math:`P^a \sum_k (b \log(P))^k \epsilon^k / k!`;
+    only the remaining factors are differentiated.
+
     :param expression:
         an expression composed of the types defined in
         the module :mod:`.algebra`;
@@ -48,21 +243,25 @@ def _expand_Taylor_step(expression, index, order):
     assert int_order == order and int_order >= 0, "`order` must be a nonnegative integer"
     order = int_order
     N = expression.number_of_variables
+    symbols = expression.symbols
 
     # Construct expolist of the Taylor polynomial
     expolist = np.zeros((1 + order, N), dtype=int)
     expolist[:,index] = np.arange(1 + order)
 
     # Construct coefficients of the Taylor polynomial
-    expression_variable_set_to_zero = expression.replace(index, 0)
-    coeffs = [expression_variable_set_to_zero]
-    inverse_i_factorial = sympify_expression(1)
-    for order_i in range(order):
-        inverse_i_factorial /= order_i + 1
-        expression = expression.simplify().derive(index)
-        coeffs.append( expression.replace(index, 0) * inverse_i_factorial )
+    prefactors, slopes, remainder = _split_closed_form(_factors(expression), index)
+    if not prefactors:
+        coeffs = _Taylor_coefficients(expression, index, order)
+    else:
+        coeffs = _closed_form_coefficients(prefactors, slopes, order)
+        if remainder:
+            remainder = remainder[0] if len(remainder) == 1 else Product(*remainder, copy=False)
+            coeffs = _multiply_series(coeffs, _Taylor_coefficients(remainder, index, order), 0, order)
+        zero = Polynomial(np.zeros([1,N], dtype=int), np.array([0]), symbols, copy=False)
+        coeffs = [zero.copy() if coeff is None else coeff for coeff in coeffs]
 
-    return Polynomial(expolist, np.array(coeffs), expression.symbols, copy=False)
+    return Polynomial(expolist, np.array(coeffs), symbols, copy=False)
 
 def _expand_singular_step(product, index, order):
     r'''
@@ -80,7 +279,10 @@ def _expand_singular_step(product, index, order):
 
     :param product:
         :class:`.algebra.Product` with factors of the form
-        ``<polynomial>`` or ``<polynomial> ** -1``;
+        ``<polynomial>`` or ``<polynomial> ** -1``, optionally
+        multiplied by factors ``<polynomial> ** (a + b * epsilon)``
+        (expanded in closed form), or a :class:`.algebra.Sum`
+        of such products;
         The expression to be series expanded.
 
     :param index:
@@ -94,22 +296,54 @@ def _expand_singular_step(product, index, order):
     '''
     N = product.number_of_variables
     symbols = product.symbols
+
+    # products of closed form expansions (see below) yield sums --> expand every summand
+    if type(product) is Sum:
+        expansions = []
+        for summand in product.summands:
+            try:
+                expansions.append(_expand_singular_step(summand, index, order))
+            except OrderError:
+                pass
+        if not expansions:
+            raise OrderError('The lowest order of all summands is higher than the requested order (%i)' % order)
+        expolist = np.vstack([expansion.expolist for expansion in expansions])
+        coeffs = np.concatenate([expansion.coeffs for expansion in expansions])
+        return Polynomial(expolist, coeffs, symbols, copy=False).simplify(deep=False)
+
     numerator = Polynomial(np.zeros([1,N], dtype=int), np.array([1]), symbols, copy=False)
     denominator = Polynomial(np.zeros([1,N], dtype=int), np.array([1]), symbols, copy=False)
 
     # must have a rational polynomial (product with factors of the form <p> and <p**-1>)
+    # times factors that can be Taylor expanded in closed form (see `_closed_form_factor`)
     if type(product) is not Product:
         raise TypeError('`product` must be a `Product`')
-    for factor in product.factors:
+    symbol = symbols[index]
+    prefactors, slopes = [], []
+    for factor in _factors(product):
         # type `Polynomial` --> numerator
         if type(factor) is Polynomial:
             numerator *= factor
-        # type `ExponentiatedPolynomial` with ``exponent==-1`` --> denominator
-        elif type(factor) is ExponentiatedPolynomial:
-            if factor.exponent != -1:
-                raise TypeError('All `factors` of `product` of type `ExponentiatedPolynomial` must fulfill ``(exponent==-1) is True``')
-            denominator *= Polynomial(factor.expolist, factor.coeffs, factor.polysymbols, copy=False)
+            continue
+        # type `ExponentiatedPolynomial` with integer exponent --> denominator (``exponent<0``) or numerator
+        if type(factor) is ExponentiatedPolynomial:
+            exponent = _integer_exponent(factor)
+            if exponent is not None:
+                base = Polynomial(factor.expolist, factor.coeffs, factor.polysymbols, copy=False)
+                if exponent < 0:
+                    denominator *= base ** -exponent
+                else:
+                    numerator *= base ** exponent
+                continue
+        # regular factor with closed form Taylor expansion
+        closed_form = _closed_form_factor(factor, index, symbol)
+        if closed_form is not None:
+            prefactors.append(closed_form[0])
+            if closed_form[1] is not None:
+                slopes.append(closed_form[1])
         # other type --> wtf??
+        elif type(factor) is ExponentiatedPolynomial:
+            raise TypeError('All `factors` of `product` of type `ExponentiatedPolynomial` must have an integer exponent (e.g. ``exponent==-1``) or an exponent linear in the expansion parameter')
         else:
             raise TypeError('All `factors` of `product` must be of type `Polynomial` or `ExponentiatedPolynomial`')
 
@@ -168,6 +402,16 @@ def _expand_singular_step(product, index, order):
 
         nonsingular_series_coeffs.append(Product(this_order_numerator, this_order_denominator))
 
+    # multiply by the closed form expansion of the regular factors
+    if prefactors:
+        regular_series_coeffs = _closed_form_coefficients(prefactors, slopes, order + highest_pole)
+        nonsingular_series_coeffs = _multiply_series(nonsingular_series_coeffs, regular_series_coeffs, -highest_pole, order)
+        nonsingular_series_expolist = np.zeros((len(nonsingular_series_coeffs), N), dtype=int)
+        nonsingular_series_expolist[:,index] = np.arange(len(nonsingular_series_coeffs)) - highest_pole
+        nonzero = [coeff is not None for coeff in nonsingular_series_coeffs]
+        nonsingular_series_expolist = nonsingular_series_expolist[nonzero]
+        nonsingular_series_coeffs = [coeff for coeff in nonsingular_series_coeffs if coeff is not None]
+
     return Polynomial(nonsingular_series_expolist, nonsingular_series_coeffs, numerator.polysymbols)
 
 def _expand_and_flatten(expression, indices, orders, expansion_one_variable):
@@ -232,7 +476,11 @@ def expand_singular(product, indices, orders):
     :param product:
         :class:`.algebra.Product` with factors of the form
         ``<polynomial>`` and ``<polynomial> ** -1``;
-        The expression to be series expanded.
+        The expression to be series expanded. Factors
+        ``<polynomial> ** (a + b * epsilon)``, where neither
+        the polynomial nor `a` and `b` depend on the
+        expansion parameter ``epsilon``, are allowed as
+        well and are expanded in closed form.
 
     :param indices:
         integer or iterable of integers;
@@ -253,6 +501,11 @@ def expand_Taylor(expression, indices, orders):
 
     Return a :class:`.algebra.Polynomial` - the series expansion.
 
+    Factors of the form ``<polynomial> ** (a + b * epsilon)``
+    are expanded in closed form in terms of powers of
+    ``log(<polynomial>)``, the remaining factors by
+    symbolic differentiation.
+
     :param expression:
         an expression composed of the types defined in
         the module :mod:`.algebra`;
@@ -302,6 +555,61 @@ def expand_sympy(expression, variables, orders):
     assert len(orders.shape) == 1, '`orders` must be vector-like'
     assert len(variables) == len(orders), 'The number of variables (%i) must equal the number of orders (%i).' % (len(variables), len(orders))
 
+    # Try the multivariate `TruncatedSeries` first. It does not support
+    # all functions and no nested poles such as ``1/(eps0 + eps1)``
+    # --> fall back to nested expansions with sympy's `series`.
+    try:
+        series = TruncatedSeries.from_sympy(expression, variables, orders)
+    except (TypeError, ValueError):
+        return _expand_sympy_nested(expression, variables, orders)
+    return _truncated_series_to_nested_polynomial(series, variables, orders)
+
+def _truncated_series_to_nested_polynomial(series, variables, orders):
+    '''
+    Convert a :class:`pySecDec.algebra.TruncatedSeries`
+    to nested :class:`pySecDec.algebra.Polynomial` as
+    returned by :func:`.expand_sympy`.
+
+    '''
+    def recursion(coeffs, index):
+        variable = variables[index]
+        order = orders[index]
+        lowest_order = series.lowest_orders[index]
+        axes_to_reduce = tuple(range(1, coeffs.ndim))
+        nonzero = np.vectorize(lambda coeff: not _is_zero(coeff), otypes=[bool])(coeffs) if coeffs.size else np.zeros(coeffs.shape, dtype=bool)
+        nonzero = np.where(nonzero.any(axis=axes_to_reduce) if axes_to_reduce else nonzero)[0]
+        if len(nonzero) == 0:
+            first = last = 0
+        else:
+            first = nonzero[0]
+            last = coeffs.shape[0] - 1 if series.truncated[index] else nonzero[-1]
+
+        # if the lowest order is higher than the requested order, raise an error
+        if lowest_order + first > order:
+            raise OrderError( 'The lowest order in `%s` (%i) is higher than the requested order (%i)' % (variable,lowest_order + first,order) )
+
+        if index + 1 < len(variables):
+            coeffs = [recursion(coeffs[i], index + 1) for i in range(first, last + 1)]
+        else:
+            coeffs = [sympify_expression(coeffs[i]) for i in range(first, last + 1)]
+
+        # create the `Polynomial`
+        expolist = np.zeros([len(coeffs),len(variables)], dtype=int)
+        expolist[:,index] = np.arange(lowest_order + first, lowest_order + last + 1)
+        expansion = Polynomial(expolist, np.array(coeffs), variables, copy=False)
+        expansion.truncated = bool(series.truncated[index])
+        return expansion
+
+    return recursion(series.coeffs, 0)
+
+def _expand_sympy_nested(expression, variables, orders):
+    '''
+    Expand a sympy expression in the `variables`
+    to given `orders` by nested calls to sympy's
+    `series`. Return the expansion as nested
+    :class:`pySecDec.algebra.Polynomial`.
+
+    '''
     def recursion(expression, variables, orders, index):
         variable = variables[index]
         order = orders[index]
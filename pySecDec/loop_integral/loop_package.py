@@ -27,7 +27,9 @@ def loop_package(name, loop_integral, requested_order,
                  split=False, ibp_power_goal=-1,
                  use_iterative_sort=True, use_light_Pak=True,
                  use_dreadnaut=False, use_Pak=True,
-                 processes=None):
+                 processes=None, polytope_cache=None, optimize_split=False,
+                 resume=False, shard=None, profile=False, memory_limit=None,
+                 max_tasks_per_worker=None, dry_run=False):
     '''
     Decompose, subtract and expand a Feynman
     parametrized loop integral. Return it as
@@ -102,10 +104,12 @@ def loop_package(name, loop_integral, requested_order,
             See :ref:`installation_normaliz`.
 
     :param normaliz_executable:
-        string, optional;
+        string or None, optional;
         The command to run `normaliz`. `normaliz` is only
         required if `decomposition_method` is set to
-        'geometric' or 'geometric_ku'.
+        'geometric' or 'geometric_ku'. Pass ``None`` to
+        use the built-in polytope routines instead of
+        `normaliz`.
         Default: 'normaliz'
 
     :param enforce_complex:
@@ -196,6 +200,65 @@ def loop_package(name, loop_integral, requested_order,
         `New in version 1.3`.
         Default: ``None``
 
+    :param polytope_cache:
+        string or None, optional;
+        A directory to store the results of the polytope
+        computations in and to reuse them from. See
+        :func:`pySecDec.code_writer.make_package`.
+        Default: ``None``
+
+    :param optimize_split:
+        bool, optional;
+        Whether or not to choose the splitting points
+        with a cost model instead of randomly. See
+        :func:`pySecDec.code_writer.make_package`.
+        Default: ``False``
+
+    :param resume:
+        bool, optional;
+        Whether or not to make the run resumable and to
+        resume an interrupted run. See
+        :func:`pySecDec.code_writer.make_package`.
+        Default: ``False``
+
+    :param shard:
+        tuple ``(k, n)`` of integers, optional;
+        Generate only the sectors with
+        ``sector_index % n == k``. The shards are combined
+        by :func:`pySecDec.code_writer.merge_package`. See
+        :func:`pySecDec.code_writer.make_package`.
+        Default: ``None``
+
+    :param profile:
+        bool or ``'memory'``, optional;
+        Whether or not to record the time (and the
+        memory) spent in the stages of the computation.
+        See :func:`pySecDec.code_writer.make_package`.
+        Default: ``False``
+
+    :param memory_limit:
+        integer or string, optional;
+        The memory that the worker processes may use
+        together, e.g. ``'16G'``. See
+        :func:`pySecDec.code_writer.make_package`.
+        Default: ``None``
+
+    :param max_tasks_per_worker:
+        integer, optional;
+        The number of sectors after which a worker
+        process is replaced. See
+        :func:`pySecDec.code_writer.make_package`.
+        Default: ``None``
+
+    :param dry_run:
+        bool, optional;
+        Whether or not to only decompose the integral
+        and write a report of the sectors and the
+        predicted time to generate the package instead
+        of the package. See
+        :func:`pySecDec.code_writer.make_package`.
+        Default: ``False``
+
     '''
     print('running "loop_package" for "' + name + '"')
 
@@ -264,10 +327,18 @@ def loop_package(name, loop_integral, requested_order,
         enforce_complex = enforce_complex,
         ibp_power_goal = ibp_power_goal,
         split = split,
-        processes = processes
+        processes = processes,
+        polytope_cache = polytope_cache,
+        optimize_split = optimize_split,
+        resume = resume,
+        shard = shard,
+        profile = profile,
+        memory_limit = memory_limit,
+        max_tasks_per_worker = max_tasks_per_worker,
+        dry_run = dry_run
     )
 
-    if isinstance(loop_integral, LoopIntegralFromGraph):
+    if isinstance(loop_integral, LoopIntegralFromGraph) and not dry_run:
         try:
             plot_diagram(loop_integral.internal_lines, loop_integral.external_lines,
                          os.path.join(name, name), loop_integral.powerlist)
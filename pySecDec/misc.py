@@ -7,6 +7,7 @@ Collection of general-purpose helper functions.
 """
 
 from itertools import chain, combinations, product
+from multiprocessing import Pool
 import sympy as sp
 import numpy as np
 import warnings
@@ -177,6 +178,47 @@ def parallel_det(M, pool):
             result -= term
     return result
 
+# The data that is common to all tasks of a worker process;
+# see :func:`.worker_pool`.
+_worker_environment = {}
+
+def _initialize_worker(environment):
+    _worker_environment.clear()
+    _worker_environment.update(environment)
+
+def worker_pool(processes, environment, maxtasksperchild=None):
+    '''
+    Create a :class:`multiprocessing.Pool` whose worker
+    processes receive the `environment` only once when
+    they start instead of with every task. The tasks
+    read it by :func:`.worker_environment`.
+
+    :param processes:
+        integer or None;
+        The number of worker processes. ``None`` means
+        the number of CPUs.
+
+    :param environment:
+        dict;
+        The data that is common to all tasks.
+
+    :param maxtasksperchild:
+        integer or None;
+        The number of tasks after which a worker process
+        is replaced by a fresh one. ``None`` means that
+        the workers live as long as the pool.
+
+    '''
+    return Pool(processes, _initialize_worker, (environment,), maxtasksperchild)
+
+def worker_environment():
+    '''
+    Return the `environment` passed to :func:`.worker_pool`
+    in a worker process of that pool.
+
+    '''
+    return _worker_environment
+
 def det(M):
     '''
     Calculate the determinant of a matrix.
@@ -7,18 +7,33 @@ The polytope class as required by
 
 """
 
-from .algebra import Polynomial
-import os, shutil, subprocess, re, numpy as np
+from functools import reduce
+from multiprocessing.pool import ThreadPool
+import os, shutil, subprocess, re, copy, hashlib, pickle, tempfile, numpy as np
+
+try:
+    from math import gcd
+except ImportError:
+    # python 2
+    from fractions import gcd
 
 def convex_hull(*polynomials):
     '''
     Calculate the convex hull of the Minkowski
     sum of all polynomials in the input.
-    The algorithm sets all coefficients to one first
-    and then only keeps terms of the polynomial product
-    that have coefficient 1.
-    Return the list of these entries in the expolist
-    of the product of all input polynomials.
+    The polynomials are added one at a time. After
+    each step, points that cannot be vertices are
+    dropped: A vertex of the Minkowski sum is the sum
+    of exactly one pair of points of the summands and
+    no vertex is the midpoint of two other points.
+    The first criterion is equivalent to setting all
+    coefficients to one and keeping only the terms
+    of the product of all polynomials that have
+    coefficient one, but the full product is never
+    built.
+    Return the list of the remaining points; i.e. the
+    vertices and possibly some additional points of
+    the convex hull.
 
     :param polynomials:
         abritrarily many instances of :class:`.Polynomial` where
@@ -26,16 +41,358 @@ def convex_hull(*polynomials):
         The polynomials to calculate the convex hull for.
 
     '''
-    product = 1
+    hull = _drop_midpoints(polynomials[0].expolist)
+
+    for poly in polynomials[1:]:
+        summand = _drop_midpoints(poly.expolist)
+        sums = (hull[:,np.newaxis,:] + summand[np.newaxis,:,:]).reshape(-1, hull.shape[1])
+        sums, multiplicities = np.unique(sums, axis=0, return_counts=True)
+        hull = _drop_midpoints(sums[multiplicities == 1])
+
+    return hull
+
+def _drop_midpoints(points):
+    '''
+    Remove duplicate rows of the integer array `points`
+    and the rows that are the midpoint of two other rows.
+    The removed points are not vertices of the convex
+    hull of `points`.
+
+    '''
+    points = np.unique(np.asarray(points), axis=0)
+    lookup = dict( (tuple(point),i) for i,point in enumerate(points.tolist()) )
+    is_midpoint = np.zeros(len(points), dtype=bool)
+    for i in range(len(points) - 1):
+        doubled_midpoints = points[i] + points[i+1:]
+        doubled_midpoints = doubled_midpoints[(doubled_midpoints % 2 == 0).all(axis=1)]
+        for midpoint in (doubled_midpoints // 2).tolist():
+            j = lookup.get(tuple(midpoint))
+            if j is not None:
+                is_midpoint[j] = True
+    return points[~is_midpoint]
+
+# ******************** in-process polyhedral routines ********************
+# The following functions are used instead of `normaliz` if ``normaliz=None``
+# is passed to :func:`.triangulate` or :meth:`.Polytope.complete_representation`.
+# All arithmetic is done with python integers to keep it exact.
+
+def _primitive(vector):
+    '''
+    Divide an integer vector by the greatest
+    common divisor of its entries.
+
+    '''
+    divisor = reduce(gcd, (abs(entry) for entry in vector), 0)
+    if divisor > 1:
+        return tuple(entry // divisor for entry in vector)
+    return tuple(vector)
+
+def _dot(a, b):
+    return sum(x*y for x,y in zip(a,b))
+
+def _linearly_independent_rows(matrix):
+    '''
+    Return the indices of a maximal set of linearly
+    independent rows of the integer `matrix`. The rows
+    are selected greedily in the order they appear in
+    `matrix`.
+
+    '''
+    echelon_rows = [] # pairs of (pivot column, row)
+    independent_rows = []
+    for i,row in enumerate(matrix):
+        row = [int(entry) for entry in row]
+        # fraction-free elimination of the pivot columns found so far
+        for pivot, echelon_row in echelon_rows:
+            if row[pivot] != 0:
+                row = _primitive([echelon_row[pivot] * x - row[pivot] * y for x,y in zip(row, echelon_row)])
+        for pivot, entry in enumerate(row):
+            if entry != 0:
+                echelon_rows.append((pivot, row))
+                independent_rows.append(i)
+                break
+    return independent_rows
+
+def _determinant(matrix):
+    '''
+    Calculate the determinant of a square integer
+    matrix using the fraction-free Bareiss algorithm.
+
+    '''
+    M = [[int(entry) for entry in row] for row in matrix]
+    n = len(M)
+    if n == 0:
+        return 1
+    sign = 1
+    previous_pivot = 1
+    for k in range(n-1):
+        if M[k][k] == 0:
+            for i in range(k+1,n):
+                if M[i][k] != 0:
+                    M[k], M[i] = M[i], M[k]
+                    sign = -sign
+                    break
+            else:
+                return 0
+        for i in range(k+1,n):
+            for j in range(k+1,n):
+                M[i][j] = (M[i][j] * M[k][k] - M[i][k] * M[k][j]) // previous_pivot
+        previous_pivot = M[k][k]
+    return sign * M[n-1][n-1]
+
+def _normal_vector(rows, dimensionality):
+    '''
+    Return the primitive integer vector that is
+    orthogonal to the `dimensionality` - 1 `rows`
+    (generalized cross product). The result is the
+    zero vector if the `rows` are linearly dependent.
+
+    '''
+    return _primitive([
+                          (-1)**j * _determinant([row[:j] + row[j+1:] for row in rows])
+                          for j in range(dimensionality)
+                      ])
+
+def _extreme_rays(inequalities):
+    r'''
+    Return the primitive extreme rays of the cone
+    :math:`\{ x : \langle a, x \rangle \ge 0 \}`,
+    where :math:`a` runs over the rows of `inequalities`,
+    using the double description method.
+    The `inequalities` must have full column rank;
+    i.e. the cone must be pointed.
+
+    '''
+    inequalities = [tuple(int(entry) for entry in row) for row in inequalities]
+    dimensionality = len(inequalities[0])
+    basis = _linearly_independent_rows(inequalities)
+    assert len(basis) == dimensionality, 'The cone must be pointed'
+
+    # The cone defined by the `basis` only is simplicial; its rays
+    # are orthogonal to all but one of the defining inequalities.
+    rays = []
+    zero_sets = np.zeros((dimensionality, len(inequalities)), dtype=bool)
+    for i,basis_index in enumerate(basis):
+        other_indices = [index for index in basis if index != basis_index]
+        ray = _normal_vector([inequalities[index] for index in other_indices], dimensionality)
+        if _dot(inequalities[basis_index], ray) < 0:
+            ray = tuple(-entry for entry in ray)
+        rays.append(ray)
+        zero_sets[i,other_indices] = True
+
+    # add the remaining inequalities one by one
+    basis = set(basis)
+    for inequality_index, inequality in enumerate(inequalities):
+        if inequality_index in basis:
+            continue
+
+        values = [_dot(inequality, ray) for ray in rays]
+        positive = [i for i,value in enumerate(values) if value > 0]
+        zero = [i for i,value in enumerate(values) if value == 0]
+        negative = [i for i,value in enumerate(values) if value < 0]
+
+        new_rays = [rays[i] for i in positive + zero]
+        new_zero_sets = [zero_sets[positive], zero_sets[zero]]
+        new_zero_sets[1][:,inequality_index] = True
+
+        # Combine adjacent pairs of rays on opposite sides of the new
+        # hyperplane. Two rays are adjacent if no third ray is tight
+        # at all the inequalities that both of them are tight at.
+        not_tight = (~zero_sets).astype(int).T
+        for p in positive:
+            common_zero_sets = zero_sets[p] & zero_sets[negative]
+            candidates = common_zero_sets.sum(axis=1) >= dimensionality - 2
+            # count the rays (including `p` and `n`) whose zero set contains the common zero set
+            number_of_containing_rays = (common_zero_sets.astype(int).dot(not_tight) == 0).sum(axis=1)
+            for k in np.where(candidates & (number_of_containing_rays == 2))[0]:
+                n = negative[k]
+                new_rays.append(_primitive([values[p] * y - values[n] * x for x,y in zip(rays[p], rays[n])]))
+                new_zero_set = common_zero_sets[k].copy()
+                new_zero_set[inequality_index] = True
+                new_zero_sets.append(new_zero_set.reshape(1,-1))
+
+        rays = new_rays
+        zero_sets = np.vstack(new_zero_sets)
+
+    return rays
+
+def _dual_description(generators):
+    '''
+    Return the primitive support hyperplanes of the
+    cone generated by the rows of `generators` and
+    the indices of the generators that are extreme
+    rays (dropping duplicates).
+    Raise :class:`NotImplementedError` if the cone is
+    not full dimensional.
+
+    '''
+    generators = [tuple(int(entry) for entry in row) for row in generators]
+    if len(_linearly_independent_rows(generators)) != len(generators[0]):
+        raise NotImplementedError("Polytope is not full dimensional. Are you trying to compute a scaleless integral (which evaluates to zero)?")
+    hyperplanes = _extreme_rays(generators)
+
+    # A generator is an extreme ray if no other (not parallel)
+    # generator lies on all hyperplanes the generator lies on.
+    incidence = np.array([[_dot(generator, hyperplane) == 0 for hyperplane in hyperplanes] for generator in generators], dtype=bool)
+    primitive_generators = [_primitive(generator) for generator in generators]
+    extreme_generators = []
+    found_generators = set()
+    for i,generator in enumerate(primitive_generators):
+        if generator in found_generators or not any(generator):
+            continue
+        containing_generators = np.where(incidence[:,incidence[i]].all(axis=1))[0]
+        if all(primitive_generators[k] == generator for k in containing_generators):
+            extreme_generators.append(i)
+            found_generators.add(generator)
+
+    return hyperplanes, extreme_generators
+
+def _placing_triangulation(rays):
+    '''
+    Return a triangulation of the cone generated by
+    `rays` as list of tuples of indices into `rays`.
+    The rays are inserted one after the other; each
+    new ray that is outside the cone spanned so far
+    is joined to all boundary facets it can "see".
+
+    '''
+    rays = [tuple(int(entry) for entry in ray) for ray in rays]
+    if not rays:
+        return []
+
+    initial_simplex = _linearly_independent_rows(rays)
+    dimensionality = len(initial_simplex)
+
+    # project onto coordinates where the cone is full dimensional
+    coordinates = _linearly_independent_rows(list(zip(*rays)))
+    projected_rays = [tuple(ray[c] for c in coordinates) for ray in rays]
+
+    # the boundary facets of the triangulation and their inward normal vectors
+    boundary = {}
+    def add_boundary_facet(facet, opposite_ray):
+        normal = _normal_vector([projected_rays[i] for i in sorted(facet)], dimensionality)
+        if _dot(normal, projected_rays[opposite_ray]) < 0:
+            normal = tuple(-entry for entry in normal)
+        boundary[facet] = normal
+
+    simplices = [tuple(initial_simplex)]
+    for i in initial_simplex:
+        add_boundary_facet(frozenset(initial_simplex) - set([i]), i)
+
+    initial_simplex = set(initial_simplex)
+    for new_ray, projected_ray in enumerate(projected_rays):
+        if new_ray in initial_simplex:
+            continue
+        visible_facets = [facet for facet, normal in boundary.items() if _dot(normal, projected_ray) < 0]
+        # facets shared by two of the new simplices are not on the boundary
+        new_boundary_facets = {}
+        for facet in visible_facets:
+            del boundary[facet]
+            simplices.append(tuple(sorted(facet)) + (new_ray,))
+            for i in facet:
+                new_facet = facet - set([i]) | set([new_ray])
+                if new_facet in new_boundary_facets:
+                    del new_boundary_facets[new_facet]
+                else:
+                    new_boundary_facets[new_facet] = i
+        for new_facet, opposite_ray in new_boundary_facets.items():
+            add_boundary_facet(new_facet, opposite_ray)
+
+    return simplices
+
+# ***************************** result cache *****************************
+
+class PolytopeCache(object):
+    '''
+    Store the results of polytope computations keyed by
+    a fingerprint of the input exponent vectors. The same
+    polytopes and cones typically occur several times;
+    e.g. in symmetric primary sectors or in different
+    integrals of an amplitude.
+    Pass an instance as `cache` to
+    :meth:`.Polytope.complete_representation`,
+    :func:`.triangulate`, :func:`.triangulate_cones`,
+    or :func:`pySecDec.decomposition.geometric.generate_fan`
+    to reuse previous results.
+    Results are only reused with the same backend
+    (`normaliz` or the in-process implementation
+    selected by ``normaliz=None``) since the backends
+    may return different, equally valid triangulations.
+
+    :param directory:
+        string or None;
+        If not ``None``, the results are also stored in
+        (and loaded from) files in this directory such
+        that they can be reused in later runs. The
+        directory is created if it does not exist.
+        Default: ``None``
+
+    '''
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._results = {}
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @staticmethod
+    def fingerprint(kind, *arrays):
+        '''
+        Return the key for the result of type `kind`
+        (string) computed from the integer `arrays`.
 
-    for poly in polynomials:
-        # want to use multiplication operator --> need type `Polynomial`, not a subtype
-        # set the coefficients to one first --> terms with coefficients unequal to one are definitely not part of the convex hull
-        product *= Polynomial(poly.expolist, np.ones_like(poly.coeffs, dtype=int))
+        '''
+        hasher = hashlib.sha1(kind.encode('ascii'))
+        for array in arrays:
+            array = np.ascontiguousarray(array, dtype=np.int64)
+            hasher.update(str(array.shape).encode('ascii'))
+            hasher.update(array.tobytes())
+        return kind + '_' + hasher.hexdigest()
+
+    @staticmethod
+    def backend(normaliz):
+        '''
+        Return the name of the backend selected by the
+        `normaliz` argument of the polytope routines.
+        To be included in the `kind` of a :meth:`.fingerprint`.
+
+        '''
+        return 'in_process' if normaliz is None else 'normaliz'
+
+    def get(self, key):
+        '''
+        Return a copy of the result stored under `key`
+        or ``None`` if there is no such result.
 
-    return product.expolist[np.where( product.coeffs == 1 )]
+        '''
+        try:
+            result = self._results[key]
+        except KeyError:
+            if self.directory is None:
+                return None
+            try:
+                with open(os.path.join(self.directory, key + '.pickle'), 'rb') as f:
+                    result = pickle.load(f)
+            except (IOError, OSError):
+                return None
+            self._results[key] = result
+        return copy.deepcopy(result)
+
+    def set(self, key, result):
+        '''
+        Store a copy of `result` under `key`.
 
-def triangulate(cone, normaliz='normaliz', workdir='normaliz_tmp', keep_workdir=False, switch_representation=False):
+        '''
+        result = copy.deepcopy(result)
+        self._results[key] = result
+        if self.directory is not None:
+            # write to a temporary file first such that other
+            # processes never see partially written files
+            fd, tmpfilename = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(result, f, 2)
+            os.rename(tmpfilename, os.path.join(self.directory, key + '.pickle'))
+
+def triangulate(cone, normaliz='normaliz', workdir='normaliz_tmp', keep_workdir=False, switch_representation=False, cache=None):
     '''
     Split a cone into simplicial cones; i.e.
     cones defined by exactly :math:`D` rays
@@ -52,8 +409,11 @@ def triangulate(cone, normaliz='normaliz', workdir='normaliz_tmp', keep_workdir=
         The defining rays of the cone.
 
     :param normaliz:
-        string;
-        The shell command to run `normaliz`.
+        string or None;
+        The shell command to run `normaliz`. If ``None``,
+        a placing triangulation is computed in-process
+        instead; `workdir` and `keep_workdir` are ignored
+        in that case.
 
     :param workdir:
         string;
@@ -76,6 +436,13 @@ def triangulate(cone, normaliz='normaliz', workdir='normaliz_tmp', keep_workdir=
         Whether or not to switch between facet and vertex/ray
         representation.
 
+    :param cache:
+        :class:`.PolytopeCache` or None;
+        If given, a previously computed triangulation of
+        the same `cone` is reused and new results are
+        stored in the `cache`.
+        Default: ``None``
+
     '''
     cone = np.asarray(cone)
     # basic consistency checks
@@ -85,6 +452,25 @@ def triangulate(cone, normaliz='normaliz', workdir='normaliz_tmp', keep_workdir=
     if cone.shape[0] == cone.shape[1] and not switch_representation:
         raise ValueError("`cone` is simplicial already")
 
+    if cache is not None:
+        kind = 'triangulation_switched' if switch_representation else 'triangulation'
+        key = cache.fingerprint(kind + '_' + cache.backend(normaliz), cone)
+        simplicial_cones = cache.get(key)
+        if simplicial_cones is None:
+            simplicial_cones = triangulate(cone, normaliz, workdir, keep_workdir, switch_representation)
+            cache.set(key, simplicial_cones)
+        return simplicial_cones
+
+    if normaliz is None:
+        if switch_representation:
+            if len(_linearly_independent_rows(cone)) != cone.shape[1]:
+                raise NotImplementedError('The cone defined by `cone` must be pointed.')
+            rays = np.array(_extreme_rays(cone), dtype=int).reshape(-1, cone.shape[1])
+        else:
+            rays = cone
+        simplicial_cones_indices = _placing_triangulation(rays)
+        return rays[np.array(simplicial_cones_indices, dtype=int).reshape(len(simplicial_cones_indices), -1)]
+
     old_np_printoptions = np.get_printoptions()
     np.set_printoptions(threshold=np.inf)
 
@@ -167,6 +553,84 @@ def triangulate(cone, normaliz='normaliz', workdir='normaliz_tmp', keep_workdir=
         if not keep_workdir:
             shutil.rmtree(workdir)
 
+def triangulate_cones(cones, normaliz='normaliz', workdir='normaliz_tmp', switch_representation=False, processes=1, cache=None):
+    '''
+    Split several cones into simplicial cones by
+    calling :func:`.triangulate` for each of the
+    `cones`. Return the list of the results in the
+    order of `cones`.
+    Up to `processes` instances of `normaliz` are
+    run concurrently, each in its own subdirectory
+    of `workdir`.
+
+    .. note::
+        `normaliz` triangulates one cone per run.
+        Hence, one `normaliz` process is started for
+        every cone and the `cones` are only processed
+        faster than by calling :func:`.triangulate`
+        for each of them if `processes` is not ``1``.
+        With ``normaliz=None``, no external process is
+        started at all.
+
+    .. seealso::
+        :func:`.triangulate`
+
+    :param cones:
+        iterable of two dimensional arrays;
+        The defining rays of the cones.
+
+    :param normaliz:
+        string or None;
+        The shell command to run `normaliz`. If ``None``,
+        the cones are triangulated in-process one after
+        the other.
+
+    :param workdir:
+        string;
+        The directory for the communication with `normaliz`.
+        A directory with the specified name will be created
+        in the current working directory. If the specified
+        directory name already exists, an :class:`OSError`
+        is raised.
+
+    :param switch_representation:
+        bool;
+        Whether or not to switch between facet and vertex/ray
+        representation.
+
+    :param processes:
+        integer or None;
+        The maximal number of `normaliz` processes to
+        run at the same time. If ``None``, the number
+        of CPUs is used.
+
+    :param cache:
+        :class:`.PolytopeCache` or None;
+        Passed to :func:`.triangulate`.
+        Default: ``None``
+
+    '''
+    cones = list(cones)
+
+    if normaliz is None or processes == 1 or len(cones) <= 1:
+        return [triangulate(cone, normaliz, workdir, switch_representation=switch_representation, cache=cache) for cone in cones]
+
+    def triangulate_one(indexed_cone):
+        i, cone = indexed_cone
+        return triangulate(cone, normaliz, os.path.join(workdir, 'cone%i' % i), switch_representation=switch_representation, cache=cache)
+
+    os.mkdir(workdir)
+    try:
+        # `normaliz` runs in a separate process --> threads suffice
+        pool = ThreadPool(processes)
+        try:
+            return pool.map(triangulate_one, enumerate(cones))
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        shutil.rmtree(workdir)
+
 class Polytope(object):
     r'''
     Representation of a polytope defined by either its
@@ -207,7 +671,7 @@ class Polytope(object):
         else:
             self.facets = np.array(facets)
 
-    def complete_representation(self, normaliz='normaliz', workdir='normaliz_tmp', keep_workdir=False):
+    def complete_representation(self, normaliz='normaliz', workdir='normaliz_tmp', keep_workdir=False, cache=None):
         '''
         Transform the vertex representation of a polytope
         to the facet representation or the other way round.
@@ -220,8 +684,11 @@ class Polytope(object):
             for installation and a list of tested versions.
 
         :param normaliz:
-            string;
-            The shell command to run `normaliz`.
+            string or None;
+            The shell command to run `normaliz`. If ``None``,
+            the conversion is done in-process using the
+            double description method; `workdir` and
+            `keep_workdir` are ignored in that case.
 
         :param workdir:
             string;
@@ -239,15 +706,40 @@ class Polytope(object):
             bool;
             Whether or not to delete the `workdir` after execution.
 
+        :param cache:
+            :class:`.PolytopeCache` or None;
+            If given, the result for a polytope with the same
+            set of vertices (or facets) is reused and new
+            results are stored in the `cache`.
+            Default: ``None``
+
         '''
+        if self.facets is not None and self.vertices is not None:
+            raise ValueError('Both representations (facet and vertex) are already calculated')
+
+        if cache is not None:
+            # the result does not depend on the order of the input
+            if self.facets is None:
+                key = cache.fingerprint('vertices2facets_' + cache.backend(normaliz), np.unique(self.vertices, axis=0))
+            else:
+                key = cache.fingerprint('facets2vertices_' + cache.backend(normaliz), np.unique(self.facets, axis=0))
+            result = cache.get(key)
+            if result is None:
+                self.complete_representation(normaliz, workdir, keep_workdir)
+                cache.set(key, (self.vertices, self.facets))
+            else:
+                self.vertices, self.facets = result
+            return
+
+        if normaliz is None:
+            return self._complete_representation_in_process()
+
         os.mkdir(workdir)
         try:
             if self.facets is None:
                 run_card_as_str = self._make_run_card_vertices2facets()
-            elif self.vertices is None:
-                run_card_as_str = self._make_run_card_facets2vertices()
             else:
-                raise ValueError('Both representations (facet and vertex) are already calculated')
+                run_card_as_str = self._make_run_card_facets2vertices()
 
             run_card_file_prefix = 'normaliz'
             run_card_file_suffix = '.in'
@@ -294,6 +786,28 @@ class Polytope(object):
             if not keep_workdir:
                 shutil.rmtree(workdir)
 
+    def _complete_representation_in_process(self):
+        # sort lexicographically like `normaliz` does
+        if self.facets is None:
+            # the facets are the support hyperplanes of the cone over ``(vertex, 1)``
+            generators = np.hstack([self.vertices, np.ones((len(self.vertices),1), dtype=int)])
+            facets, extreme_generators = _dual_description(generators)
+            self.facets = np.array(sorted(facets), dtype=int)
+            self.vertices = np.array(sorted(_primitive(generators[i]) for i in extreme_generators), dtype=int)
+        else:
+            # the cone over ``(vertex, 1)`` is dual to the cone generated by the facets
+            vertices, extreme_generators = _dual_description(self.facets)
+            vertices = np.array(sorted(vertices), dtype=int)
+            # the extreme rays ``(vertex, 1)`` are primitive only if the vertex is integral
+            # --> other homogenizing coordinates are either zero (unbounded) or a denominator
+            if (vertices[:,-1] != 1).any():
+                raise ValueError('The polyhedron defined by `facets` must be bounded and have integral vertices.')
+            self.facets = np.array(sorted(_primitive(self.facets[i]) for i in extreme_generators), dtype=int)
+            self.vertices = vertices
+
+        # discard the last column that only consists of ones
+        self.vertices = self.vertices[:,:-1]
+
     def vertex_incidence_lists(self):
         '''
         Return for each vertex the list of facets it
@@ -47,14 +47,70 @@ def pole_structure(monomial_product, *indices):
 
 # -------------------------------------------- original subtraction --------------------------------------------
 
-def _integrate_pole_part_single_index(polyprod, index):
-    monomial_product = polyprod.factors[0] # e.g. (z1**2)**1-eps0-eps1  *  (z1*z2)**3-4*eps1
-    monomial_product_FeynmanJ_set_to_one = monomial_product.replace(index,1)
-    regulator_poles = polyprod.factors[1]
-    cal_I = Product(*polyprod.factors[2:], copy=False)
-    polysymbols = monomial_product.symbols
+class _DerivativeTable(object):
+    '''
+    Table of the derivatives of `cal_I` that are
+    required in the subtraction. An entry is identified
+    by the derivative multiindex and the variables that
+    are replaced by numbers afterwards. Every entry
+    is computed only once; the subtraction terms refer
+    to the entries of the table instead of carrying
+    their own copies.
+
+    :param cal_I:
+        :class:`.algebra._Expression`;
+        The expression to take the derivatives of.
 
-    # arXiv:0803.4177v2: exponent_constant_term = a_j
+    '''
+    def __init__(self, cal_I):
+        self.number_of_variables = cal_I.number_of_variables
+        self.symbols = cal_I.symbols
+        self.table = {(tuple([0] * self.number_of_variables), ()): cal_I}
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, key):
+        '''
+        Return the derivative of `cal_I` indicated by
+        ``key = (multiindex, replacements)``, where
+        `replacements` is a sorted tuple of pairs
+        ``(index, value)``.
+
+        '''
+        try:
+            return self.table[key]
+        except KeyError:
+            pass
+
+        multiindex, replacements = key
+        replaced_indices = [index for index,value in replacements]
+        for index,power in enumerate(multiindex):
+            if power and index not in replaced_indices:
+                # differentiate after setting variables to zero --> shorter expressions
+                lower_multiindex = list(multiindex)
+                lower_multiindex[index] -= 1
+                expression = self[tuple(lower_multiindex), replacements].derive(index).simplify()
+                break
+        else:
+            index, value = replacements[-1]
+            expression = self[multiindex, replacements[:-1]].replace(index, value)
+
+        self.table[key] = expression
+        return expression
+
+    def is_zero(self, key):
+        'Return whether or not the derivative indicated by `key` is trivially zero.'
+        expression = self[key]
+        return type(expression) is Polynomial and (expression.coeffs == 0).all()
+
+def _exponent_of(monomial_product, index):
+    r'''
+    Return the constant term (:math:`a_j`) and the full
+    exponent (:math:`a_j - b_j \epsilon_1 - ...`) of the
+    parameter indexed by `index` in the `monomial_product`.
+
+    '''
     exponent_constant_term = 0
     full_exponent = 0
     for monomial_factor in monomial_product.factors:
@@ -71,65 +127,87 @@ def _integrate_pole_part_single_index(polyprod, index):
         if (regulator_part.coeffs == 0).all():
             raise ValueError('"1/0" detected.')
 
+    return exponent_constant_term, full_exponent
+
+def _integrate_pole_part_single_index(term, index, derivatives):
+    '''
+    Subtract the poles of the parameter indexed by `index`
+    from a `term` of the form ``(<monomial_product>,
+    <regulator_poles>, <cal_I>)``. The ``<cal_I>`` is a list
+    of ``(<coefficient factors>, <key>)``, where ``<key>``
+    refers to an entry of the :class:`._DerivativeTable`
+    `derivatives`; i.e. it represents
+    ``sum(Product(*<coefficient factors>, derivatives[<key>]))``.
+    The coefficients do not depend on the parameter indexed by
+    `index`. Return a list of terms of the same form.
+
+    '''
+    monomial_product, regulator_poles, cal_I = term
+
+    # arXiv:0803.4177v2: exponent_constant_term = a_j
+    exponent_constant_term, full_exponent = _exponent_of(monomial_product, index)
+
     # finite variance of Monte Carlo integral estimator only if ``exponent_constant_term > -0.5``
     # to be absolutely safe here, we eliminate integrable singularities; i.e. ``exponent_constant_term >= 0``
     # TODO: Change to a dynamic `power_goal` just like in :func:`.integrate_by_parts`
     if exponent_constant_term >= 0:
-        # no subtraction needed, the input `polyprod` is numerically integrable
-        return [polyprod]
+        # no subtraction needed, the input `term` is numerically integrable
+        return [term]
 
-    def make_FeynmanIndex_to_power(power, factorial_of_power, symbols):
-        '''
-        Return a :class:`Polynomial` representing
-        "Feynman_index**power/power!"
+    # No dependency on Feynman parameter with index `index` --> has been integrated out analytically
+    #   --> Replace that Feynman parameter by `1` in the monomial factors.
+    monomial_product_FeynmanJ_set_to_one = monomial_product.replace(index,1)
 
-        '''
-        expolist = np.zeros((1, monomial_product.number_of_variables), dtype=int)
-        expolist[:,index] = power
-        return Polynomial(expolist, np.array([_sympy_one/factorial_of_power]), symbols, copy=False)
+    def differentiated_key(key, power):
+        'Return the key of the `power`-th derivative of ``derivatives[key]`` by `index` at zero.'
+        multiindex, replacements = key
+        multiindex = list(multiindex)
+        multiindex[index] += power
+        return tuple(multiindex), tuple(sorted(replacements + ((index,0),)))
 
-    output_summands = []
-    minus_cal_I_expansion_summands = []
+    output_terms = []
+    integrable_cal_I = list(cal_I)
     # exponent_constant_term <= -1 < 0      =>     abs(exponent_constant_term) = -exponent_constant_term
     # use symbol names as in arXiv:0803.4177v2
 
     # construction of the pole part
     for p in range(int(-exponent_constant_term)):
-        # No dependency on Feynman parameter with index `index` --> has been integrated out analytically
-        #   --> Replace that Feynman parameter by `1` in the monomial factors.
-        current_factors = [monomial_product_FeynmanJ_set_to_one]
-
         # renew `p_factorial` on the fly
         p_factorial = 1 if p == 0 else p_factorial * p
 
-        # renew derivative of cal_I on the fly
-        derivative_cal_I = cal_I if p == 0 else derivative_cal_I.derive(index)
-        derivative_cal_I_Feynmanj_set_to_zero = derivative_cal_I.replace(index, 0)
+        current_cal_I = []
+        for coefficient_factors,key in cal_I:
+            new_key = differentiated_key(key, p)
+            if not derivatives.is_zero(new_key):
+                current_cal_I.append( (coefficient_factors, new_key) )
 
         # arXiv0803.4177v2: 1/( (a_j + p + 1 - b_j * eps) * factorial(p) )
         new_potential_pole_denominator = (full_exponent + (p + 1)) * (p_factorial)
         # put this factor into the pole part only if a_j + p + 1 is zero
         if exponent_constant_term + p + 1 == 0:
             current_regulator_poles = Pow(regulator_poles.base * new_potential_pole_denominator, regulator_poles.exponent, copy=False)
-            current_factors.append(current_regulator_poles)
-            current_factors.append(derivative_cal_I_Feynmanj_set_to_zero.copy())
-        # otherwise it does not lead to additional regulator poles and can become part of <derivative_cal_I>
+        # otherwise it does not lead to additional regulator poles and can become part of <cal_I>
         else:
             # poles in current term: none --> poles are just the old ones
-            current_factors.append(regulator_poles)
+            current_regulator_poles = regulator_poles
+            # put `new_potential_pole_denominator**-1` (which is not a pole in this case) in the coefficients
+            denominator = Pow(new_potential_pole_denominator, regulator_poles.exponent.copy(), copy=False)
+            current_cal_I = [(coefficient_factors + [denominator], key) for coefficient_factors,key in current_cal_I]
 
-            # put `new_potential_pole_denominator**-1` (which is not a pole in this case) in the last factor
-            last_factor = Product(derivative_cal_I_Feynmanj_set_to_zero.copy(), Pow(new_potential_pole_denominator, regulator_poles.exponent.copy(), copy=False), copy=False)
-            current_factors.append(last_factor.simplify())
+        output_terms.append( (monomial_product_FeynmanJ_set_to_one, current_regulator_poles, current_cal_I) )
 
-        output_summands.append(Product(*current_factors, copy=False))
-        minus_cal_I_expansion_summands.append(Product(-make_FeynmanIndex_to_power(p, p_factorial, polysymbols), derivative_cal_I_Feynmanj_set_to_zero, copy=False ))
-
-    integrable_part = Product(   monomial_product, regulator_poles, Sum(cal_I, *minus_cal_I_expansion_summands, copy=False).simplify() , copy=False   )
+        # "Feynman_index**p/p!"
+        expolist = np.zeros((1, monomial_product.number_of_variables), dtype=int)
+        expolist[:,index] = p
+        minus_FeynmanIndex_to_power = Polynomial(expolist, np.array([-_sympy_one/p_factorial]), derivatives.symbols, copy=False)
+        for coefficient_factors,key in cal_I:
+            new_key = differentiated_key(key, p)
+            if not derivatives.is_zero(new_key):
+                integrable_cal_I.append( (coefficient_factors + [minus_FeynmanIndex_to_power], new_key) )
 
-    output_summands.append(integrable_part)
+    output_terms.append( (monomial_product, regulator_poles, integrable_cal_I) )
 
-    return output_summands
+    return output_terms
 
 def integrate_pole_part(polyprod, *indices):
     r'''
@@ -204,40 +282,92 @@ def integrate_pole_part(polyprod, *indices):
     Each returned list element has the same structure as the input
     `polyprod`.
 
+    .. note::
+        The derivatives of :math:`\mathcal{I}` are computed only
+        once per multiindex and set of variables set to zero.
+        The returned products refer to the same instances of
+        the derivatives; i.e. they are not copied.
+
     '''
-    new_products = [polyprod]
+    cal_I = Product(*polyprod.factors[2:], copy=False)
+    derivatives = _DerivativeTable(cal_I)
+    key_cal_I = (tuple([0] * cal_I.number_of_variables), ())
+
+    new_terms = [(polyprod.factors[0], polyprod.factors[1], [([], key_cal_I)])]
     for index in indices:
-        old_products = new_products
-        new_products = []
-        for polyprod in old_products:
-            new_products.extend( _integrate_pole_part_single_index(polyprod, index) )
+        old_terms = new_terms
+        new_terms = []
+        for term in old_terms:
+            new_terms.extend( _integrate_pole_part_single_index(term, index, derivatives) )
+
+    # assemble the products from the entries in the table of derivatives
+    new_products = []
+    for monomial_product, regulator_poles, cal_I_summands in new_terms:
+        summands = [Product(*(coefficient_factors + [derivatives[key]]), copy=False) for coefficient_factors,key in cal_I_summands]
+        if not summands:
+            cal_I = Polynomial(np.zeros([1,derivatives.number_of_variables], dtype=int), np.array([0]), derivatives.symbols, copy=False)
+        elif len(summands) == 1:
+            cal_I = summands[0].simplify()
+        else:
+            cal_I = Sum(*summands, copy=False).simplify()
+        new_products.append( Product(monomial_product, regulator_poles, cal_I, copy=False) )
     return new_products
 
 # -------------------------------------------- integration by parts --------------------------------------------
 
-def _integrate_by_parts_single_index(polyprod, power_goal, index):
-    monomial_product = polyprod.factors[0] # e.g. (z1**2)**1-eps0-eps1  *  (z1*z2)**3-4*eps1
-    monomial_product_FeynmanJ_set_to_one = monomial_product.replace(index,1)
-    regulator_poles = polyprod.factors[1]
-    cal_I = Product(*polyprod.factors[2:], copy=False)
-    polysymbols = monomial_product.symbols
+class _TermAccumulator(object):
+    '''
+    Collect terms of the form ``(<monomial_product>,
+    <denominators>, <cal_I>)``, where ``<denominators>``
+    is the list of the factors ``a_j + 1 - b_j * eps``
+    that are put into the regulator poles and ``<cal_I>``
+    is a dictionary mapping keys of a :class:`._DerivativeTable`
+    to (integer) coefficients.
+    Terms with the same monomials and the same regulator
+    poles are merged by adding the coefficients of the
+    derivatives of cal_I.
 
-    # extract the overall power from the `monomial_product`
-    exponent_constant_term = 0
-    full_exponent = 0
-    for monomial_factor in monomial_product.factors:
-        if monomial_factor.exponent.has_constant_term():
-            this_factor_exponent_constant_term = np.sum(monomial_factor.exponent.coeffs[np.where((monomial_factor.exponent.expolist == 0).all(axis=1))])
-            exponent_constant_term += this_factor_exponent_constant_term * monomial_factor.expolist[0,index]
-        # else: e.g. (z1**2)**-eps0-eps1 --> no contribution to the regulator-free term
-            # exponent_constant_term += 0
-        full_exponent += monomial_factor.exponent * monomial_factor.expolist[0,index]
+    '''
+    def __init__(self):
+        self.terms = {}
+        # python dictionaries are unordered --> need an ordering
+        self.ordered_keys = []
+
+    def __len__(self):
+        return len(self.ordered_keys)
+
+    def __iter__(self):
+        for key in self.ordered_keys:
+            monomial_product, denominators, cal_I = self.terms[key]
+            cal_I = dict((derivative, coefficient) for derivative,coefficient in cal_I.items() if coefficient != 0)
+            if cal_I: # skip terms that cancelled
+                yield monomial_product, denominators, cal_I
+
+    def add(self, monomial_product, denominators, cal_I):
+        'Add a term; see :class:`._TermAccumulator`.'
+        key = ( str(monomial_product), tuple(sorted(str(denominator) for denominator in denominators)) )
+        try:
+            accumulated_cal_I = self.terms[key][2]
+        except KeyError:
+            self.terms[key] = (monomial_product, denominators, dict(cal_I))
+            self.ordered_keys.append(key)
+            return
+        for derivative,coefficient in cal_I.items():
+            accumulated_cal_I[derivative] = accumulated_cal_I.get(derivative, 0) + coefficient
+
+def _integrate_by_parts_single_index(term, power_goal, index, derivatives, output):
+    '''
+    Integrate a `term` of the form ``(<monomial_product>,
+    <denominators>, <cal_I>)`` (see :class:`._TermAccumulator`)
+    by parts with respect to the parameter indexed by `index`
+    until `power_goal` is reached. The derivatives of cal_I
+    are referred to by their keys in the :class:`._DerivativeTable`
+    `derivatives`. The resulting terms are added to the
+    :class:`._TermAccumulator` `output`.
 
-    if exponent_constant_term < 0:
-        regulator_part = full_exponent - exponent_constant_term
-        # the next line conceptually implements "assert regulator_part != 0"
-        if (regulator_part.coeffs == 0).all():
-            raise ValueError('"1/0" detected.')
+    '''
+    monomial_product, denominators, cal_I = term
+    polysymbols = monomial_product.symbols
 
     def increase_monomial_power_by_one(monomial_product):
         # modify one of the factors if there is one raised to power ``1``
@@ -260,25 +390,56 @@ def _integrate_by_parts_single_index(polyprod, power_goal, index):
         new_factor = ExponentiatedPolynomial(expolist, np.array([1]), exponent, polysymbols, copy=False)
         return Product(new_factor, *monomial_product.factors)
 
-    # stop if `power_goal` is reached
-    if exponent_constant_term >= power_goal:
-        return [polyprod]
+    def key_with_replacement(key):
+        'Return the key of ``derivatives[key]`` with the parameter indexed by `index` set to one.'
+        multiindex, replacements = key
+        return multiindex, tuple(sorted(replacements + ((index,1),)))
 
-    # the factor ``1/(a+1-b*eps1-c*eps2-...)``
-    regulator_denominator = full_exponent + 1
-    new_pole_part = Pow(regulator_poles.base * regulator_denominator, regulator_poles.exponent, copy=False)
-
-    # construct the term without integral
-    term_without_integral_monomial_part = monomial_product.replace(index,1)
-    term_without_integral_cal_I = cal_I.replace(index,1)
-    term_without_integral = Product(term_without_integral_monomial_part, new_pole_part.copy(), term_without_integral_cal_I.simplify(), copy=False)
-
-    # construct the term to be integrated
-    term_with_integral_monomial_part = increase_monomial_power_by_one(monomial_product)
-    term_with_integral_cal_I = -cal_I.derive(index)
-    term_with_integral = Product(term_with_integral_monomial_part, new_pole_part.copy(), term_with_integral_cal_I.simplify(), copy=False)
+    def differentiated_key(key):
+        '''
+        Return the key of the derivative of ``derivatives[key]`` by
+        the parameter indexed by `index` or ``None`` if it vanishes.
 
-    return [term_without_integral] + _integrate_by_parts_single_index(term_with_integral, power_goal, index)
+        '''
+        multiindex, replacements = key
+        if index in (replaced_index for replaced_index,value in replacements):
+            # derivative by a variable that has been replaced by a number
+            return None
+        multiindex = list(multiindex)
+        multiindex[index] += 1
+        return tuple(multiindex), replacements
+
+    while True:
+        # extract the overall power from the `monomial_product`
+        exponent_constant_term, full_exponent = _exponent_of(monomial_product, index)
+
+        # stop if `power_goal` is reached
+        if exponent_constant_term >= power_goal:
+            output.add(monomial_product, denominators, cal_I)
+            return
+
+        # the factor ``1/(a+1-b*eps1-c*eps2-...)``
+        denominators = denominators + [full_exponent + 1]
+
+        # add the term without integral
+        term_without_integral_cal_I = {}
+        for key,coefficient in cal_I.items():
+            new_key = key_with_replacement(key)
+            if not derivatives.is_zero(new_key):
+                term_without_integral_cal_I[new_key] = coefficient
+        if term_without_integral_cal_I:
+            output.add(monomial_product.replace(index,1), denominators, term_without_integral_cal_I)
+
+        # construct the term to be integrated
+        monomial_product = increase_monomial_power_by_one(monomial_product)
+        term_with_integral_cal_I = {}
+        for key,coefficient in cal_I.items():
+            new_key = differentiated_key(key)
+            if new_key is not None and not derivatives.is_zero(new_key):
+                term_with_integral_cal_I[new_key] = -coefficient
+        if not term_with_integral_cal_I:
+            return
+        cal_I = term_with_integral_cal_I
 
 def integrate_by_parts(polyprod, power_goals, indices):
     r'''
@@ -348,7 +509,10 @@ def integrate_by_parts(polyprod, power_goals, indices):
     Return the pole part and the numerically integrable remainder
     as a list.
     Each returned list element has the same structure as the input
-    `polyprod`.
+    `polyprod`. Terms with the same monomials and the same
+    regulator poles are merged into a single list element;
+    terms that vanish because a derivative of :math:`\mathcal{I}`
+    is zero are dropped.
 
     '''
     if not isinstance(indices,list):
@@ -359,10 +523,36 @@ def integrate_by_parts(polyprod, power_goals, indices):
         assert len(power_goals) == len(indices), 'The number of `power_goals` (%i) must equal the number of indices (%i).' % (len(power_goals), len(indices))
     else:
         power_goals = repeat(power_goals)
-    new_products = [polyprod]
+    regulator_poles = polyprod.factors[1]
+    derivatives = _DerivativeTable(Product(*polyprod.factors[2:], copy=False))
+    key_cal_I = (tuple([0] * derivatives.number_of_variables), ())
+
+    new_terms = [(polyprod.factors[0], [], {key_cal_I: 1})]
     for power_goal,index in zip(power_goals,indices):
-        old_products = new_products
-        new_products = []
-        for polyprod in old_products:
-            new_products.extend( _integrate_by_parts_single_index(polyprod, power_goal, index) )
+        old_terms = new_terms
+        # terms with the same monomials and regulator poles are merged
+        new_terms = _TermAccumulator()
+        for term in old_terms:
+            _integrate_by_parts_single_index(term, power_goal, index, derivatives, new_terms)
+
+    # assemble the products from the entries in the table of derivatives
+    new_products = []
+    for monomial_product, denominators, cal_I_coefficients in new_terms:
+        if denominators:
+            pole_base = regulator_poles.base
+            for denominator in denominators:
+                pole_base = pole_base * denominator
+            current_regulator_poles = Pow(pole_base, regulator_poles.exponent.copy(), copy=False)
+        else:
+            current_regulator_poles = regulator_poles
+        summands = []
+        for key in sorted(cal_I_coefficients.keys()):
+            coefficient = cal_I_coefficients[key]
+            if coefficient == 1:
+                summands.append(derivatives[key])
+            else:
+                coefficient = Polynomial(np.zeros([1,derivatives.number_of_variables], dtype=int), np.array([coefficient]), derivatives.symbols, copy=False)
+                summands.append( Product(coefficient, derivatives[key], copy=False) )
+        cal_I = summands[0] if len(summands) == 1 else Sum(*summands, copy=False)
+        new_products.append( Product(monomial_product, current_regulator_poles, cal_I.simplify(), copy=False) )
     return new_products
@@ -1394,3 +1394,131 @@ class TestExpressionConverter(unittest.TestCase):
 
         for found_call in [found_f1_x_y, found_f2_xy_z, found_f1_y_z, found_f2_z]:
             self.assertTrue(found_call)
+
+#@attr('active')
+class TestTruncatedSeries(unittest.TestCase):
+    def setUp(self):
+        self.symbols = sp.symbols('eps alpha')
+        self.eps, self.alpha = self.symbols
+
+    def assert_series_equal(self, series, target, orders):
+        # compare with sympy; the coefficients of ``alpha**k`` are obtained
+        # by differentiation since sympy's nested series are unreliable
+        eps, alpha = series.symbols
+        for alpha_order in range(series.lowest_orders[1], orders[1] + 1):
+            alpha_coefficient = sp.diff(target, alpha, alpha_order).subs(alpha, 0) / sp.factorial(alpha_order)
+            expected = sp.expand(sp.series(alpha_coefficient, eps, 0, orders[0] + 1).removeO())
+            for eps_order in range(series.lowest_orders[0], orders[0] + 1):
+                difference = series[eps_order, alpha_order] - expected.coeff(eps, eps_order)
+                self.assertAlmostEqual(complex(sp.N(difference)), 0, places=12)
+
+    #@attr('active')
+    def test_init(self):
+        series = TruncatedSeries([[1,2],[3,4]], [-1,0], self.symbols)
+        np.testing.assert_array_equal(series.highest_orders, [0,1])
+        np.testing.assert_array_equal(series.truncated, [True,True])
+        self.assertEqual(series[-1,1], 2)
+        self.assertEqual(series[-2,0], 0)
+        self.assertRaisesRegexp(IndexError, 'orders.*unknown', series.__getitem__, [1,0])
+        self.assertRaisesRegexp(AssertionError, 'one dimension per symbol', TruncatedSeries, [1,2], [0,0], self.symbols)
+
+        constant = TruncatedSeries.constant(5, self.symbols)
+        self.assertEqual(constant[3,3], 0)
+        np.testing.assert_array_equal(constant.truncated, [False,False])
+
+    #@attr('active')
+    def test_string_representation(self):
+        series = TruncatedSeries([[1,0],[3,4]], [-1,0], self.symbols, truncated=[True,False])
+        self.assertEqual(str(series), '(1)*eps**(-1) + (3) + (4)*alpha**(1) + O(eps**1)')
+
+    #@attr('active')
+    def test_precision_of_product(self):
+        # ``(1/eps + 1 + O(eps)) * (eps + O(eps**2)) = 1 + O(eps)``
+        first = TruncatedSeries([[1],[1]], [-1,0], self.symbols, truncated=[True,False])
+        second = TruncatedSeries([[1]], [1,0], self.symbols, truncated=[True,False])
+        product = first * second
+        np.testing.assert_array_equal(product.lowest_orders, [0,0])
+        np.testing.assert_array_equal(product.highest_orders, [0,0])
+        np.testing.assert_array_equal(product.truncated, [True,False])
+
+        # exact factor ``eps + alpha``
+        exact = TruncatedSeries([[0,1],[1,0]], [0,0], self.symbols, truncated=False)
+        product = first * exact
+        np.testing.assert_array_equal(product.lowest_orders, [-1,0])
+        np.testing.assert_array_equal(product.highest_orders, [0,1])
+        self.assertEqual(product[-1,1], 1)
+        self.assertEqual(product[0,0], 1)
+        self.assertEqual(product[0,1], 1)
+
+        # requested orders
+        product = first.multiply(exact, [-1,1])
+        np.testing.assert_array_equal(product.highest_orders, [-1,1])
+
+    #@attr('active')
+    def test_precision_of_sum(self):
+        first = TruncatedSeries([[1],[1]], [-1,0], self.symbols, truncated=[True,False])
+        second = TruncatedSeries([[1],[2],[3]], [0,1], self.symbols, truncated=False)
+        for summed in (first + second, TruncatedSeries.sum(first, second), second + first):
+            np.testing.assert_array_equal(summed.lowest_orders, [-1,0])
+            np.testing.assert_array_equal(summed.highest_orders, [0,1])
+            self.assertEqual(summed[0,1], 1)
+            self.assertEqual(summed[0,0], 1)
+
+        difference = first - first
+        self.assertTrue((difference.coeffs == 0).all())
+
+    #@attr('active')
+    def test_inverse(self):
+        series = TruncatedSeries.from_sympy('eps + eps**2*alpha - 3*eps*alpha', self.symbols, [5,5])
+        inverse = series.inverse([1,2])
+        self.assert_series_equal(inverse, 1/(self.eps + self.eps**2*self.alpha - 3*self.eps*self.alpha), [1,2])
+        np.testing.assert_array_equal(inverse.lowest_orders, [-1,0])
+        np.testing.assert_array_equal(inverse.highest_orders, [1,2])
+
+        # nested pole
+        series = TruncatedSeries.from_sympy('eps + alpha', self.symbols, [5,5])
+        self.assertRaisesRegexp(ValueError, 'invert.*vanishing leading coefficient', series.inverse, [1,1])
+
+    #@attr('active')
+    def test_exp_log_gamma(self):
+        series = TruncatedSeries.from_sympy('2 + eps - alpha', self.symbols, [3,3])
+        self.assert_series_equal(series.exp([2,1]), sp.exp(2 + self.eps - self.alpha), [2,1])
+        self.assert_series_equal(series.log([2,1]), sp.log(2 + self.eps - self.alpha), [2,1])
+        self.assert_series_equal(series.gamma([2,1]), sp.gamma(2 + self.eps - self.alpha), [2,1])
+
+        # poles of the Gamma function
+        series = TruncatedSeries.from_sympy('-1 + eps', self.symbols, [3,3])
+        gamma = series.gamma([1,1])
+        self.assert_series_equal(gamma, sp.gamma(-1 + self.eps), [1,1])
+        np.testing.assert_array_equal(gamma.lowest_orders, [-1,0])
+        np.testing.assert_array_equal(gamma.truncated, [True,False])
+
+        series = TruncatedSeries.from_sympy('eps**-1', self.symbols, [3,3])
+        self.assertRaisesRegexp(ValueError, 'must not have poles', series.exp, [1,1])
+
+    #@attr('active')
+    def test_from_sympy(self):
+        expression = 'gamma(eps)*gamma(1-2*alpha)*(4*pi)**(eps+alpha)/(eps**2+eps*alpha+eps)'
+        series = TruncatedSeries.from_sympy(expression, self.symbols, [1,1])
+        np.testing.assert_array_equal(series.lowest_orders, [-2,0])
+        np.testing.assert_array_equal(series.highest_orders, [1,1])
+        self.assert_series_equal(series, sympify_expression(expression), [1,1])
+
+        # exact polynomials
+        series = TruncatedSeries.from_sympy('eps**2 + eps*alpha + a', self.symbols, [3,3])
+        np.testing.assert_array_equal(series.truncated, [False,False])
+        series = TruncatedSeries.from_sympy('eps**2 + eps*alpha + a', self.symbols, [1,3])
+        np.testing.assert_array_equal(series.truncated, [True,False])
+
+        self.assertRaisesRegexp(TypeError, 'Cannot expand.*sin', TruncatedSeries.from_sympy, 'sin(eps)', self.symbols, [1,1])
+
+    #@attr('active')
+    def test_from_polynomial(self):
+        polynomial = Polynomial([(1,-1,0),(0,0,2),(0,1,0)], ['A','B','C'], ['x','eps','alpha'])
+        series = TruncatedSeries.from_polynomial(polynomial, [1,2], [0,1])
+        self.assertEqual(series.symbols, sympify_expression(['eps','alpha']))
+        np.testing.assert_array_equal(series.lowest_orders, [-1,0])
+        np.testing.assert_array_equal(series.highest_orders, [0,1])
+        self.assertEqual(series[-1,0], sympify_expression('A'))
+        self.assertEqual(series[0,0], 0)
+        self.assertEqual(series[0,1], 0) # ``C*alpha**2`` is beyond the highest orders
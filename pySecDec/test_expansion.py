@@ -127,6 +127,27 @@ class TestSingularExpansion(unittest.TestCase):
         target = sympify_expression('1/(12*eps0**2*eps1) - 1/(2*eps0**3) + 9*eps1/(4*eps0**4) -  9*eps1**2/eps0**5 + 135*eps1**3/(4*eps0**6)')
         self.assertEqual( (sympify_expression(expanded) - target).simplify() , 0)
 
+    #@attr('active')
+    def test_closed_form_factor(self):
+        # ``(3 * eps1)**(2 - 2*eps0) * (eps1 + 1)**(eps0)`` does not have a pole in ``eps0``
+        p6 = ExponentiatedPolynomial([(0,1)], coeffs=[3], polysymbols=['eps0','eps1'], exponent=Polynomial.from_expression('2 - 2*eps0', ['eps0','eps1']))
+        p7 = ExponentiatedPolynomial([(0,0),(0,1)], coeffs=[1,1], polysymbols=['eps0','eps1'], exponent=Polynomial.from_expression('eps0', ['eps0','eps1']))
+        unexpanded = Product(self.p3, p6, p7)
+
+        expansion = _expand_singular_step(unexpanded, index=0, order=1)
+        target = sympify_expression('''
+                                       + 9*eps1**2 * 1/(36*eps1)
+                                       + eps0 * 9*eps1**2 * ( -12/(36*eps1)**2 + (log(eps1 + 1) - 2*log(3*eps1))/(36*eps1) )
+                                    ''')
+        self.assertEqual( (sympify_expression(expansion) - target).simplify() , 0)
+
+        # both regulators
+        p8 = ExponentiatedPolynomial([(0,0)], coeffs=[2], polysymbols=['eps0','eps1'], exponent=Polynomial.from_expression('eps0 + eps1', ['eps0','eps1']))
+        expansion = expand_singular(Product(self.p3, p8), indices=[0,1], orders=[1,0])
+        eps0, eps1 = sp.symbols('eps0 eps1')
+        target = sp.series(sp.series(2**(eps0 + eps1)/(36*eps1 + 12*eps0), eps0, 0, 2).removeO(), eps1, 0, 1).removeO()
+        self.assertEqual( (sympify_expression(expansion) - target).simplify() , 0)
+
 class TestTaylorExpansion(unittest.TestCase):
     def setUp(self):
         p0 = Polynomial.from_expression('5 + 2*x + 4*y + y**2', ['x','y'])
@@ -161,6 +182,33 @@ class TestTaylorExpansion(unittest.TestCase):
         self.assertEqual( (sympify_expression(expansion_in_x_and_y) - expected_expansion).simplify() , 0)
         self.assertEqual( (sympify_expression(expansion_in_y_and_x) - expected_expansion).simplify() , 0)
 
+    #@attr('active')
+    def test_closed_form(self):
+        # ``(y + 2)**(-1 + 2*x) * y**(x*z) * (3 + x*y)``
+        p0 = ExponentiatedPolynomial([(0,1,0),(0,0,0)], [1,2], exponent=Polynomial.from_expression('-1 + 2*x', ['x','y','z']), polysymbols=['x','y','z'])
+        p1 = ExponentiatedPolynomial([(0,1,0)], [1], exponent=Polynomial.from_expression('x*z', ['x','y','z']), polysymbols=['x','y','z'])
+        p2 = Polynomial.from_expression('3 + x*y', ['x','y','z'])
+        expression = Product(p0, p1, p2)
+
+        expansion = _expand_Taylor_step(expression, 0, 2)
+        expected_expansion = sympify_expression('''
+                                                   + 3/(y + 2)
+                                                   + x * (3*(2*log(y + 2) + z*log(y)) + y)/(y + 2)
+                                                   + x**2 * (3/2*(2*log(y + 2) + z*log(y))**2 + y*(2*log(y + 2) + z*log(y)))/(y + 2)
+                                                ''')
+        self.assertEqual( (sympify_expression(expansion) - expected_expansion).simplify() , 0)
+
+        # the coefficients contain powers of the logarithm rather than derivatives of ``p0`` or ``p1``
+        self.assertTrue('log(' in str(expansion.coeffs[2]))
+        self.assertTrue('-1 + 2*x' not in str(expansion.coeffs[2]).replace(' ',''))
+
+        # the order of the expansion should not matter
+        expansion_in_x_and_z = expand_Taylor(expression, [0,2], [2,1])
+        expansion_in_z_and_x = expand_Taylor(expression, [2,0], [1,2])
+        expected_expansion = sp.series(expected_expansion, sp.Symbol('z'), 0, 2).removeO()
+        self.assertEqual( (sympify_expression(expansion_in_x_and_z) - expected_expansion).simplify() , 0)
+        self.assertEqual( (sympify_expression(expansion_in_z_and_x) - expected_expansion).simplify() , 0)
+
 #@attr('active')
 class TestExpandSympy(unittest.TestCase):
     #@attr('active')
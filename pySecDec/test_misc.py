@@ -190,6 +190,24 @@ class TestDet(unittest.TestCase):
         self.assertEqual(det(M), 1)
         self.assertTrue(np.issubdtype(type(det(M)), np.int))
 
+def _scale_by_environment(x):
+    return x * worker_environment()['factor']
+
+#@attr('active')
+class TestWorkerPool(unittest.TestCase):
+    #@attr('active')
+    def test_worker_environment(self):
+        pool = worker_pool(2, dict(factor=3), maxtasksperchild=1)
+        try:
+            self.assertEqual(pool.map(_scale_by_environment, range(5)), [0,3,6,9,12])
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+        # the environment of the main process is not affected
+        self.assertEqual(worker_environment(), {})
+
 class TestAdjugate(unittest.TestCase):
     def test_calculation(self):
         M = [[1,2,3],
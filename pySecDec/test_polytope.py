@@ -1,5 +1,7 @@
 from .polytope import *
+from . import polytope
 from .misc import argsort_2D_array
+from contextlib import contextmanager
 from nose.plugins.attrib import attr
 import sys
 import unittest
@@ -249,6 +251,13 @@ class TestPolytope(unittest.TestCase):
 
     #@attr('active')
     def test_vertex_incidence_lists(self):
+        self._test_vertex_incidence_lists('normaliz')
+
+    #@attr('active')
+    def test_vertex_incidence_lists_in_process(self):
+        self._test_vertex_incidence_lists(None)
+
+    def _test_vertex_incidence_lists(self, normaliz):
         polytopes = [
                         Polytope(vertices=self.vertices_with_inside),
                         Polytope(facets=self.facets_with_outside),
@@ -261,7 +270,7 @@ class TestPolytope(unittest.TestCase):
             # sensible error message if `complete_representaion` not run before?
             self.assertRaisesRegexp(AssertionError, 'complete_representation.*first', polytope.vertex_incidence_lists)
 
-            polytope.complete_representation(workdir='tmpdir_test_vertex_incidence_lists_python' + python_major_version)
+            polytope.complete_representation(normaliz, workdir='tmpdir_test_vertex_incidence_lists_python' + python_major_version)
             incidences.append(polytope.vertex_incidence_lists())
 
         target_incidence_lists = {
@@ -282,22 +291,30 @@ class TestPolytope(unittest.TestCase):
 
     #@attr('active')
     def test_vertex2facet(self):
+        self._test_vertex2facet('normaliz')
+
+    #@attr('active')
+    def test_vertex2facet_in_process(self):
+        self._test_vertex2facet(None)
+
+    def _test_vertex2facet(self, normaliz):
         polytope1 = Polytope(vertices=self.vertices)
         polytope2 = Polytope(vertices=self.vertices_with_inside)
 
         # useful error message?
-        for polytope in (polytope1, polytope2):
-            self.assertRaisesRegexp(
-                                        OSError, 'No such file or directory.*nonexistentNormalizExecutable',
-                                        polytope.complete_representation, normaliz='nonexistentNormalizExecutable',
-                                        workdir='tmpdir_test_vertex2facet_python' + python_major_version
-                                   )
+        if normaliz is not None:
+            for polytope in (polytope1, polytope2):
+                self.assertRaisesRegexp(
+                                            OSError, 'No such file or directory.*nonexistentNormalizExecutable',
+                                            polytope.complete_representation, normaliz='nonexistentNormalizExecutable',
+                                            workdir='tmpdir_test_vertex2facet_python' + python_major_version
+                                       )
 
-        polytope1.complete_representation(workdir='tmpdir1_test_vertex2facet_python' + python_major_version)
-        polytope2.complete_representation(workdir='tmpdir2_test_vertex2facet_python' + python_major_version)
+        polytope1.complete_representation(normaliz, workdir='tmpdir1_test_vertex2facet_python' + python_major_version)
+        polytope2.complete_representation(normaliz, workdir='tmpdir2_test_vertex2facet_python' + python_major_version)
 
-        self.assertRaisesRegexp(ValueError, '(B|b)oth.*already', polytope1.complete_representation, workdir='tmpdir3_test_vertex2facet_python' + python_major_version)
-        self.assertRaisesRegexp(ValueError, '(B|b)oth.*already', polytope2.complete_representation, workdir='tmpdir4_test_vertex2facet_python' + python_major_version)
+        self.assertRaisesRegexp(ValueError, '(B|b)oth.*already', polytope1.complete_representation, normaliz, workdir='tmpdir3_test_vertex2facet_python' + python_major_version)
+        self.assertRaisesRegexp(ValueError, '(B|b)oth.*already', polytope2.complete_representation, normaliz, workdir='tmpdir4_test_vertex2facet_python' + python_major_version)
 
         # The ordering is not important but must be fixed to compare the arrays
         np.testing.assert_array_equal( sort_2D_array(np.array(polytope1.vertices)), sort_2D_array(np.array(self.vertices)) )
@@ -306,25 +323,154 @@ class TestPolytope(unittest.TestCase):
         np.testing.assert_array_equal( sort_2D_array(np.array(polytope2.facets)), sort_2D_array(np.array(self.facets)) )
 
     def test_facet2vertex(self):
+        self._test_facet2vertex('normaliz')
+
+    #@attr('active')
+    def test_facet2vertex_in_process(self):
+        self._test_facet2vertex(None)
+
+    def _test_facet2vertex(self, normaliz):
         polytope1 = Polytope(facets=self.facets)
         polytope2 = Polytope(facets=self.facets_with_outside)
 
         # useful error message?
-        for polytope in (polytope1, polytope2):
-            self.assertRaisesRegexp(
-                                        OSError, 'No such file or directory.*nonexistentNormalizExecutable',
-                                        polytope.complete_representation, normaliz='nonexistentNormalizExecutable',
-                                        workdir='tmpdir_test_facet2vertex_python' + python_major_version
-                                   )
+        if normaliz is not None:
+            for polytope in (polytope1, polytope2):
+                self.assertRaisesRegexp(
+                                            OSError, 'No such file or directory.*nonexistentNormalizExecutable',
+                                            polytope.complete_representation, normaliz='nonexistentNormalizExecutable',
+                                            workdir='tmpdir_test_facet2vertex_python' + python_major_version
+                                       )
 
-        polytope1.complete_representation(workdir='tmpdir1_test_facet2vertex_python' + python_major_version)
-        polytope2.complete_representation(workdir='tmpdir2_test_facet2vertex_python' + python_major_version)
+        polytope1.complete_representation(normaliz, workdir='tmpdir1_test_facet2vertex_python' + python_major_version)
+        polytope2.complete_representation(normaliz, workdir='tmpdir2_test_facet2vertex_python' + python_major_version)
 
-        self.assertRaisesRegexp(ValueError, '(B|b)oth.*already', polytope1.complete_representation, workdir='tmpdir3_test_facet2vertex_python' + python_major_version)
-        self.assertRaisesRegexp(ValueError, '(B|b)oth.*already', polytope2.complete_representation, workdir='tmpdir4_test_facet2vertex_python' + python_major_version)
+        self.assertRaisesRegexp(ValueError, '(B|b)oth.*already', polytope1.complete_representation, normaliz, workdir='tmpdir3_test_facet2vertex_python' + python_major_version)
+        self.assertRaisesRegexp(ValueError, '(B|b)oth.*already', polytope2.complete_representation, normaliz, workdir='tmpdir4_test_facet2vertex_python' + python_major_version)
 
         # The ordering is not important but must be fixed to compare the arrays
         np.testing.assert_array_equal( sort_2D_array(np.array(polytope1.vertices)), sort_2D_array(np.array(self.vertices)) )
         np.testing.assert_array_equal( sort_2D_array(np.array(polytope2.vertices)), sort_2D_array(np.array(self.vertices)) )
         np.testing.assert_array_equal( sort_2D_array(np.array(polytope1.facets)), sort_2D_array(np.array(self.facets)) )
         np.testing.assert_array_equal( sort_2D_array(np.array(polytope2.facets)), sort_2D_array(np.array(self.facets)) )
+
+    #@attr('active')
+    def test_facet2vertex_not_integral_in_process(self):
+        # the triangle with the vertices (0,0), (1/2,0), and (0,1/2)
+        polytope = Polytope(facets=[[1,0,0],[0,1,0],[-2,-2,1]])
+        self.assertRaisesRegexp(ValueError, 'integral vertices', polytope.complete_representation, None)
+
+        # unbounded
+        polytope = Polytope(facets=[[1,0,0],[0,1,0],[1,1,-1]])
+        self.assertRaisesRegexp(ValueError, 'bounded', polytope.complete_representation, None)
+
+    #@attr('active')
+    def test_not_full_dimensional_in_process(self):
+        polytope = Polytope(vertices=[[0,0,1],[1,0,1],[0,1,1],[1,1,1]])
+        self.assertRaisesRegexp(NotImplementedError, 'not full dimensional', polytope.complete_representation, None)
+
+#@attr('active')
+class TestPolytopeCache(unittest.TestCase):
+    def setUp(self):
+        self.vertices = [[2,1],
+                         [1,2],
+                         [2,0],
+                         [1,0],
+                         [0,2],
+                         [0,1]]
+
+        self.facets = [[ 0, 1, 0],
+                       [ 1, 0, 0],
+                       [-1, 0, 2],
+                       [ 0,-1, 2],
+                       [ 1, 1,-1],
+                       [-1,-1, 3]]
+
+        self.cone = [[ 1,  0,  0], [ 0,  1,  0], [ 0, -1, -1], [-1,  0, -1]]
+
+    #@attr('active')
+    def test_fingerprint(self):
+        key = PolytopeCache.fingerprint('vertices2facets', self.vertices)
+        self.assertEqual(key, PolytopeCache.fingerprint('vertices2facets', np.array(self.vertices)))
+        self.assertNotEqual(key, PolytopeCache.fingerprint('facets2vertices', self.vertices))
+        self.assertNotEqual(key, PolytopeCache.fingerprint('vertices2facets', self.vertices[::-1]))
+        self.assertNotEqual(key, PolytopeCache.fingerprint('vertices2facets', np.array(self.vertices).T))
+        self.assertNotEqual(PolytopeCache.backend(None), PolytopeCache.backend('normaliz'))
+        self.assertEqual(PolytopeCache.backend('normaliz'), PolytopeCache.backend('/path/to/normaliz'))
+
+    @contextmanager
+    def _disabled_in_process_backend(self):
+        # any computation with ``normaliz=None`` fails --> results must come from the cache
+        def fail(*args, **kwargs):
+            raise AssertionError('not taken from the cache')
+        originals = [(polytope, '_placing_triangulation', polytope._placing_triangulation),
+                     (Polytope, '_complete_representation_in_process', Polytope._complete_representation_in_process)]
+        for obj, attribute, original in originals:
+            setattr(obj, attribute, fail)
+        try:
+            yield
+        finally:
+            for obj, attribute, original in originals:
+                setattr(obj, attribute, original)
+
+    def _test_complete_representation(self, cache):
+        # the first calls fill the `cache`
+        Polytope(vertices=self.vertices).complete_representation(None, cache=cache)
+        Polytope(facets=self.facets).complete_representation(None, cache=cache)
+
+        # the results of one backend must not be used for the other backend
+        self.assertRaisesRegexp(
+                                    OSError, 'No such file or directory.*nonexistentNormalizExecutable',
+                                    Polytope(vertices=self.vertices).complete_representation, 'nonexistentNormalizExecutable',
+                                    workdir='tmpdir_test_complete_representation_cache_python' + python_major_version, cache=cache
+                               )
+
+        # the second call must not compute anything; the order of the vertices is irrelevant
+        with self._disabled_in_process_backend():
+            for vertices in (self.vertices, self.vertices[::-1]):
+                cached_polytope = Polytope(vertices=vertices)
+                cached_polytope.complete_representation(None, cache=cache)
+                np.testing.assert_array_equal(sort_2D_array(cached_polytope.vertices), sort_2D_array(np.array(self.vertices)))
+                np.testing.assert_array_equal(sort_2D_array(cached_polytope.facets), sort_2D_array(np.array(self.facets)))
+
+                # modifying the polytope must not change the `cache`
+                cached_polytope.facets[:] = 0
+
+            cached_polytope = Polytope(facets=self.facets)
+            cached_polytope.complete_representation(None, cache=cache)
+            np.testing.assert_array_equal(sort_2D_array(cached_polytope.vertices), sort_2D_array(np.array(self.vertices)))
+
+    #@attr('active')
+    def test_complete_representation_in_memory(self):
+        self._test_complete_representation(PolytopeCache())
+
+    #@attr('active')
+    def test_complete_representation_on_disk(self):
+        import tempfile
+        directory = tempfile.mkdtemp()
+        try:
+            self._test_complete_representation(PolytopeCache(directory))
+            # a new instance must find the results in `directory`
+            self._test_complete_representation(PolytopeCache(directory))
+            self.assertEqual(len([f for f in os.listdir(directory) if f.endswith('.pickle')]), 2)
+        finally:
+            shutil.rmtree(directory)
+
+    #@attr('active')
+    def test_triangulate(self):
+        cache = PolytopeCache()
+        triangulated_cones = triangulate(self.cone, None, cache=cache)
+
+        # the results of one backend must not be used for the other backend
+        self.assertRaisesRegexp(
+                                    OSError, 'No such file or directory.*nonexistentNormalizExecutable',
+                                    triangulate, self.cone, 'nonexistentNormalizExecutable',
+                                    workdir='tmpdir_test_triangulate_cache_python' + python_major_version, cache=cache
+                               )
+
+        with self._disabled_in_process_backend():
+            np.testing.assert_array_equal(triangulate(self.cone, None, cache=cache), triangulated_cones)
+            np.testing.assert_array_equal(triangulate_cones([self.cone], None, cache=cache)[0], triangulated_cones)
+
+            # `switch_representation` produces a different result
+            self.assertRaises(AssertionError, triangulate, self.cone, None, switch_representation=True, cache=cache)
@@ -1,4 +1,5 @@
 from .subtraction import *
+from .subtraction import _DerivativeTable, _TermAccumulator
 from .algebra import *
 import sympy as sp
 import unittest
@@ -125,6 +126,37 @@ class TestIntegratePolePart(unittest.TestCase):
         prod = Product(Product(monomial), pole_part_initializer, cal_I)
         self.assertRaisesRegexp(ValueError, '1/0', integrate_pole_part, prod, 0)
 
+    #@attr('active')
+    def test_derivative_table(self):
+        derivatives = _DerivativeTable(self.cal_I)
+        self.assertEqual(len(derivatives), 1)
+
+        # ``d/dx0 d/dx1 cal_I`` at ``x0 = 0``
+        ddcal_I = derivatives[(1,1,0,0), ((0,0),)]
+        self.assertEqual( (sympify_expression(ddcal_I) - sympify_expression('0')).simplify() , 0)
+        self.assertTrue(derivatives.is_zero( ((1,1,0,0), ((0,0),)) ))
+
+        # ``d/dx0 cal_I`` at ``x0 = x1 = 0``
+        dcal_I = derivatives[(1,0,0,0), ((0,0),(1,0))]
+        self.assertEqual( (sympify_expression(dcal_I) - sympify_expression('B')).simplify() , 0)
+
+        # every entry is computed only once
+        number_of_entries = len(derivatives)
+        self.assertTrue(derivatives[(1,0,0,0), ((0,0),(1,0))] is dcal_I)
+        self.assertTrue(derivatives[(1,1,0,0), ((0,0),)] is ddcal_I)
+        self.assertEqual(len(derivatives), number_of_entries)
+
+    #@attr('active')
+    def test_shared_derivatives(self):
+        cal_I = Function('cal_I', *(Polynomial.from_expression(symbol, self.cal_I.symbols) for symbol in self.cal_I.symbols))
+        I_j_after = integrate_pole_part(Product(self.monomial_product1,self.regulator_poles,cal_I), 0, 1)
+        self.assertEqual(len(I_j_after), 15)
+
+        # the pole part and the subtraction term refer to the same derivative of ``cal_I``
+        dcal_Id0 = I_j_after[5].factors[2].factors[1]
+        self.assertEqual(str(dcal_Id0), 'dcal_Id0( + (0), + (0), + (1)*eps0, + (1)*eps1)')
+        self.assertTrue(I_j_after[9].factors[2].summands[1].factors[1] is dcal_Id0)
+
     #@attr('active')
     def test_pole_structure(self):
         self.assertEqual( pole_structure(self.monomial_product1,0,1) , [-2,-4] )
@@ -203,6 +235,32 @@ class TestIntegrateByParts(unittest.TestCase):
         ]
         self.check_terms(terms_after_ibp, target_terms_after_ibp)
 
+    #@attr('active')
+    def test_drop_vanishing_derivatives(self):
+        monomials, pole_part_initializer = self.ibp_input.factors[:2]
+        cal_I = Polynomial.from_expression('A + B*x1', self.symbols)
+        terms_after_ibp = integrate_by_parts(Product(monomials, pole_part_initializer, cal_I), 0, (0,1,2))
+        target_terms_after_ibp = \
+        [
+            'x2**(2 + a*eps1 + b*eps2) * 1/(a*eps1 + b*eps2) * 1/(-1 + a*eps1 + b*eps2) * (A + B)',
+            '- x2**(2 + a*eps1 + b*eps2) * 1/(a*eps1 + b*eps2)**2 * 1/(-1 + a*eps1 + b*eps2) * B'
+        ]
+        self.check_terms(terms_after_ibp, target_terms_after_ibp)
+
+    #@attr('active')
+    def test_merge_terms(self):
+        monomials, pole_part_initializer = self.ibp_input.factors[:2]
+        derivative_0 = ((0,0,0,0,0), ())
+        derivative_1 = ((1,0,0,0,0), ())
+        terms = _TermAccumulator()
+        terms.add(monomials, [], {derivative_0: 1})
+        terms.add(monomials.copy(), [], {derivative_0: 2, derivative_1: -1})
+        terms.add(monomials.replace(0,1), [], {derivative_0: 1})
+        terms.add(monomials.replace(0,1), [], {derivative_0: -1})
+        merged_terms = list(terms)
+        self.assertEqual(len(merged_terms), 1)
+        self.assertEqual(merged_terms[0][2], {derivative_0: 3, derivative_1: -1})
+
     #@attr('active')
     def test_select_index(self):
         terms_after_ibp = integrate_by_parts(self.ibp_input, 0, [0])